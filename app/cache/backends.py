@@ -0,0 +1,80 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Any
+from app.cache.ttl_cache import TTLCache
+
+
+class CacheBackend(ABC):
+    """
+    讀取快取的後端介面。資料以 namespace（通常是使用者 ID）分組，
+    invalidate 只會清除該 namespace 的資料。
+    共享後端（例如 Redis）實作相同方法即可替換記憶體版本。
+    """
+
+    @abstractmethod
+    async def get(self, namespace: str, key: str) -> Any | None:
+        ...
+
+    @abstractmethod
+    async def set(self, namespace: str, key: str, value: Any, ttl: float | None = None):
+        ...
+
+    @abstractmethod
+    async def add(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> bool:
+        """只在 key 不存在時寫入（例如 Redis 的 SET NX），回傳是否寫入成功"""
+        ...
+
+    @abstractmethod
+    async def delete(self, namespace: str, key: str):
+        ...
+
+    @abstractmethod
+    async def invalidate(self, namespace: str):
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """單一 process 內的快取：LRU 淘汰 + TTL，每個 namespace 以世代號碼失效"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 60):
+        self._cache = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        # invalidate 時遞增世代，舊資料不再被讀到，之後由 LRU 自然淘汰
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.invalidations = 0
+
+    def _key(self, namespace: str, key: str) -> tuple[str, int, str]:
+        return namespace, self._generations.get(namespace, 0), key
+
+    async def get(self, namespace: str, key: str) -> Any | None:
+        return self._cache.get(self._key(namespace, key))
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: float | None = None):
+        self._cache.set(self._key(namespace, key), value, ttl=ttl)
+
+    async def add(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> bool:
+        return self._cache.add(self._key(namespace, key), value, ttl=ttl)
+
+    async def delete(self, namespace: str, key: str):
+        self._cache.delete(self._key(namespace, key))
+
+    async def invalidate(self, namespace: str):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._generations.clear()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            **self._cache.stats(),
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,14 @@
+import os
+from app.cache.backends import CacheBackend, InMemoryCacheBackend
+
+# 訓練課程讀取快取（以使用者 ID 為 namespace），任何寫入都會清除該使用者的資料
+session_cache: CacheBackend = InMemoryCacheBackend(
+    max_size=int(os.getenv("SESSION_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+)
+
+def get_session_cache() -> CacheBackend:
+    return session_cache
+
+def make_cache_key(*parts) -> str:
+    return "|".join("" if part is None else str(part) for part in parts)
@@ -1,6 +1,7 @@
 import os
-from supabase import create_client, Client
-from dotenv import load_dotenv 
+import httpx
+from supabase import create_client, Client, AsyncClient, ClientOptions, AsyncClientOptions
+from dotenv import load_dotenv
 
 load_dotenv()
 
@@ -17,9 +18,47 @@ if not supabase_publishable_key:
 if not supabase_secret_key:
     raise ValueError("❌ 錯誤: 在 .env 檔案中找不到 'SUPABASE_SECRET_KEY' (或 SUPABASE_SERVICE_KEY)")
 
+# HTTP 連線池與逾時設定（套用到所有 Supabase Client）
+pool_max_connections = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "100"))
+pool_max_keepalive = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "20"))
+pool_keepalive_expiry = float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", "30"))
+http2_enabled = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+connect_timeout = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+read_timeout = float(os.getenv("SUPABASE_READ_TIMEOUT", "15"))
+
+http_limits = httpx.Limits(
+    max_connections=pool_max_connections,
+    max_keepalive_connections=pool_max_keepalive,
+    keepalive_expiry=pool_keepalive_expiry
+)
+# write / pool 等待時間沿用 read_timeout，避免請求無限期卡住
+http_timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+
+def _create_http_client() -> httpx.Client:
+    return httpx.Client(limits=http_limits, timeout=http_timeout, http2=http2_enabled, follow_redirects=True)
+
+def _create_async_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(limits=http_limits, timeout=http_timeout, http2=http2_enabled, follow_redirects=True)
+
 try:
-    supabase_client: Client = create_client(supabase_url, supabase_publishable_key)
-    supabase_admin: Client = create_client(supabase_url, supabase_secret_key)
+    # 每個 Client 各自擁有連線池，避免不同金鑰的請求共用同一組連線設定
+    supabase_client: Client = create_client(
+        supabase_url, supabase_publishable_key,
+        options=ClientOptions(httpx_client=_create_http_client())
+    )
+    supabase_admin: Client = create_client(
+        supabase_url, supabase_secret_key,
+        options=ClientOptions(httpx_client=_create_http_client())
+    )
+    # 非同步版本，供 async 路由使用，避免阻塞 event loop
+    async_supabase_client: AsyncClient = AsyncClient(
+        supabase_url, supabase_publishable_key,
+        options=AsyncClientOptions(httpx_client=_create_async_http_client())
+    )
+    async_supabase_admin: AsyncClient = AsyncClient(
+        supabase_url, supabase_secret_key,
+        options=AsyncClientOptions(httpx_client=_create_async_http_client())
+    )
 except Exception as e:
     raise RuntimeError(f"❌ 初始化 Supabase Client 失敗: {e}")
 
@@ -27,4 +66,53 @@ def get_supabase_client() -> Client:
     return supabase_client
 
 def get_supabase_admin() -> Client:
-    return supabase_admin
\ No newline at end of file
+    return supabase_admin
+
+def get_async_supabase_client() -> AsyncClient:
+    return async_supabase_client
+
+def get_async_supabase_admin() -> AsyncClient:
+    return async_supabase_admin
+
+def _pool_stats(http_client: httpx.Client | httpx.AsyncClient) -> dict:
+    """
+    讀取 httpcore 連線池狀態，用於評估 worker 與連線數配置。
+    連線池狀態屬於 httpx / httpcore 的內部實作，升級後讀不到時只回傳設定的上限。
+    """
+    limits = {
+        "max_connections": pool_max_connections,
+        "max_keepalive_connections": pool_max_keepalive
+    }
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    try:
+        connections = list(pool.connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        queued = sum(1 for request in getattr(pool, "_requests", []) if getattr(request, "connection", None) is None)
+    except Exception as e:
+        print(f"Error reading connection pool stats: {e}")
+        return {"available": False, **limits}
+
+    return {
+        "available": True,
+        "connections": len(connections),
+        "active": len(connections) - idle,
+        "idle": idle,
+        "queued_requests": queued,
+        **limits
+    }
+
+def get_pool_stats() -> dict:
+    return {
+        "http2": http2_enabled,
+        "client": _pool_stats(supabase_client.options.httpx_client),
+        "admin": _pool_stats(supabase_admin.options.httpx_client),
+        "async_client": _pool_stats(async_supabase_client.options.httpx_client),
+        "async_admin": _pool_stats(async_supabase_admin.options.httpx_client)
+    }
+
+async def close_http_clients():
+    """關閉所有 Supabase Client 的連線池"""
+    supabase_client.options.httpx_client.close()
+    supabase_admin.options.httpx_client.close()
+    await async_supabase_client.options.httpx_client.aclose()
+    await async_supabase_admin.options.httpx_client.aclose()
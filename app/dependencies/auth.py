@@ -1,8 +1,14 @@
+import os
+import hmac
 from fastapi import HTTPException, status, Request, Depends
 from app.services.auth_service import AuthService
 
-def get_auth_service() -> AuthService:
-    return AuthService()
+environment = os.getenv("ENVIRONMENT")
+# 內部監控用的 token；未設定時只在非正式環境開放 /api/metrics
+metrics_token = os.getenv("METRICS_TOKEN")
+
+def get_auth_service(request: Request) -> AuthService:
+    return request.app.state.auth_service
 
 # 請求身份驗證
 async def get_current_user(
@@ -17,4 +23,25 @@ async def get_current_user(
             detail="Not authenticated"
         )
     
-    return auth_service.get_user_by_token(access_token)
+    return await auth_service.get_user_by_token(access_token)
+
+# 內部端點存取控制
+async def require_metrics_access(request: Request):
+    """
+    設定 METRICS_TOKEN 時需以 X-Metrics-Token header 帶入相同的值；
+    未設定時正式環境視為不存在（404），其他環境直接開放
+    """
+    if not metrics_token:
+        if environment == "Production":
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Not Found"
+            )
+        return
+
+    provided = request.headers.get("X-Metrics-Token", "")
+    if not hmac.compare_digest(provided.encode(), metrics_token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
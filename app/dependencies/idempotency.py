@@ -0,0 +1,41 @@
+from typing import Any, Awaitable, Callable
+from fastapi import Depends, Header, Request, Response
+from pydantic_core import to_json
+from app.dependencies.auth import get_current_user
+from app.services.idempotency import IdempotencyStore, get_idempotency_store, request_fingerprint
+
+class IdempotentRequest:
+    """綁定目前請求的 Idempotency-Key；未帶 key 時直接執行"""
+
+    def __init__(self, store: IdempotencyStore, user_id: str, key: str | None, scope: str, response: Response):
+        self.store = store
+        self.user_id = user_id
+        self.key = key
+        self.scope = scope
+        self.response = response
+
+    async def run(self, payload: Any, operation: Callable[[], Awaitable[Any]]) -> Any:
+        if self.key is None:
+            return await operation()
+
+        # 同一個 key 只能用於相同的路徑與請求內容
+        fingerprint = request_fingerprint(self.scope, to_json(payload))
+        result, replayed = await self.store.run(self.user_id, self.key, fingerprint, operation)
+        if replayed:
+            self.response.headers["Idempotent-Replayed"] = "true"
+        return result
+
+def get_idempotent_request(
+    request: Request,
+    response: Response,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", min_length=1, max_length=255),
+    current_user: dict = Depends(get_current_user),
+    store: IdempotencyStore = Depends(get_idempotency_store)
+) -> IdempotentRequest:
+    return IdempotentRequest(
+        store,
+        current_user["id"],
+        idempotency_key,
+        f"{request.method} {request.url.path}",
+        response
+    )
@@ -0,0 +1,34 @@
+from fastapi import Request
+from app.services.training_session_service import TrainingSessionService
+from app.services.activity_service import ActivityService
+from app.services.ai_service import AIService
+from app.services.import_service import ImportService
+from app.services.workout_template_service import WorkoutTemplateService
+from app.services.sync_service import SyncService
+from app.services.change_service import ChangeService
+from app.services.analytics_service import AnalyticsService
+
+# Service 於 lifespan 啟動時建立一次，所有請求共用同一個實例
+def get_training_session_service(request: Request) -> TrainingSessionService:
+    return request.app.state.training_session_service
+
+def get_activity_service(request: Request) -> ActivityService:
+    return request.app.state.activity_service
+
+def get_ai_service(request: Request) -> AIService:
+    return request.app.state.ai_service
+
+def get_import_service(request: Request) -> ImportService:
+    return request.app.state.import_service
+
+def get_workout_template_service(request: Request) -> WorkoutTemplateService:
+    return request.app.state.workout_template_service
+
+def get_sync_service(request: Request) -> SyncService:
+    return request.app.state.sync_service
+
+def get_change_service(request: Request) -> ChangeService:
+    return request.app.state.change_service
+
+def get_analytics_service(request: Request) -> AnalyticsService:
+    return request.app.state.analytics_service
@@ -1,6 +1,17 @@
 from fastapi import FastAPI
 import os
-from app.routers import auth, training_sessions, training_activities, ai
+from contextlib import asynccontextmanager
+from app.routers import auth, training_sessions, training_activities, ai, metrics, workout_templates, sync, changes, analytics
+from app.database import database
+from app.services.auth_service import AuthService
+from app.services.training_session_service import TrainingSessionService
+from app.services.activity_service import ActivityService
+from app.services.ai_service import AIService
+from app.services.import_service import ImportService
+from app.services.workout_template_service import WorkoutTemplateService
+from app.services.sync_service import SyncService
+from app.services.change_service import ChangeService
+from app.services.analytics_service import AnalyticsService
 from fastapi.middleware.cors import CORSMiddleware
 from app.dependencies.limiter import limiter
 from slowapi import _rate_limit_exceeded_handler
@@ -20,7 +31,24 @@ else:
         "http://localhost:3000", 
     ]
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 啟動時建立共用的 Service 實例，避免每個請求重新建立 Client
+    app.state.auth_service = AuthService()
+    app.state.training_session_service = TrainingSessionService()
+    app.state.activity_service = ActivityService()
+    app.state.ai_service = AIService()
+    app.state.import_service = ImportService()
+    app.state.workout_template_service = WorkoutTemplateService()
+    app.state.sync_service = SyncService()
+    app.state.change_service = ChangeService()
+    app.state.analytics_service = AnalyticsService()
+    yield
+    # 關閉時釋放 Gemini 與 Supabase 連線池
+    await app.state.ai_service.aclose()
+    await database.close_http_clients()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +56,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Idempotent-Replayed"],
 )
 
 app.state.limiter = limiter
@@ -39,6 +68,11 @@ app.include_router(auth.router)
 app.include_router(training_sessions.router)
 app.include_router(training_activities.router)
 app.include_router(ai.router)
+app.include_router(analytics.router)
+app.include_router(workout_templates.router)
+app.include_router(sync.router)
+app.include_router(changes.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 def root():
@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field
+from typing import Literal
+
+# 估算 1RM 的公式
+E1RMFormula = Literal["epley", "brzycki"]
+
+class ProgressionSetColumns(BaseModel):
+    """每組記錄一個位置，依日期排序"""
+    date: list[str]
+    set_number: list[int]
+    weight: list[float]
+    repetition: list[int]
+    volume: list[float] = Field(..., description="重量 x 次數")
+    e1rm_epley: list[float]
+    e1rm_brzycki: list[float]
+
+class ProgressionDayColumns(BaseModel):
+    """每個訓練日一個位置"""
+    date: list[str]
+    volume: list[float]
+    rolling_volume: list[float] = Field(..., description="含當天在內 window_days 天的總訓練量")
+    best_set_number: list[int]
+    best_weight: list[float]
+    best_repetition: list[int]
+    best_e1rm: list[float] = Field(..., description="當天估算 1RM 最高的一組")
+    intensity: list[float] = Field(..., description="當天平均重量 / 當天最佳估算 1RM")
+
+class ProgressionResponse(BaseModel):
+    exercise: str
+    formula: E1RMFormula
+    window_days: int
+    sets: ProgressionSetColumns
+    days: ProgressionDayColumns
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Literal
+from .training_sessions import TrainingSessionResponse
+from .training_activities import ActivityRecordResponse
+
+class ChangedActivity(BaseModel):
+    id: str
+    session_id: str
+    name: str
+    category: Optional[str]
+    description: Optional[str]
+
+class DeletedRow(BaseModel):
+    """刪除課程或活動時，其底下的活動與記錄不會另外列出"""
+    entity: Literal["session", "activity", "record"]
+    id: str
+    deleted_at: str
+
+class ChangesResponse(BaseModel):
+    sessions: list[TrainingSessionResponse]
+    activities: list[ChangedActivity]
+    records: list[ActivityRecordResponse]
+    deleted: list[DeletedRow]
+    has_more: bool = Field(..., description="同一次同步還有下一頁，需以 next_token 繼續查詢")
+    next_token: str = Field(..., description="下一次查詢使用的 since")
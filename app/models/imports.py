@@ -0,0 +1,20 @@
+from pydantic import Field
+from typing import Optional, Literal
+from datetime import date as DateType
+from .training_activities import ActivityRecordCreate
+
+# 匯入檔案格式
+ImportFormat = Literal["csv", "json"]
+
+class ImportRow(ActivityRecordCreate):
+    """
+    匯入檔案中的一列（一組訓練記錄）。
+    連續且 date、session_title 相同的列屬於同一個課程；
+    課程內連續且 activity、category 相同的列屬於同一個活動。
+    """
+    date: DateType = Field(..., description="訓練日期")
+    session_title: Optional[str] = Field(None, max_length=100, description="課程標題")
+    session_note: Optional[str] = Field(None, description="課程備註")
+    activity: str = Field(..., max_length=100, description="活動名稱")
+    category: Optional[str] = Field(None, max_length=50, description="類別")
+    description: Optional[str] = Field(None, description="活動描述")
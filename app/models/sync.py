@@ -0,0 +1,43 @@
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional, Literal, Any
+from .training_activities import ActivityRecordCreate
+
+SyncEntity = Literal["session", "activity", "record"]
+SyncAction = Literal["create", "update", "delete"]
+
+class SyncOperation(BaseModel):
+    """
+    離線期間排入佇列的一個操作。
+    client_id 由用戶端產生；create 成功後，之後操作中的 id、session_id、activity_id
+    可以直接使用該 client_id（暫時 ID），伺服器會換成實際的 ID。
+    """
+    client_id: str = Field(..., min_length=1, max_length=255, description="用戶端產生的操作 ID")
+    entity: SyncEntity
+    action: SyncAction
+    id: Optional[str] = Field(None, description="update / delete 的目標 ID，可為先前 create 的 client_id")
+    data: dict[str, Any] = Field(default_factory=dict, description="create 的內容或 update 要修改的欄位")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "client_id": "tmp-activity-1",
+                "entity": "activity",
+                "action": "create",
+                "data": {"session_id": "tmp-session-1", "name": "深蹲", "category": "strength"}
+            }
+        }
+    )
+
+class SyncRecordCreate(ActivityRecordCreate):
+    activity_id: str = Field(..., description="所屬活動 ID，可為先前 create 的 client_id")
+
+class SyncOperationResult(BaseModel):
+    client_id: str
+    status: int = Field(..., description="與單獨呼叫 REST API 時相同的 HTTP 狀態碼")
+    id: Optional[str] = Field(None, description="實際的資料 ID")
+    data: Optional[dict[str, Any]] = None
+    detail: Optional[Any] = None
+
+class SyncResponse(BaseModel):
+    results: list[SyncOperationResult]
+    id_map: dict[str, str] = Field(..., description="暫時 ID（client_id）對應到實際 ID")
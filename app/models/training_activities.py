@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, field_validator
 from typing import Optional
 from decimal import Decimal
 
@@ -75,6 +75,32 @@ class TrainingActivityWithRecordsResponse(BaseModel):
     description: Optional[str]
     records: list[ActivityRecordResponse]
 
+# columnar 格式中每個記錄欄位對應一個陣列；activity_id 由所屬活動即可得知，故省略
+RECORD_COLUMNS = ("id", "set_number", "repetition", "weight", "duration", "distance", "score")
+
+class ActivityRecordColumnsResponse(BaseModel):
+    id: list[str]
+    set_number: list[int]
+    repetition: list[Optional[int]]
+    weight: list[Optional[float]]
+    duration: list[Optional[str]]
+    distance: list[Optional[float]]
+    score: list[Optional[float]]
+
+class TrainingActivityWithRecordColumnsResponse(BaseModel):
+    id: str
+    session_id: str
+    name: str
+    category: Optional[str]
+    description: Optional[str]
+    records: ActivityRecordColumnsResponse
+
+class TrainingActivitySummaryResponse(BaseModel):
+    id: str
+    session_id: str
+    name: str
+    category: Optional[str]
+
 class ActivityRecordUpdate(BaseModel):
     id: str  # 必須提供 Record 的 ID
     activity_id: str  # 必須提供所屬 Activity 的 ID
@@ -83,4 +109,34 @@ class ActivityRecordUpdate(BaseModel):
     weight: Optional[Decimal] = Field(None, ge=0, max_digits=5, decimal_places=2, description="重量(kg)")
     duration: Optional[str] = Field(None, description="持續時間 (例如: '00:30:00')")
     distance: Optional[Decimal] = Field(None, ge=0, max_digits=6, decimal_places=1, description="距離(km)")
-    score: Optional[Decimal] = Field(None, ge=0, max_digits=4, decimal_places=1, description="分數")
\ No newline at end of file
+    score: Optional[Decimal] = Field(None, ge=0, max_digits=4, decimal_places=1, description="分數")
+
+
+class TrainingActivityUpdate(BaseModel):
+    """只需傳入要修改的欄位"""
+    name: Optional[str] = Field(None, max_length=100)
+    category: Optional[str] = Field(None, max_length=50)
+    description: Optional[str] = None
+
+class ActivityRecordPatch(BaseModel):
+    """只需傳入要修改的欄位；明確傳入 null 會清除該欄位（set_number 除外）"""
+    set_number: Optional[int] = Field(None, ge=1)
+    repetition: Optional[int] = Field(None, ge=0)
+    weight: Optional[Decimal] = Field(None, ge=0, max_digits=5, decimal_places=2, description="重量(kg)")
+    duration: Optional[str] = Field(None, description="持續時間 (例如: '00:30:00')")
+    distance: Optional[Decimal] = Field(None, ge=0, max_digits=6, decimal_places=1, description="距離(km)")
+    score: Optional[Decimal] = Field(None, ge=0, max_digits=4, decimal_places=1, description="分數")
+
+    @field_validator("set_number")
+    @classmethod
+    def set_number_not_null(cls, value: Optional[int]) -> int:
+        # 省略時不會執行；明確傳入 null 時拒絕，資料庫欄位為 NOT NULL
+        if value is None:
+            raise ValueError("set_number cannot be null")
+        return value
+
+class ActivityRecordChangesResponse(BaseModel):
+    """update_records 實際寫入的變更（記錄 ID）"""
+    inserted: list[str]
+    updated: list[str]
+    deleted: list[str]
@@ -1,7 +1,16 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from typing import Optional, Literal
 from datetime import date as DateType
-from .training_activities import TrainingActivityWithRecordsResponse
+from .training_activities import (
+    TrainingActivityWithRecordsResponse,
+    TrainingActivityWithRecordColumnsResponse,
+    TrainingActivitySummaryResponse
+)
+
+# with-activities 查詢的資料範圍：只有課程 / 課程與活動名稱 / 完整資料樹
+SessionInclude = Literal["sessions", "activities", "full"]
+# 記錄的輸出格式：rows 每筆記錄一個物件；columnar 每個欄位一個陣列
+RecordFormat = Literal["rows", "columnar"]
 
 class TrainingSessionCreate(BaseModel):
     title: Optional[str] = Field(None, max_length=100, description="課程標題")
@@ -40,4 +49,29 @@ class TrainingSessionWithActivitiesResponse(BaseModel):
     date: str
     note: Optional[str]
     activities: list[TrainingActivityWithRecordsResponse]
-    created_at: str
\ No newline at end of file
+    created_at: str
+
+class TrainingSessionWithActivityColumnsResponse(BaseModel):
+    id: str
+    user_id: str
+    title: Optional[str]
+    date: str
+    note: Optional[str]
+    activities: list[TrainingActivityWithRecordColumnsResponse]
+    created_at: str
+
+class TrainingSessionWithActivityNamesResponse(BaseModel):
+    id: str
+    user_id: str
+    title: Optional[str]
+    date: str
+    note: Optional[str]
+    activities: list[TrainingActivitySummaryResponse]
+    created_at: str
+
+class TrainingCalendarDayResponse(BaseModel):
+    date: str
+    session_count: int
+    activity_count: int
+    set_count: int
+    tonnage: float = Field(..., description="總訓練量：重量(kg) x 次數")
@@ -0,0 +1,35 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import date as DateType
+
+class WorkoutTemplateCreate(BaseModel):
+    session_id: str = Field(..., description="作為範本的訓練課程 ID")
+    name: str = Field(..., max_length=100, description="範本名稱")
+
+class SessionInstantiate(BaseModel):
+    """以範本或既有課程建立新課程"""
+    date: DateType = Field(..., description="新課程的訓練日期")
+    title: Optional[str] = Field(None, max_length=100, description="新課程標題，未填時沿用範本名稱或原課程標題")
+
+class WorkoutTemplateRecord(BaseModel):
+    set_number: int
+    repetition: Optional[int]
+    weight: Optional[float]
+    duration: Optional[str]
+    distance: Optional[float]
+    score: Optional[float]
+
+class WorkoutTemplateActivity(BaseModel):
+    name: str
+    category: Optional[str]
+    description: Optional[str]
+    records: list[WorkoutTemplateRecord]
+
+class WorkoutTemplatePayload(BaseModel):
+    activities: list[WorkoutTemplateActivity]
+
+class WorkoutTemplateResponse(BaseModel):
+    id: str
+    name: str
+    payload: WorkoutTemplatePayload
+    created_at: str
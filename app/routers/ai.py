@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, Request
 from app.dependencies.auth import get_current_user
+from app.dependencies.services import get_ai_service
 from app.models.ai import ChatMessage
 from app.dependencies.limiter import limiter
 from app.services.ai_service import AIService
@@ -15,7 +16,7 @@ async def gemini_chat(
     request: Request, 
     payload: ChatMessage, 
     current_user: dict = Depends(get_current_user),
-    service: AIService = Depends()
+    service: AIService = Depends(get_ai_service)
 ):
     """
     AI 訓練分析聊天機器人
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from typing import Optional
+from datetime import date
+from pydantic_core import to_json
+from app.dependencies.auth import get_current_user
+from app.dependencies.services import get_analytics_service
+from app.models.analytics import E1RMFormula, ProgressionResponse
+from app.services.analytics_service import AnalyticsService, PROGRESSION_MAX_WINDOW_DAYS
+from app.services.data_version import get_data_version_store, etag_matches, normalized_query
+
+router = APIRouter(
+    prefix="/api/analysis",
+    tags=["analysis"]
+)
+
+@router.get("/progression", response_model=ProgressionResponse)
+async def get_exercise_progression(
+    request: Request,
+    exercise: str = Query(..., min_length=1, max_length=100, description="活動名稱（不分大小寫）"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    window_days: int = Query(7, ge=1, le=PROGRESSION_MAX_WINDOW_DAYS, description="滾動訓練量的天數"),
+    formula: E1RMFormula = Query("epley", description="每日最佳組與強度使用的估算 1RM 公式"),
+    current_user: dict = Depends(get_current_user),
+    service: AnalyticsService = Depends(get_analytics_service)
+):
+    """
+    取得單一動作的進步分析：每組的估算 1RM（Epley / Brzycki）、每日與滾動訓練量、每日最佳組
+
+    結果以欄位陣列輸出，可直接繪製折線圖；只計算有重量與次數的組。
+    """
+    etag = await get_data_version_store().etag(current_user["id"], request.url.path, normalized_query(request.query_params.multi_items()))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    progression = await service.get_progression(
+        current_user["id"], exercise, start_date, end_date, window_days, formula
+    )
+    # 結果由後端計算，欄位已與回應模型一致，直接編碼為 JSON
+    return Response(content=to_json(progression), media_type="application/json", headers={"ETag": etag})
@@ -11,9 +11,9 @@ from app.services.auth_service import AuthService
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 @router.post("/signup")
-def signup(request: SignupRequest, auth_service: AuthService = Depends(get_auth_service)):
+async def signup(request: SignupRequest, auth_service: AuthService = Depends(get_auth_service)):
     """使用者註冊 - 使用 Supabase Auth"""
-    return auth_service.signup(request.email, request.password, request.username)
+    return await auth_service.signup(request.email, request.password, request.username)
 
 @router.post("/resend-verify")
 @limiter.limit("3/minute")
@@ -21,12 +21,12 @@ async def resend_verify(request: Request, body: EmailSchema, auth_service: AuthS
     """
     重新寄發註冊驗證信
     """
-    return auth_service.resend_verification(body.email)
+    return await auth_service.resend_verification(body.email)
 
 @router.post("/login")
 async def login(request: LoginRequest, response: Response, auth_service: AuthService = Depends(get_auth_service)):
     """使用者登入 - 使用 Supabase Auth"""
-    supabase_response = auth_service.login(request.email, request.password)
+    supabase_response = await auth_service.login(request.email, request.password)
     
     # 設定HttpOnly Cookies
     response.set_cookie("access_token", supabase_response.session.access_token, httponly=True, secure=True, samesite="Lax", max_age=60*60)
@@ -49,7 +49,11 @@ async def read_users_me(current_user: dict = Depends(get_current_user)):
     return current_user
     
 @router.post("/logout")
-async def logout(response: Response):
+async def logout(request: Request, response: Response, auth_service: AuthService = Depends(get_auth_service)):
+    access_token = request.cookies.get("access_token")
+    if access_token:
+        auth_service.invalidate_token(access_token)
+
     response.delete_cookie("access_token")
     response.delete_cookie("refresh_token")
     return {"message": "Logout successful"}
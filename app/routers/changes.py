@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from app.dependencies.auth import get_current_user
+from app.dependencies.services import get_change_service
+from app.models.changes import ChangesResponse
+from app.services.change_service import ChangeService
+
+router = APIRouter(
+    prefix="/api/changes",
+    tags=["sync"]
+)
+
+@router.get("", response_model=ChangesResponse)
+async def get_changes(
+    since: Optional[str] = Query(None, description="上一次回應的 next_token；未傳入時回傳全部資料"),
+    limit: int | None = Query(None, ge=1, description="每頁筆數，超過伺服器上限時以上限為準"),
+    current_user: dict = Depends(get_current_user),
+    service: ChangeService = Depends(get_change_service)
+):
+    """
+    取得上次同步後新增、修改與刪除的課程、活動和記錄
+
+    用戶端以 ID 覆寫新增與修改的資料，並移除 deleted 中的資料（刪除課程或活動時，其底下的資料一併移除）。
+    資料依課程、活動、記錄、刪除的順序分頁；has_more 為 true 時以 next_token 繼續取得下一頁，
+    直到 has_more 為 false，該頁的 next_token 即為下一次同步的起點。
+    token 超過保留期限時回傳 410，需不帶 since 重新完整同步。
+    """
+    return await service.get_changes(current_user["id"], since, limit)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+from app.database import database
+from app.services.auth_service import get_user_cache
+from app.cache.session_cache import get_session_cache
+from app.services.idempotency import get_idempotency_store
+from app.services.data_version import get_data_version_store
+from app.dependencies.auth import require_metrics_access
+
+router = APIRouter(
+    prefix="/api/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(require_metrics_access)]
+)
+
+@router.get("")
+async def get_metrics():
+    """
+    服務內部快取等運作指標（僅計數，不含使用者資料）
+    """
+    return {
+        "auth_user_cache": get_user_cache().stats(),
+        "session_cache": get_session_cache().stats(),
+        "idempotency_store": get_idempotency_store().stats(),
+        "data_versions": get_data_version_store().stats(),
+        "supabase_pool": database.get_pool_stats()
+    }
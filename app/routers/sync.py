@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, Body
+from typing import List, Annotated
+from app.dependencies.auth import get_current_user
+from app.dependencies.idempotency import IdempotentRequest, get_idempotent_request
+from app.dependencies.services import get_sync_service
+from app.models.sync import SyncOperation, SyncResponse
+from app.services.sync_service import SyncService, SYNC_MAX_OPERATIONS
+
+router = APIRouter(
+    prefix="/api/sync",
+    tags=["sync"]
+)
+
+@router.post("", response_model=SyncResponse)
+async def sync_operations(
+    operations: Annotated[
+        List[SyncOperation],
+        Body(min_length=1, max_length=SYNC_MAX_OPERATIONS)
+    ],
+    current_user: dict = Depends(get_current_user),
+    service: SyncService = Depends(get_sync_service),
+    idempotent: IdempotentRequest = Depends(get_idempotent_request)
+):
+    """
+    一次套用離線期間排入佇列的課程、活動與記錄變更
+
+    操作依傳入順序套用；連續且相同 entity、action 的操作合併為一次資料庫寫入。
+    create 的 client_id 可作為之後操作的暫時 ID（id、session_id、activity_id），
+    每個操作的結果以 status 表示，對應單獨呼叫 REST API 時的 HTTP 狀態碼。
+    """
+    return await idempotent.run(operations, lambda: service.apply(current_user["id"], operations))
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, status, Response
+from fastapi import APIRouter, Depends, status, Body
 from app.models.training_activities import (
     TrainingActivityWithRecordsCreate,
     TrainingActivityWithRecordsResponse,
-    ActivityRecordUpdate
+    ActivityRecordCreate,
+    ActivityRecordUpdate,
+    ActivityRecordPatch,
+    ActivityRecordResponse,
+    ActivityRecordChangesResponse
 )
 from app.dependencies.auth import get_current_user
-from app.services.activity_service import ActivityService
-from typing import List
+from app.dependencies.idempotency import IdempotentRequest, get_idempotent_request
+from app.dependencies.services import get_activity_service
+from app.services.activity_service import ActivityService, ACTIVITIES_BATCH_MAX_ITEMS
+from typing import List, Annotated
 
 router = APIRouter(
     prefix="/api/training-activities",
@@ -17,36 +23,78 @@ router = APIRouter(
 async def create_activity_with_records(
     activity: TrainingActivityWithRecordsCreate,
     current_user: dict = Depends(get_current_user),
-    service: ActivityService = Depends()
+    service: ActivityService = Depends(get_activity_service),
+    idempotent: IdempotentRequest = Depends(get_idempotent_request)
 ):
     """
     建立訓練活動（包含記錄）
     
     一次性建立活動和所有相關的記錄，確保資料一致性。
-    如果任何步驟失敗，會回滾所有變更。
+    擁有者檢查與寫入在資料庫的同一個交易中完成，任何步驟失敗都不會留下部分資料。
     """
-    return service.create_activity(current_user["id"], activity)
+    return await idempotent.run(activity, lambda: service.create_activity(current_user["id"], activity))
 
-@router.put("/{activity_id}/records", status_code=status.HTTP_204_NO_CONTENT)
+@router.post("/batch", response_model=List[TrainingActivityWithRecordsResponse], status_code=status.HTTP_201_CREATED)
+async def create_activities_with_records(
+    activities: Annotated[
+        List[TrainingActivityWithRecordsCreate],
+        Body(min_length=1, max_length=ACTIVITIES_BATCH_MAX_ITEMS)
+    ],
+    current_user: dict = Depends(get_current_user),
+    service: ActivityService = Depends(get_activity_service),
+    idempotent: IdempotentRequest = Depends(get_idempotent_request)
+):
+    """
+    一次建立同一課程的多個訓練活動（包含記錄），例如完整記錄一次訓練
+
+    所有活動的 session_id 必須相同；在單一交易中建立，依輸入順序回傳。
+    """
+    return await idempotent.run(activities, lambda: service.create_activities(current_user["id"], activities))
+
+@router.put("/{activity_id}/records", response_model=ActivityRecordChangesResponse)
 async def update_activity_records(
     activity_id: str,
     records_to_process: List[ActivityRecordUpdate], 
     current_user: dict = Depends(get_current_user),
-    service: ActivityService = Depends()
+    service: ActivityService = Depends(get_activity_service)
 ):
     """
     批量更新特定 Activity 底下的所有（Records），
     同時處理被刪除的記錄 (執行集合替換邏輯)。
-    注意：本路由操作目前並未有事務更新機制，若部分失敗無回滾機制
+    只寫入與目前資料不同的記錄，並在單一交易中完成；回傳新增、更新與刪除的記錄 ID。
+    """
+    return await service.update_records(current_user["id"], activity_id, records_to_process)
+
+@router.post("/{activity_id}/records", response_model=ActivityRecordResponse, status_code=status.HTTP_201_CREATED)
+async def append_activity_record(
+    activity_id: str,
+    record: ActivityRecordCreate,
+    current_user: dict = Depends(get_current_user),
+    service: ActivityService = Depends(get_activity_service),
+    idempotent: IdempotentRequest = Depends(get_idempotent_request)
+):
+    """
+    新增一組記錄（訓練中逐組記錄使用）
+
+    只寫入這一組，成本與活動現有的組數無關。
     """
-    service.update_records(activity_id, records_to_process)
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    return await idempotent.run(record, lambda: service.append_record(current_user["id"], activity_id, record))
+
+@router.patch("/records/{record_id}", response_model=ActivityRecordResponse)
+async def patch_activity_record(
+    record_id: str,
+    changes: ActivityRecordPatch,
+    current_user: dict = Depends(get_current_user),
+    service: ActivityService = Depends(get_activity_service)
+):
+    """修改單組記錄，只更新有傳入的欄位"""
+    return await service.patch_record(current_user["id"], record_id, changes)
 
 @router.delete("/{activity_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_training_activity(
     activity_id: str,
     current_user: dict = Depends(get_current_user),
-    service: ActivityService = Depends()
+    service: ActivityService = Depends(get_activity_service)
 ):
     """刪除訓練項目。由於設定了 ON DELETE CASCADE，相關的 records 會自動刪除"""
-    service.delete_activity(current_user["id"], activity_id)
\ No newline at end of file
+    await service.delete_activity(current_user["id"], activity_id)
\ No newline at end of file
@@ -1,25 +1,111 @@
-from fastapi import APIRouter, Depends, status
+import os
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, Body, UploadFile, File
+from fastapi.responses import StreamingResponse
 from datetime import date
 from app.dependencies.auth import get_current_user
-from typing import List
+from app.dependencies.idempotency import IdempotentRequest, get_idempotent_request
+from app.dependencies.services import get_training_session_service, get_import_service, get_workout_template_service
+from typing import List, Union, Annotated
+from pydantic import TypeAdapter
+from pydantic_core import to_json
 from app.models.training_sessions import (
     TrainingSessionCreate,
     TrainingSessionUpdate,
     TrainingSessionResponse,
-    TrainingSessionWithActivitiesResponse
+    TrainingSessionWithActivitiesResponse,
+    TrainingSessionWithActivityNamesResponse,
+    TrainingSessionWithActivityColumnsResponse,
+    TrainingCalendarDayResponse,
+    SessionInclude,
+    RecordFormat
 )
-from app.services.training_session_service import TrainingSessionService
+from app.models.training_activities import RECORD_COLUMNS
+from app.models.imports import ImportFormat
+from app.models.workout_templates import SessionInstantiate
+from app.services.training_session_service import TrainingSessionService, SESSIONS_BULK_MAX_ITEMS
+from app.services.import_service import ImportService
+from app.services.workout_template_service import WorkoutTemplateService
+from app.services.data_version import get_data_version_store, etag_matches, normalized_query
 
 router = APIRouter(
     prefix="/api/training-sessions",
     tags=["training sessions"]
 )
 
+# 各資料範圍對應的回應模型
+SESSION_RESPONSE_ADAPTERS: dict[str, TypeAdapter] = {
+    "sessions": TypeAdapter(List[TrainingSessionResponse]),
+    "activities": TypeAdapter(List[TrainingSessionWithActivityNamesResponse]),
+    "full": TypeAdapter(List[TrainingSessionWithActivitiesResponse])
+}
+calendar_adapter = TypeAdapter(List[TrainingCalendarDayResponse])
+columnar_sessions_adapter = TypeAdapter(List[TrainingSessionWithActivityColumnsResponse])
+# 匯出時逐筆輸出，使用單一課程的模型
+EXPORT_SESSION_ADAPTERS: dict[str, TypeAdapter] = {
+    "rows": TypeAdapter(TrainingSessionWithActivitiesResponse),
+    "columnar": TypeAdapter(TrainingSessionWithActivityColumnsResponse)
+}
+
+# trusted: 查詢結果已符合回應模型（見 SESSION_SELECTS），直接編碼為 JSON 不再驗證
+# validated: 逐層以回應模型驗證後再輸出
+SESSIONS_RESPONSE_MODE = os.getenv("SESSIONS_RESPONSE_MODE", "trusted").lower()
+
+def _to_columnar(sessions: list) -> list:
+    """
+    將每個活動的 records 轉為「欄位 -> 陣列」。
+    資料可能來自讀取快取，因此建立新的物件而不修改原始資料。
+    """
+    return [
+        {
+            **session,
+            "activities": [
+                {
+                    **activity,
+                    "records": {
+                        column: [record.get(column) for record in activity["records"]]
+                        for column in RECORD_COLUMNS
+                    }
+                }
+                for activity in session["activities"]
+            ]
+        }
+        for session in sessions
+    ]
+
+def _serialize_sessions(sessions: list, include: SessionInclude, record_format: RecordFormat) -> bytes:
+    # columnar 只影響記錄，沒有包含記錄的資料範圍維持原格式
+    columnar = record_format == "columnar" and include == "full"
+    if columnar:
+        sessions = _to_columnar(sessions)
+    if SESSIONS_RESPONSE_MODE == "trusted":
+        return to_json(sessions)
+    adapter = columnar_sessions_adapter if columnar else SESSION_RESPONSE_ADAPTERS[include]
+    return adapter.dump_json(adapter.validate_python(sessions))
+
+def _serialize_ndjson(sessions: list, record_format: RecordFormat) -> bytes:
+    """每個課程一行，以換行分隔"""
+    if record_format == "columnar":
+        sessions = _to_columnar(sessions)
+    if SESSIONS_RESPONSE_MODE == "trusted":
+        return b"".join(to_json(session) + b"\n" for session in sessions)
+    adapter = EXPORT_SESSION_ADAPTERS[record_format]
+    return b"".join(adapter.dump_json(adapter.validate_python(session)) + b"\n" for session in sessions)
+
+def _import_format_from_filename(filename: str | None) -> ImportFormat:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension not in ("csv", "json"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported file type, expected .csv or .json"
+        )
+    return extension
+
 @router.post("", response_model=TrainingSessionResponse, status_code=status.HTTP_201_CREATED)
 async def create_training_session(
     session: TrainingSessionCreate,
     current_user: dict = Depends(get_current_user),
-    service: TrainingSessionService = Depends()
+    service: TrainingSessionService = Depends(get_training_session_service),
+    idempotent: IdempotentRequest = Depends(get_idempotent_request)
 ):
     """
     建立新的訓練課程
@@ -28,37 +114,189 @@ async def create_training_session(
     - **date**: 訓練日期（必填）
     - **note**: 備註（可選）
     
-    必須通過身份驗證
+    必須通過身份驗證；帶上 `Idempotency-Key` 時，重送的請求會直接回傳第一次的結果
+    """
+    return await idempotent.run(session, lambda: service.create_session(current_user["id"], session))
+
+@router.post("/bulk", response_model=List[TrainingSessionResponse], status_code=status.HTTP_201_CREATED)
+async def create_training_sessions_bulk(
+    sessions: Annotated[
+        List[TrainingSessionCreate],
+        Body(min_length=1, max_length=SESSIONS_BULK_MAX_ITEMS)
+    ],
+    current_user: dict = Depends(get_current_user),
+    service: TrainingSessionService = Depends(get_training_session_service),
+    idempotent: IdempotentRequest = Depends(get_idempotent_request)
+):
+    """
+    一次建立多個訓練課程（例如規劃訓練週期、離線裝置同步）
+
+    所有項目先一起驗證，任何一筆不合法時回傳 422，錯誤的 `loc` 會標示項目索引，且不會建立任何課程；
+    全部合法時以單一 insert 建立，並依輸入順序回傳。
     """
-    return service.create_session(current_user["id"], session)
+    return await idempotent.run(sessions, lambda: service.create_sessions(current_user["id"], sessions))
 
-@router.get("/with-activities", response_model=List[TrainingSessionWithActivitiesResponse])
+@router.post("/import", response_class=StreamingResponse)
+async def import_training_history(
+    file: UploadFile = File(..., description="CSV 或 JSON 陣列，每列一組記錄"),
+    format: ImportFormat | None = Query(None, description="檔案格式，未指定時依副檔名判斷"),
+    current_user: dict = Depends(get_current_user),
+    service: ImportService = Depends(get_import_service)
+):
+    """
+    匯入其他 App 的訓練紀錄（CSV / JSON）
+
+    每列欄位：date、session_title、session_note、activity、category、description、
+    set_number、repetition（或 reps）、weight、duration、distance、score。
+    連續且日期與標題相同的列建立為同一個課程，課程內連續且名稱與類別相同的列建立為同一個活動。
+
+    檔案逐批解析與寫入，回應為 NDJSON：每批一筆 `progress`，最後一筆為 `summary`（含被拒絕的列）；
+    檔案格式錯誤或寫入失敗時以 `error` 結束，已寫入的批次會保留。
+    """
+    file_format = format or _import_format_from_filename(file.filename)
+
+    async def ndjson_events():
+        async for event in service.import_file(current_user["id"], file.file, file_format):
+            yield to_json(event) + b"\n"
+
+    return StreamingResponse(ndjson_events(), media_type="application/x-ndjson")
+
+@router.get(
+    "/with-activities",
+    response_model=Union[
+        List[TrainingSessionWithActivitiesResponse],
+        List[TrainingSessionWithActivityColumnsResponse],
+        List[TrainingSessionWithActivityNamesResponse],
+        List[TrainingSessionResponse]
+    ]
+)
 async def get_training_sessions_with_activities(
+    request: Request,
     start_date: date | None = None,
     end_date: date | None = None,
+    limit: int | None = Query(None, ge=1, description="每頁筆數，超過伺服器上限時以上限為準"),
+    cursor: str | None = Query(None, description="上一頁回應標頭 X-Next-Cursor 的值"),
+    include: SessionInclude = Query("full", description="sessions: 只有課程；activities: 課程與活動名稱；full: 包含所有記錄"),
+    format: RecordFormat = Query("rows", description="rows: 每筆記錄一個物件；columnar: 每個記錄欄位一個陣列"),
     current_user: dict = Depends(get_current_user),
-    service: TrainingSessionService = Depends()
+    service: TrainingSessionService = Depends(get_training_session_service)
 ):
     """
     取得訓練課程（包含活動和記錄）- **單次查詢優化**
+
+    依日期由新到舊分頁；若還有下一頁，回應標頭 `X-Next-Cursor` 會帶有下一頁的游標。
+    列表頁可用 `include` 只取需要顯示的欄位；`format=columnar` 以欄位陣列輸出記錄，減少重複的 key。
+    資料未變更時，帶上 `If-None-Match` 會直接回傳 304。
+    """
+    # 資料版本未變且查詢參數相同時，不查詢資料庫直接回傳 304
+    etag = await get_data_version_store().etag(current_user["id"], request.url.path, normalized_query(request.query_params.multi_items()))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    sessions, next_cursor = await service.get_sessions_with_activities(
+        current_user["id"], start_date, end_date, limit, cursor, include
+    )
+
+    response = Response(
+        content=_serialize_sessions(sessions, include, format),
+        media_type="application/json",
+        headers={"ETag": etag}
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_training_sessions(
+    start_date: date | None = None,
+    end_date: date | None = None,
+    format: RecordFormat = Query("rows", description="rows: 每筆記錄一個物件；columnar: 每個記錄欄位一個陣列"),
+    current_user: dict = Depends(get_current_user),
+    service: TrainingSessionService = Depends(get_training_session_service)
+):
+    """
+    以 NDJSON 串流匯出所有訓練課程（包含活動和記錄），每行一個課程
+
+    伺服器端逐頁查詢，不論歷史資料多少，記憶體用量都只有一頁。
+    開始輸出後才查詢失敗時，最後一行為 {"type": "error", "detail": ...}，表示匯出不完整。
+    """
+    pages = service.iter_session_pages(current_user["id"], start_date, end_date)
+    # 先取得第一頁，查詢失敗時仍能回傳正確的錯誤狀態碼
+    first_page = await anext(pages, [])
+
+    async def ndjson_lines():
+        if first_page:
+            yield _serialize_ndjson(first_page, format)
+        # 回應標頭已送出，之後的錯誤只能寫在串流中
+        try:
+            async for page in pages:
+                yield _serialize_ndjson(page, format)
+        except HTTPException as e:
+            yield to_json({"type": "error", "detail": e.detail}) + b"\n"
+        except Exception as e:
+            print(f"Error exporting training sessions: {e}")
+            yield to_json({"type": "error", "detail": f"Failed to export training sessions: {str(e)}"}) + b"\n"
+
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="training-sessions.ndjson"'}
+    )
+
+@router.get("/calendar", response_model=List[TrainingCalendarDayResponse])
+async def get_training_calendar(
+    request: Request,
+    start_date: date,
+    end_date: date,
+    current_user: dict = Depends(get_current_user),
+    service: TrainingSessionService = Depends(get_training_session_service)
+):
+    """
+    取得每日訓練彙總（課程數、活動數、組數、總訓練量），只回傳有訓練的日期
+
+    彙總在資料庫端計算，供行事曆與熱度圖使用。
+    """
+    etag = await get_data_version_store().etag(current_user["id"], request.url.path, normalized_query(request.query_params.multi_items()))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    days = await service.get_calendar(current_user["id"], start_date, end_date)
+    return Response(
+        content=calendar_adapter.dump_json(calendar_adapter.validate_python(days)),
+        media_type="application/json",
+        headers={"ETag": etag}
+    )
+
+@router.post("/{session_id}/clone", response_model=TrainingSessionResponse, status_code=status.HTTP_201_CREATED)
+async def clone_training_session(
+    session_id: str,
+    options: SessionInstantiate,
+    current_user: dict = Depends(get_current_user),
+    service: WorkoutTemplateService = Depends(get_workout_template_service),
+    idempotent: IdempotentRequest = Depends(get_idempotent_request)
+):
+    """
+    將既有課程（含活動與記錄）複製到新的日期，例如重複上週的訓練
+
+    複製在資料庫端一次完成。
     """
-    return service.get_sessions_with_activities(current_user["id"], start_date, end_date)
+    return await idempotent.run(options, lambda: service.clone_session(current_user["id"], session_id, options))
 
 @router.put("/{session_id}", response_model=TrainingSessionResponse)
 async def update_training_session(
     session_id: str,
     session_update: TrainingSessionUpdate,
     current_user: dict = Depends(get_current_user),
-    service: TrainingSessionService = Depends()
+    service: TrainingSessionService = Depends(get_training_session_service)
 ):
     """更新選定課程（id）資訊"""
-    return service.update_session(current_user["id"], session_id, session_update)
+    return await service.update_session(current_user["id"], session_id, session_update)
     
 @router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_training_session(
     session_id: str,
     current_user: dict = Depends(get_current_user),
-    service: TrainingSessionService = Depends()
+    service: TrainingSessionService = Depends(get_training_session_service)
 ):
     """刪除訓練課程"""
-    service.delete_session(current_user["id"], session_id)
+    await service.delete_session(current_user["id"], session_id)
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, status
+from typing import List
+from app.dependencies.auth import get_current_user
+from app.dependencies.idempotency import IdempotentRequest, get_idempotent_request
+from app.dependencies.services import get_workout_template_service
+from app.models.workout_templates import WorkoutTemplateCreate, WorkoutTemplateResponse, SessionInstantiate
+from app.models.training_sessions import TrainingSessionResponse
+from app.services.workout_template_service import WorkoutTemplateService
+
+router = APIRouter(
+    prefix="/api/workout-templates",
+    tags=["workout templates"]
+)
+
+@router.post("", response_model=WorkoutTemplateResponse, status_code=status.HTTP_201_CREATED)
+async def create_workout_template(
+    template: WorkoutTemplateCreate,
+    current_user: dict = Depends(get_current_user),
+    service: WorkoutTemplateService = Depends(get_workout_template_service),
+    idempotent: IdempotentRequest = Depends(get_idempotent_request)
+):
+    """將既有課程的活動與記錄保存為範本"""
+    return await idempotent.run(template, lambda: service.create_template(current_user["id"], template))
+
+@router.get("", response_model=List[WorkoutTemplateResponse])
+async def get_workout_templates(
+    current_user: dict = Depends(get_current_user),
+    service: WorkoutTemplateService = Depends(get_workout_template_service)
+):
+    """取得使用者的所有範本（由新到舊）"""
+    return await service.get_templates(current_user["id"])
+
+@router.post("/{template_id}/instantiate", response_model=TrainingSessionResponse, status_code=status.HTTP_201_CREATED)
+async def instantiate_workout_template(
+    template_id: str,
+    options: SessionInstantiate,
+    current_user: dict = Depends(get_current_user),
+    service: WorkoutTemplateService = Depends(get_workout_template_service),
+    idempotent: IdempotentRequest = Depends(get_idempotent_request)
+):
+    """
+    依範本在指定日期建立新課程
+
+    活動與記錄在資料庫端一次複製，不需逐一呼叫建立活動的 API。
+    """
+    return await idempotent.run(options, lambda: service.instantiate_template(current_user["id"], template_id, options))
+
+@router.delete("/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_workout_template(
+    template_id: str,
+    current_user: dict = Depends(get_current_user),
+    service: WorkoutTemplateService = Depends(get_workout_template_service)
+):
+    """刪除範本（不影響由範本建立的課程）"""
+    await service.delete_template(current_user["id"], template_id)
@@ -1,96 +1,87 @@
+import os
 from fastapi import HTTPException, status
 from typing import List
-from decimal import Decimal
-from supabase import Client
+from supabase import AsyncClient, PostgrestAPIError
 from app.database import database
+from app.services import data_version
 from app.models.training_activities import (
     TrainingActivityWithRecordsCreate,
-    ActivityRecordUpdate
+    ActivityRecordCreate,
+    ActivityRecordUpdate,
+    ActivityRecordPatch,
+    RECORD_COLUMNS
 )
 
+# 資料庫函式找不到資料（或不屬於該使用者）時拋出的 SQLSTATE（no_data_found）
+NOT_FOUND_ERROR_CODE = "P0002"
+# 記錄 ID 已屬於其他活動時拋出的 SQLSTATE（unique_violation）
+CONFLICT_ERROR_CODE = "23505"
+
+def _numbers_to_float(row: dict) -> dict:
+    """Decimal 無法直接序列化為 JSON，數值欄位統一轉為 float"""
+    for field in ("weight", "distance", "score"):
+        if row.get(field) is not None:
+            row[field] = float(row[field])
+    return row
+
+def _record_row(record: dict) -> dict:
+    """取出記錄欄位，轉為 RPC 的輸入"""
+    return _numbers_to_float({field: record.get(field) for field in RECORD_COLUMNS})
+
+def _new_record_row(record: ActivityRecordCreate) -> dict:
+    return _numbers_to_float({
+        "set_number": record.set_number,
+        "repetition": record.get_reps,
+        "weight": record.weight,
+        "duration": record.duration,
+        "distance": record.distance,
+        "score": record.score
+    })
+
+# 批次建立活動時單次請求的最大活動數
+ACTIVITIES_BATCH_MAX_ITEMS = int(os.getenv("ACTIVITIES_BATCH_MAX_ITEMS", "50"))
+
 class ActivityService:
     def __init__(self):
-        self.supabase: Client = database.get_supabase_admin()
+        self.supabase: AsyncClient = database.get_async_supabase_admin()
 
-    def create_activity(self, user_id: str, activity: TrainingActivityWithRecordsCreate):
+    async def create_activity(self, user_id: str, activity: TrainingActivityWithRecordsCreate):
+        """
+        透過 create_activity_with_records RPC 在單一交易中確認課程擁有者、
+        建立活動與所有記錄，任何一步失敗都不會留下部分資料
+        """
         try:
-            # 1. 驗證 session 存在且屬於當前使用者
-            session_response = self.supabase.table("training_sessions")\
-                .select("*")\
-                .eq("id", activity.session_id)\
-                .eq("user_id", user_id)\
-                .execute()
-            
-            if not session_response.data:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Training session not found or you don't have permission"
-                )
-            
-            # 2. 建立 training_activity
-            activity_data = {
-                "session_id": activity.session_id,
-                "name": activity.name,
-                "category": activity.category,
-                "description": activity.description
-            }
-            
-            activity_response = self.supabase.table("training_activities")\
-                .insert(activity_data)\
-                .execute()
-
-            if not activity_response.data:
+            records_data = [_new_record_row(record) for record in activity.activity_records]
+
+            response = await self.supabase.rpc("create_activity_with_records", {
+                "p_user_id": user_id,
+                "p_session_id": activity.session_id,
+                "p_name": activity.name,
+                "p_category": activity.category,
+                "p_description": activity.description,
+                "p_records": records_data
+            }).execute()
+
+            if not response.data:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Failed to create training activity"
                 )
-            
-            created_activity = activity_response.data[0]
-            activity_id = created_activity["id"]
-            
-            # 3. 建立 activity_records（批次插入）
-            created_records = []
-            
-            if activity.activity_records:
-                records_data = []
-                for record in activity.activity_records:
-                    record_data = {
-                        "activity_id": activity_id,
-                        "set_number": record.set_number,
-                        "repetition": record.repetition,
-                        "weight": float(record.weight) if record.weight else None,
-                        "duration": record.duration,
-                        "distance": float(record.distance) if record.distance else None,
-                        "score": float(record.score) if record.score else None
-                    }
-                    records_data.append(record_data)
-                
-                # 批次插入所有 records
-                if records_data:
-                    records_response = self.supabase.table("activity_records")\
-                        .insert(records_data)\
-                        .execute()
-                    
-                    if not records_response.data:
-                        # 如果 records 插入失敗，刪除已建立的 activity
-                        self.supabase.table("training_activities").delete().eq("id", activity_id).execute()
-                        raise HTTPException(
-                            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                            detail="Failed to create activity records"
-                        )
-                    
-                    created_records = records_response.data
-
-            # 4. 組合回應
-            return {
-                "id": created_activity["id"],
-                "session_id": created_activity["session_id"],
-                "name": created_activity["name"],
-                "category": created_activity["category"],
-                "description": created_activity["description"],
-                "records": created_records
-            }
-        
+
+            await data_version.record_change(user_id)
+            return response.data
+
+        except PostgrestAPIError as e:
+            if e.code == NOT_FOUND_ERROR_CODE:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Training session not found or you don't have permission"
+                )
+            print(f"Error creating activity with records: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to create activity: {e.message}"
+            )
         except HTTPException:
             raise
         except Exception as e:
@@ -100,61 +91,108 @@ class ActivityService:
                 detail=f"Failed to create activity: {str(e)}"
             )
 
-    def update_records(self, activity_id: str, records_to_process: List[ActivityRecordUpdate]):
+    async def create_activities(self, user_id: str, activities: List[TrainingActivityWithRecordsCreate]) -> list[dict]:
+        """
+        一次建立同一課程的多個活動（create_activities_with_records RPC），
+        擁有者只檢查一次，依輸入順序回傳建立的活動與記錄
+        """
+        session_ids = {activity.session_id for activity in activities}
+        if len(session_ids) != 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="All activities must belong to the same training session"
+            )
+
         try:
-            # 1. 數據驗證與準備
-            if not records_to_process:
-                # 如果前端傳來空列表，意味著要刪除該 activity 下所有 records
-                ids_to_keep = []
-            else:
-                # 提取所有需要保留 (更新/插入) 的 Record ID 集合
-                ids_to_keep = [record.id for record in records_to_process if record.id]
-                
-                # 確保所有傳入的 records 都屬於這個 activity_id
-                for record in records_to_process:
-                    if record.activity_id != activity_id:
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=f"Record ID {record.id} belongs to a different activity."
-                        )
-
-            # 刪除不再存在的 Records ---
-            if ids_to_keep:
-                # 刪除所有屬於該 activity，但其 ID 不在 ids_to_keep 列表中的記錄
-                self.supabase.table("activity_records")\
-                    .delete()\
-                    .eq("activity_id", activity_id)\
-                    .not_.in_("id", ids_to_keep)\
-                    .execute()
-            else:
-                # 如果 ids_to_keep 為空，則刪除該 activity 下所有記錄
-                self.supabase.table("activity_records")\
-                    .delete()\
-                    .eq("activity_id", activity_id)\
-                    .execute()
-                
-            # 更新/插入現有及新增的 Records ---
-            updates = []
-            for record in records_to_process:
-                record_dict = record.model_dump(exclude_none=True, by_alias=False)
-                
-                # **關鍵修復：手動將 Decimal 轉換為 float**
-                cleaned_dict = {}
-                for key, value in record_dict.items():
-                    if isinstance(value, Decimal):
-                        cleaned_dict[key] = float(value) 
-                    else:
-                        cleaned_dict[key] = value
-                
-                updates.append(cleaned_dict)
-
-            if updates:
-                self.supabase.table("activity_records").upsert(updates).execute()
-            
-            return
-            
+            response = await self.supabase.rpc("create_activities_with_records", {
+                "p_user_id": user_id,
+                "p_session_id": session_ids.pop(),
+                "p_activities": [
+                    {
+                        "name": activity.name,
+                        "category": activity.category,
+                        "description": activity.description,
+                        "records": [_new_record_row(record) for record in activity.activity_records]
+                    }
+                    for activity in activities
+                ]
+            }).execute()
+
+            if len(response.data or []) != len(activities):
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Failed to create training activities"
+                )
+
+            await data_version.record_change(user_id)
+            return response.data
+
+        except PostgrestAPIError as e:
+            if e.code == NOT_FOUND_ERROR_CODE:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Training session not found or you don't have permission"
+                )
+            print(f"Error creating activities with records: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to create activities: {e.message}"
+            )
         except HTTPException:
             raise
+        except Exception as e:
+            print(f"Error creating activities with records: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to create activities: {str(e)}"
+            )
+
+    async def update_records(self, user_id: str, activity_id: str, records_to_process: List[ActivityRecordUpdate]) -> dict:
+        """
+        以傳入的記錄取代活動底下的所有記錄（集合替換）。
+        比對與寫入都在 apply_activity_record_changes RPC 的單一交易中完成，只寫入有變動的記錄，
+        回傳資料庫實際新增、更新與刪除的記錄 ID。
+        """
+        for record in records_to_process:
+            if record.activity_id != activity_id:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Record ID {record.id} belongs to a different activity."
+                )
+
+        seen, duplicates = set(), []
+        for record in records_to_process:
+            if record.id in seen and record.id not in duplicates:
+                duplicates.append(record.id)
+            seen.add(record.id)
+        if duplicates:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                detail=f"Duplicate record IDs: {', '.join(duplicates)}"
+            )
+
+        try:
+            response = await self.supabase.rpc("apply_activity_record_changes", {
+                "p_user_id": user_id,
+                "p_activity_id": activity_id,
+                "p_records": [_record_row(record.model_dump()) for record in records_to_process]
+            }).execute()
+        except PostgrestAPIError as e:
+            if e.code == NOT_FOUND_ERROR_CODE:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Training activity not found"
+                )
+            if e.code == CONFLICT_ERROR_CODE:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=e.message
+                )
+            print(f"Error during set replacement for activity {activity_id}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to update activity records: {e.message}"
+            )
         except Exception as e:
             print(f"Error during set replacement for activity {activity_id}: {e}")
             raise HTTPException(
@@ -162,37 +200,85 @@ class ActivityService:
                 detail=f"Failed to update activity records: {str(e)}"
             )
 
-    def delete_activity(self, user_id: str, activity_id: str):
+        changes = response.data
+        if any(changes.values()):
+            await data_version.record_change(user_id)
+        return changes
+
+    async def append_record(self, user_id: str, activity_id: str, record: ActivityRecordCreate):
+        """新增單組記錄（append_activity_record RPC），不需重送整個記錄列表"""
+        return await self._call_record_rpc(user_id, "append_activity_record", {
+            "p_user_id": user_id,
+            "p_activity_id": activity_id,
+            "p_record": _new_record_row(record)
+        }, not_found_detail="Training activity not found")
+
+    async def patch_record(self, user_id: str, record_id: str, changes: ActivityRecordPatch):
+        """只修改有傳入的欄位（update_activity_record RPC）"""
+        change_data = _numbers_to_float(changes.model_dump(exclude_unset=True))
+        if not change_data:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No fields to update"
+            )
+
+        return await self._call_record_rpc(user_id, "update_activity_record", {
+            "p_user_id": user_id,
+            "p_record_id": record_id,
+            "p_changes": change_data
+        }, not_found_detail="Activity record not found")
+
+    async def _call_record_rpc(self, user_id: str, function: str, params: dict, not_found_detail: str) -> dict:
         try:
-            # 驗證 activity 存在且屬於當前使用者的 session
-            activity_response = self.supabase.table("training_activities")\
-                .select("*, training_sessions!inner(user_id)")\
-                .eq("id", activity_id)\
-                .execute()
-            
-            if not activity_response.data:
+            response = await self.supabase.rpc(function, params).execute()
+        except PostgrestAPIError as e:
+            if e.code == NOT_FOUND_ERROR_CODE:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Training activity not found"
+                    detail=not_found_detail
                 )
-            
-            # 檢查是否屬於當前使用者
-            if activity_response.data[0]["training_sessions"]["user_id"] != user_id:
+            print(f"Error calling {function}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to save activity record: {e.message}"
+            )
+        except Exception as e:
+            print(f"Error calling {function}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to save activity record: {str(e)}"
+            )
+
+        await data_version.record_change(user_id)
+        return response.data
+
+    async def delete_activity(self, user_id: str, activity_id: str):
+        """
+        透過 delete_training_activity RPC 以單一語句完成擁有者檢查與刪除。
+        不存在或不屬於該使用者的活動一律回傳 404，不透露活動是否存在
+        """
+        try:
+            await self.supabase.rpc("delete_training_activity", {
+                "p_user_id": user_id,
+                "p_activity_id": activity_id
+            }).execute()
+
+        except PostgrestAPIError as e:
+            if e.code == NOT_FOUND_ERROR_CODE:
                 raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="You don't have permission to delete this activity"
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Training activity not found"
                 )
-            
-            # 刪除活動（records 會自動刪除）
-            self.supabase.table("training_activities").delete().eq("id", activity_id).execute()
-            
-            return
-        
-        except HTTPException:
-            raise
+            print(f"Error deleting activity: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to delete activity: {e.message}"
+            )
         except Exception as e:
             print(f"Error deleting activity: {e}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to delete activity: {str(e)}"
             )
+
+        await data_version.record_change(user_id)
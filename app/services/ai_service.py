@@ -1,17 +1,37 @@
 from fastapi import HTTPException, status
 from google import genai
 from app.database import database
+from app.services import data_version
+from app.services.data_version import DataVersionStore
+from app.cache import session_cache
+from app.cache.backends import CacheBackend
+from app.cache.session_cache import make_cache_key
 from app.models.ai import DateRange
 import os
 
 class AIService:
     def __init__(self):
-        self.supabase = database.get_supabase_admin()
+        self.supabase = database.get_async_supabase_admin()
         self.gemini_api_key = os.getenv("GEMINI_API_KEY")
         if not self.gemini_api_key:
              # Just a warning or handle gracefully, though env should have it
              pass
-        self.gemini_client = genai.Client(api_key=self.gemini_api_key)
+        self._gemini_client: genai.Client | None = None
+        self.data_versions: DataVersionStore = data_version.get_data_version_store()
+        self.session_cache: CacheBackend = session_cache.get_session_cache()
+
+    @property
+    def gemini_client(self) -> genai.Client:
+        # 第一次使用時才建立，之後重複使用同一個 Client 與其 HTTP 連線
+        if self._gemini_client is None:
+            self._gemini_client = genai.Client(api_key=self.gemini_api_key)
+        return self._gemini_client
+
+    async def aclose(self):
+        if self._gemini_client is not None:
+            await self._gemini_client.aio.aclose()
+            self._gemini_client.close()
+            self._gemini_client = None
 
     def _format_training_data(self, sessions: list) -> str:
         """將訓練數據格式化為精簡文字以節省 Token"""
@@ -35,25 +55,37 @@ class AIService:
             formatted_text += "\n"
         return formatted_text
 
+    async def _get_context_sessions(self, user_id: str, date_range: DateRange) -> list:
+        """讀取對話用的訓練紀錄，與課程查詢共用同一個使用者快取"""
+        # 查詢前取得資料版本，查詢期間的寫入不會讓舊資料留在新版本的快取中
+        version = await self.data_versions.get(user_id)
+        cache_key = make_cache_key("ai_context", version, date_range.start_date, date_range.end_date)
+        cached_sessions = await self.session_cache.get(user_id, cache_key)
+        if cached_sessions is not None:
+            return cached_sessions
+
+        query = self.supabase.table("training_sessions")\
+        .select("date, note, title, activities:training_activities(category, description, name, records:activity_records(repetition, set_number, weight))")\
+        .eq("user_id", user_id)
+        
+        if date_range.start_date:
+            query = query.gte("date", date_range.start_date.isoformat())
+        if date_range.end_date:
+            query = query.lte("date", date_range.end_date.isoformat())
+        
+        query = query.order("date", desc=True).limit(20)
+        
+        sessions_response = await query.execute()
+        sessions_data = sessions_response.data or []
+        await self.session_cache.set(user_id, cache_key, sessions_data)
+        return sessions_data
+
     async def chat_with_analysis(self, user_id: str, message: str, date_range: DateRange | None):
         try:
             sessions_data = []
 
             if date_range:
-                query = self.supabase.table("training_sessions")\
-                .select("date, note, title, activities:training_activities(category, description, name, records:activity_records(repetition, set_number, weight))")\
-                .eq("user_id", user_id)
-                
-                if date_range.start_date:
-                    query = query.gte("date", date_range.start_date.isoformat())
-                if date_range.end_date:
-                    query = query.lte("date", date_range.end_date.isoformat())
-                
-                query = query.order("date", desc=True).limit(20)
-                
-                sessions_response = query.execute()
-                if sessions_response.data:
-                    sessions_data = sessions_response.data
+                sessions_data = await self._get_context_sessions(user_id, date_range)
 
             context_str = self._format_training_data(sessions_data)
             
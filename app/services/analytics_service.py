@@ -0,0 +1,145 @@
+import os
+import numpy as np
+from fastapi import HTTPException, status
+from typing import Optional
+from datetime import date
+from supabase import AsyncClient
+from app.database import database
+from app.services import data_version
+from app.services.data_version import DataVersionStore
+from app.cache import session_cache
+from app.cache.backends import CacheBackend
+from app.cache.session_cache import make_cache_key
+from app.models.analytics import E1RMFormula
+
+# 滾動訓練量可設定的最大天數
+PROGRESSION_MAX_WINDOW_DAYS = int(os.getenv("PROGRESSION_MAX_WINDOW_DAYS", "365"))
+
+# Brzycki 公式在 37 次時分母為 0，超過 36 次以 36 次計算
+BRZYCKI_MAX_REPS = 36
+
+def epley(weight: np.ndarray, reps: np.ndarray) -> np.ndarray:
+    """Epley：weight x (1 + reps / 30)；單次即為實際重量"""
+    return np.where(reps == 1, weight, weight * (1 + reps / 30))
+
+def brzycki(weight: np.ndarray, reps: np.ndarray) -> np.ndarray:
+    """Brzycki：weight x 36 / (37 - reps)"""
+    return weight * 36 / (37 - np.minimum(reps, BRZYCKI_MAX_REPS))
+
+E1RM_FORMULAS = {"epley": epley, "brzycki": brzycki}
+
+def rolling_sum(days: np.ndarray, values: np.ndarray, window_days: int) -> np.ndarray:
+    """
+    days 為遞增且不重複的日期（datetime64[D]），
+    回傳每個位置 (days[i] - window_days, days[i]] 內 values 的總和
+    """
+    totals = np.concatenate(([0.0], np.cumsum(values)))
+    window_start = np.searchsorted(days, days - np.timedelta64(window_days - 1, "D"), side="left")
+    return totals[1:] - totals[window_start]
+
+def compute_progression(columns: dict, window_days: int = 7, formula: E1RMFormula = "epley") -> dict:
+    """
+    以 exercise_set_columns 回傳的欄位陣列（依日期排序）計算每組的估算 1RM、
+    每日訓練量、滾動訓練量與每日最佳組，全部以向量運算完成
+    """
+    days = np.asarray(columns["date"], dtype="datetime64[D]")
+    set_numbers = np.asarray(columns["set_number"], dtype=np.int64)
+    weights = np.asarray(columns["weight"], dtype=np.float64)
+    reps = np.asarray(columns["repetition"], dtype=np.int64)
+
+    volume = weights * reps
+    e1rm = {name: function(weights, reps) for name, function in E1RM_FORMULAS.items()}
+
+    # 資料已依日期排序，同一天的組相鄰；day_starts 為每天第一組的位置
+    unique_days, day_starts, day_counts = np.unique(days, return_index=True, return_counts=True)
+    if len(days):
+        daily_volume = np.add.reduceat(volume, day_starts)
+        daily_weight = np.add.reduceat(weights, day_starts) / day_counts
+    else:
+        daily_volume = daily_weight = np.zeros(0)
+
+    # 先依日期、再依估算 1RM 排序，每天的最後一組即為最佳組
+    day_index = np.repeat(np.arange(len(unique_days)), day_counts)
+    order = np.lexsort((e1rm[formula], day_index))
+    best = order[day_starts + day_counts - 1]
+
+    # 只有徒手（重量 0）的日子最佳估算 1RM 為 0，強度以 0 表示，避免 NaN 無法輸出為 JSON
+    best_e1rm = e1rm[formula][best]
+    intensity = np.divide(daily_weight, best_e1rm, out=np.zeros_like(daily_weight), where=best_e1rm > 0)
+
+    return {
+        "sets": {
+            "date": np.datetime_as_string(days).tolist(),
+            "set_number": set_numbers.tolist(),
+            "weight": weights.tolist(),
+            "repetition": reps.tolist(),
+            "volume": np.round(volume, 2).tolist(),
+            "e1rm_epley": np.round(e1rm["epley"], 2).tolist(),
+            "e1rm_brzycki": np.round(e1rm["brzycki"], 2).tolist()
+        },
+        "days": {
+            "date": np.datetime_as_string(unique_days).tolist(),
+            "volume": np.round(daily_volume, 2).tolist(),
+            "rolling_volume": np.round(rolling_sum(unique_days, daily_volume, window_days), 2).tolist(),
+            "best_set_number": set_numbers[best].tolist(),
+            "best_weight": weights[best].tolist(),
+            "best_repetition": reps[best].tolist(),
+            "best_e1rm": np.round(best_e1rm, 2).tolist(),
+            "intensity": np.round(intensity, 3).tolist()
+        }
+    }
+
+class AnalyticsService:
+    def __init__(self):
+        self.supabase: AsyncClient = database.get_async_supabase_admin()
+        self.data_versions: DataVersionStore = data_version.get_data_version_store()
+        self.session_cache: CacheBackend = session_cache.get_session_cache()
+
+    async def get_progression(
+        self,
+        user_id: str,
+        exercise: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        window_days: int = 7,
+        formula: E1RMFormula = "epley"
+    ) -> dict:
+        """
+        取得單一動作的進步分析（估算 1RM、訓練量、每日最佳組）。
+        結果存放在使用者的讀取快取中，資料異動時隨其他快取一起失效。
+        """
+        if start_date and end_date and start_date > end_date:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="start_date must not be after end_date"
+            )
+
+        # 查詢前取得資料版本，查詢期間的寫入不會讓舊結果留在新版本的快取中
+        version = await self.data_versions.get(user_id)
+        cache_key = make_cache_key("progression", version, exercise.lower(), start_date, end_date, window_days, formula)
+        cached = await self.session_cache.get(user_id, cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await self.supabase.rpc("exercise_set_columns", {
+                "p_user_id": user_id,
+                "p_exercise": exercise,
+                "p_start_date": start_date.isoformat() if start_date else None,
+                "p_end_date": end_date.isoformat() if end_date else None
+            }).execute()
+        except Exception as e:
+            print(f"Error fetching exercise sets: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch exercise sets: {str(e)}"
+            )
+
+        result = {
+            "exercise": exercise,
+            "formula": formula,
+            "window_days": window_days,
+            **compute_progression(response.data, window_days, formula)
+        }
+        await self.session_cache.set(user_id, cache_key, result)
+        return result
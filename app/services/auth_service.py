@@ -1,14 +1,34 @@
+import os
+import hashlib
+import jwt
 from fastapi import HTTPException, status
-from supabase import Client, AuthApiError
+from supabase import AsyncClient, AuthApiError
 from app.database import database
+from app.cache.ttl_cache import TTLCache
+from app.services import jwt_verifier
+from app.services.jwt_verifier import JWTVerifier, claims_to_user
+
+# 已驗證的使用者快取（以 token 雜湊為 key），到期時間不晚於 token 的 exp
+user_cache = TTLCache(
+    max_size=int(os.getenv("AUTH_USER_CACHE_SIZE", "2048")),
+    ttl_seconds=float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+)
+
+def get_user_cache() -> TTLCache:
+    return user_cache
+
+def _token_cache_key(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode()).hexdigest()
 
 class AuthService:
     def __init__(self):
-        self.supabase: Client = database.get_supabase_client()
+        self.supabase: AsyncClient = database.get_async_supabase_client()
+        self.jwt_verifier: JWTVerifier = jwt_verifier.get_jwt_verifier()
+        self.user_cache: TTLCache = get_user_cache()
 
-    def signup(self, email: str, password: str, username: str):
+    async def signup(self, email: str, password: str, username: str):
         try:
-            response = self.supabase.auth.sign_up({
+            response = await self.supabase.auth.sign_up({
                 "email": email,
                 "password": password,
                 "options": {
@@ -24,7 +44,7 @@ class AuthService:
             
             auth_user_id = response.user.id 
 
-            self.supabase.table("users").insert({
+            await self.supabase.table("users").insert({
                 "id": auth_user_id,
                 "email": email,
                 "username": username
@@ -55,9 +75,9 @@ class AuthService:
                 detail=f"Registration failed: {str(e)}"
             )
 
-    def login(self, email: str, password: str):
+    async def login(self, email: str, password: str):
         try:
-            supabase_response = self.supabase.auth.sign_in_with_password({
+            supabase_response = await self.supabase.auth.sign_in_with_password({
                 "email": email,
                 "password": password
             })
@@ -83,9 +103,9 @@ class AuthService:
                 detail=f"Login failed: {str(e)}"
             )
 
-    def resend_verification(self, email: str):
+    async def resend_verification(self, email: str):
         try:
-            self.supabase.auth.resend({
+            await self.supabase.auth.resend({
                 "type": "signup",
                 "email": email
             })
@@ -103,9 +123,48 @@ class AuthService:
                 detail=f"重發失敗: {str(e)}"
             )
 
-    def get_user_by_token(self, access_token: str):
+    async def get_user_by_token(self, access_token: str):
+        cache_key = _token_cache_key(access_token)
+        cached_user = self.user_cache.get(cache_key)
+        if cached_user is not None:
+            return cached_user
+
+        user, expires_at = await self._resolve_user(access_token)
+        if expires_at is not None:
+            self.user_cache.set(cache_key, user, expires_at=expires_at)
+        return user
+
+    def invalidate_token(self, access_token: str):
+        """登出時移除該 token 的快取"""
+        self.user_cache.delete(_token_cache_key(access_token))
+
+    async def _resolve_user(self, access_token: str) -> tuple[dict, float | None]:
+        """驗證 token，回傳使用者資料與 token 的到期時間（epoch 秒）"""
+        if self.jwt_verifier.enabled:
+            try:
+                claims = await self.jwt_verifier.verify(access_token)
+            except jwt.InvalidTokenError:
+                raise HTTPException(401, "Invalid or expired token")
+
+            # claims 為 None 代表無法在本機驗證，改由 Supabase Auth 驗證
+            if claims is not None and not self.jwt_verifier.revocation_check:
+                return claims_to_user(claims), claims.get("exp")
+
+        user = await self._get_user_remote(access_token)
+        return user, self._get_token_expiry(access_token)
+
+    @staticmethod
+    def _get_token_expiry(access_token: str) -> float | None:
+        # token 已由 Supabase Auth 驗證過，這裡只讀取 exp 作為快取期限
+        try:
+            claims = jwt.decode(access_token, options={"verify_signature": False})
+            return claims.get("exp")
+        except jwt.InvalidTokenError:
+            return None
+
+    async def _get_user_remote(self, access_token: str):
         try:
-            response = self.supabase.auth.get_user(access_token)
+            response = await self.supabase.auth.get_user(access_token)
             if not response.user:
                 raise HTTPException(401, "Invalid or expired token")
             
@@ -0,0 +1,117 @@
+import os
+import json
+import uuid
+import base64
+from fastapi import HTTPException, status
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+from supabase import AsyncClient
+from app.database import database
+
+# 查詢時往前多取的秒數：較早開始但較晚提交的交易，其 updated_at 可能早於上一次的 token
+CHANGES_OVERLAP_SECONDS = float(os.getenv("CHANGES_OVERLAP_SECONDS", "5"))
+# tombstone 保留天數，早於此期限的 token 需重新完整同步
+CHANGES_RETENTION_DAYS = int(os.getenv("CHANGES_RETENTION_DAYS", "30"))
+
+# 每頁最多回傳的資料筆數（課程、活動、記錄與 tombstone 合計）
+CHANGES_PAGE_SIZE = int(os.getenv("CHANGES_PAGE_SIZE", "1000"))
+
+# 分頁位置中的資料種類，與 changes_since 的排序一致
+CHANGE_KINDS = (1, 2, 3, 4)
+
+def encode_change_token(until: datetime, since: datetime | None = None, after: dict | None = None) -> str:
+    """
+    以資料庫時間產生不透明的同步 token，避免應用程式與資料庫的時鐘誤差。
+    after 不為 None 時為同一次同步的下一頁，另外記錄查詢起點與上一頁最後一筆的位置。
+    """
+    payload = {"until": until.isoformat()}
+    if after is not None:
+        payload["since"] = since.isoformat() if since is not None else None
+        payload["after"] = after
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def _aware_datetime(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        raise ValueError("datetime without timezone")
+    return parsed
+
+def decode_change_token(token: str) -> dict:
+    """回傳 {"until", "since", "after"}；不是分頁 token 時 since 與 after 為 None"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        decoded = {"until": _aware_datetime(payload["until"]), "since": None, "after": None}
+        if "after" in payload:
+            after = payload["after"]
+            # 驗證格式，分頁位置會直接傳給資料庫函式
+            if after["kind"] not in CHANGE_KINDS:
+                raise ValueError("unknown kind")
+            decoded["after"] = {
+                "kind": after["kind"],
+                "changed_at": _aware_datetime(after["changed_at"]).isoformat(),
+                "id": str(uuid.UUID(after["id"]))
+            }
+            if payload["since"] is not None:
+                decoded["since"] = _aware_datetime(payload["since"])
+        return decoded
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid change token"
+        )
+
+class ChangeService:
+    def __init__(self):
+        self.supabase: AsyncClient = database.get_async_supabase_admin()
+
+    async def get_changes(self, user_id: str, since_token: Optional[str] = None, limit: Optional[int] = None) -> dict:
+        """
+        回傳 token 之後變動的課程、活動、記錄與刪除的資料（changes_since RPC）。
+        未傳入 token 時回傳全部資料，作為首次同步；
+        每次查詢會與上一次重疊 CHANGES_OVERLAP_SECONDS 秒，用戶端需以 ID 覆寫，重複的資料不影響結果。
+        每頁最多 CHANGES_PAGE_SIZE 筆，has_more 為 true 時以 next_token 繼續取得同一次同步的下一頁。
+        """
+        page_size = min(limit or CHANGES_PAGE_SIZE, CHANGES_PAGE_SIZE)
+        since, until, after = None, None, None
+        if since_token is not None:
+            token = decode_change_token(since_token)
+            if token["after"] is not None:
+                # 同一次同步的下一頁，沿用第一頁的查詢區間
+                since, until, after = token["since"], token["until"], token["after"]
+            else:
+                since = token["until"] - timedelta(seconds=CHANGES_OVERLAP_SECONDS)
+            if since is not None and since < datetime.now(timezone.utc) - timedelta(days=CHANGES_RETENTION_DAYS):
+                raise HTTPException(
+                    status_code=status.HTTP_410_GONE,
+                    detail="Change token expired, perform a full sync"
+                )
+
+        try:
+            response = await self.supabase.rpc("changes_since", {
+                "p_user_id": user_id,
+                "p_since": since.isoformat() if since is not None else None,
+                "p_until": until.isoformat() if until is not None else None,
+                "p_after_kind": after["kind"] if after else None,
+                "p_after_at": after["changed_at"] if after else None,
+                "p_after_id": after["id"] if after else None,
+                "p_limit": page_size
+            }).execute()
+        except Exception as e:
+            print(f"Error fetching changes: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch changes: {str(e)}"
+            )
+
+        changes = response.data
+        until = datetime.fromisoformat(changes["until"])
+        next_page = changes.get("next")
+        return {
+            "sessions": changes["sessions"],
+            "activities": changes["activities"],
+            "records": changes["records"],
+            "deleted": changes["deleted"],
+            "has_more": next_page is not None,
+            "next_token": encode_change_token(until, since, next_page) if next_page else encode_change_token(until)
+        }
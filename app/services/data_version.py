@@ -0,0 +1,71 @@
+import os
+import uuid
+import hashlib
+from app.cache import session_cache
+from app.cache.backends import CacheBackend, InMemoryCacheBackend
+
+_VERSION_KEY = "data_version"
+
+
+class DataVersionStore:
+    """
+    記錄每位使用者訓練資料的版本，用於產生讀取端點的 ETag 與讀取快取的 key。
+    版本不會過期，只在寫入（bump）時改變，沒有寫入時 ETag 保持不變。
+    版本存放在 CacheBackend：多個 worker 時須換成共享後端（例如 Redis），所有 worker 才會看到相同的版本。
+    版本因容量上限被淘汰時會產生新的版本，只會讓快取與 ETag 多失效一次，不會回傳舊資料。
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    async def get(self, user_id: str) -> str:
+        version = await self.backend.get(user_id, _VERSION_KEY)
+        if version is not None:
+            return version
+
+        # 尚無版本（或已被淘汰）時產生新的版本；同時有其他請求寫入時沿用對方的版本
+        candidate = uuid.uuid4().hex
+        if await self.backend.add(user_id, _VERSION_KEY, candidate):
+            return candidate
+        return await self.backend.get(user_id, _VERSION_KEY) or candidate
+
+    async def bump(self, user_id: str):
+        await self.backend.set(user_id, _VERSION_KEY, uuid.uuid4().hex)
+
+    async def etag(self, user_id: str, *parts: str) -> str:
+        """以使用者資料版本加上查詢參數產生 weak ETag"""
+        raw = "|".join([user_id, await self.get(user_id), *parts])
+        return f'W/"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"'
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """比對 If-None-Match 標頭（可能包含多個 ETag 或 *），採用 weak 比較"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def normalized_query(query_items) -> str:
+    """將查詢參數 (key, value) 排序，確保參數順序不同時仍產生相同的 ETag"""
+    return "&".join(f"{key}={value}" for key, value in sorted(query_items))
+
+
+# 版本不設到期時間，記憶體用量以使用者數上限控制
+data_versions = DataVersionStore(
+    InMemoryCacheBackend(
+        max_size=int(os.getenv("DATA_VERSION_MAX_USERS", "10000")),
+        ttl_seconds=float("inf")
+    )
+)
+
+def get_data_version_store() -> DataVersionStore:
+    return data_versions
+
+async def record_change(user_id: str):
+    """資料異動後更新使用者的資料版本（ETag）並清除其讀取快取"""
+    await get_data_version_store().bump(user_id)
+    await session_cache.get_session_cache().invalidate(user_id)
@@ -0,0 +1,100 @@
+import os
+import hashlib
+from typing import Any, Awaitable, Callable
+from fastapi import HTTPException, status
+from app.cache.backends import CacheBackend, InMemoryCacheBackend
+
+# 已完成請求的結果保留時間
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# 處理中的標記保留時間，避免 worker 中斷後 key 永遠無法使用
+IDEMPOTENCY_PENDING_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_PENDING_TTL_SECONDS", "60"))
+
+_PENDING = "pending"
+_COMPLETED = "completed"
+
+
+def request_fingerprint(*parts: str | bytes) -> str:
+    """請求內容的雜湊，用來確認同一個 key 沒有被用在不同的請求上"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """
+    以 Idempotency-Key 去除重複的建立請求。
+    第一次請求先寫入處理中的標記，成功後保存結果；之後帶相同 key 的請求直接回傳保存的結果，不再寫入資料庫。
+    資料以使用者 ID 為 namespace，不同使用者的 key 互不影響。
+    """
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: float = 86400, pending_ttl_seconds: float = 60):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.pending_ttl_seconds = pending_ttl_seconds
+        self.replays = 0
+
+    async def run(
+        self,
+        user_id: str,
+        key: str,
+        fingerprint: str,
+        operation: Callable[[], Awaitable[Any]]
+    ) -> tuple[Any, bool]:
+        """執行 operation 並回傳 (結果, 是否為重播的結果)"""
+        pending = {"state": _PENDING, "fingerprint": fingerprint}
+        if not await self.backend.add(user_id, key, pending, ttl=self.pending_ttl_seconds):
+            entry = await self.backend.get(user_id, key)
+            if entry is not None:
+                return self._replay(entry, fingerprint), True
+            # 標記剛好過期，重新取得
+            if not await self.backend.add(user_id, key, pending, ttl=self.pending_ttl_seconds):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is already in progress"
+                )
+
+        try:
+            result = await operation()
+        except BaseException:
+            # 失敗的請求不保存，讓用戶端可以用同一個 key 重試
+            await self.backend.delete(user_id, key)
+            raise
+
+        await self.backend.set(
+            user_id, key,
+            {"state": _COMPLETED, "fingerprint": fingerprint, "result": result},
+            ttl=self.ttl_seconds
+        )
+        return result, False
+
+    def _replay(self, entry: dict, fingerprint: str) -> Any:
+        if entry["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        if entry["state"] == _PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is already in progress"
+            )
+        self.replays += 1
+        return entry["result"]
+
+    def stats(self) -> dict:
+        return {**self.backend.stats(), "replays": self.replays}
+
+
+idempotency_store = IdempotencyStore(
+    InMemoryCacheBackend(
+        max_size=int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000")),
+        ttl_seconds=IDEMPOTENCY_TTL_SECONDS
+    ),
+    ttl_seconds=IDEMPOTENCY_TTL_SECONDS,
+    pending_ttl_seconds=IDEMPOTENCY_PENDING_TTL_SECONDS
+)
+
+def get_idempotency_store() -> IdempotencyStore:
+    return idempotency_store
@@ -0,0 +1,237 @@
+import io
+import os
+import re
+import csv
+import json
+from itertools import islice
+from typing import Any, AsyncIterator, BinaryIO, Iterator
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from supabase import AsyncClient
+from app.database import database
+from app.services import data_version
+from app.models.imports import ImportRow, ImportFormat
+
+# 每批解析與寫入的列數，決定匯入時的記憶體上限
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "500"))
+# 摘要中最多列出的錯誤列數（總數仍會完整計算）
+IMPORT_MAX_REPORTED_REJECTIONS = int(os.getenv("IMPORT_MAX_REPORTED_REJECTIONS", "100"))
+IMPORT_READ_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+class ImportFileError(ValueError):
+    """檔案結構錯誤（非單一列的資料錯誤），匯入無法繼續"""
+
+
+def iter_csv_rows(stream: BinaryIO) -> Iterator[dict]:
+    """逐列讀取 CSV，空字串視為未填"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        for row in csv.DictReader(text):
+            yield {key: (value if value != "" else None) for key, value in row.items() if key}
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ImportFileError(f"Invalid CSV file: {e}")
+    finally:
+        # 只解除包裝，檔案由上傳物件負責關閉
+        text.detach()
+
+
+def iter_json_rows(stream: BinaryIO, read_size: int = IMPORT_READ_SIZE) -> Iterator[Any]:
+    """
+    逐筆讀取 JSON 陣列（[{...}, {...}]），以 raw_decode 解析緩衝區中的下一個元素，
+    不需要把整個檔案載入記憶體。
+    """
+    decoder = json.JSONDecoder()
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def read_more() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = text.read(read_size)
+        if not chunk:
+            eof = True
+            return False
+        # 丟棄已解析的部分，緩衝區只保留尚未處理的資料
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def peek() -> str | None:
+        """跳過空白並回傳下一個字元，檔案結束時回傳 None"""
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof or not read_more():
+                return None
+
+    try:
+        if peek() != "[":
+            raise ImportFileError("JSON file must contain an array of rows")
+        pos += 1
+        if peek() == "]":
+            return
+
+        while True:
+            if peek() is None:
+                raise ImportFileError("Unexpected end of JSON file")
+            while True:
+                try:
+                    item, pos = decoder.raw_decode(buffer, pos)
+                    break
+                except json.JSONDecodeError as e:
+                    # 元素跨越緩衝區邊界時再讀取一段
+                    if eof or not read_more():
+                        raise ImportFileError(f"Invalid JSON file: {e.msg}")
+            yield item
+
+            token = peek()
+            if token == ",":
+                pos += 1
+            elif token == "]":
+                return
+            else:
+                raise ImportFileError("Invalid JSON file: expected ',' or ']'")
+    except UnicodeDecodeError as e:
+        raise ImportFileError(f"Invalid JSON file: {e}")
+    finally:
+        text.detach()
+
+
+def _float_or_none(value) -> float | None:
+    return float(value) if value is not None else None
+
+
+class ImportService:
+    def __init__(self):
+        self.supabase: AsyncClient = database.get_async_supabase_admin()
+
+    async def import_file(self, user_id: str, stream: BinaryIO, file_format: ImportFormat) -> AsyncIterator[dict]:
+        """
+        串流匯入訓練紀錄，每寫入一批就產生一筆進度，最後產生摘要。
+        每批各自寫入，失敗時已寫入的批次會保留，並以 error 事件結束。
+        """
+        rows = iter_csv_rows(stream) if file_format == "csv" else iter_json_rows(stream)
+        progress = {"rows": 0, "sessions": 0, "activities": 0, "records": 0}
+        rejected: list[dict] = []
+        rejected_count = 0
+        # 跨批次延續的課程與活動，避免同一個課程被切成兩筆
+        current = {"session_key": None, "session_id": None, "activity_key": None, "activity_id": None}
+
+        try:
+            while True:
+                # 解析與驗證在 threadpool 執行，不阻塞 event loop
+                chunk = await run_in_threadpool(list, islice(rows, IMPORT_CHUNK_ROWS))
+                if not chunk:
+                    break
+
+                valid_rows = []
+                for offset, raw_row in enumerate(chunk):
+                    row_number = progress["rows"] + offset + 1
+                    try:
+                        if not isinstance(raw_row, dict):
+                            raise ValueError("Row must be an object")
+                        valid_rows.append(ImportRow.model_validate(raw_row))
+                    except (ValidationError, ValueError) as e:
+                        rejected_count += 1
+                        if len(rejected) < IMPORT_MAX_REPORTED_REJECTIONS:
+                            errors = e.errors(include_url=False, include_input=False, include_context=False) if isinstance(e, ValidationError) else str(e)
+                            rejected.append({"row": row_number, "errors": errors})
+
+                progress["rows"] += len(chunk)
+                if valid_rows:
+                    created = await self._write_chunk(user_id, valid_rows, current)
+                    for key, count in created.items():
+                        progress[key] += count
+
+                yield {"type": "progress", **progress, "rejected": rejected_count}
+
+        except ImportFileError as e:
+            yield {"type": "error", "detail": str(e), **progress}
+            return
+        except Exception as e:
+            print(f"Error importing training history: {e}")
+            yield {"type": "error", "detail": f"Failed to import rows: {str(e)}", **progress}
+            return
+        finally:
+            if progress["sessions"] or progress["records"]:
+                await data_version.record_change(user_id)
+
+        yield {
+            "type": "summary",
+            **progress,
+            "rejected": rejected_count,
+            "rejected_rows": rejected
+        }
+
+    async def _write_chunk(self, user_id: str, rows: list[ImportRow], current: dict) -> dict:
+        """以三次多列 insert（課程、活動、記錄）寫入一批資料"""
+        new_sessions: list[dict] = []
+        new_activities: list[dict] = []
+        # 每筆記錄對應的活動：已存在的活動 ID，或本批新活動的索引
+        record_rows: list[tuple[ImportRow, str | int]] = []
+
+        for row in rows:
+            session_key = (row.date, row.session_title)
+            if session_key != current["session_key"]:
+                new_sessions.append({
+                    "user_id": user_id,
+                    "title": row.session_title,
+                    "date": row.date.isoformat(),
+                    "note": row.session_note
+                })
+                current.update(session_key=session_key, session_id=len(new_sessions) - 1, activity_key=None)
+
+            activity_key = (row.activity, row.category)
+            if activity_key != current["activity_key"]:
+                new_activities.append({
+                    "session_id": current["session_id"],
+                    "name": row.activity,
+                    "category": row.category,
+                    "description": row.description
+                })
+                current.update(activity_key=activity_key, activity_id=len(new_activities) - 1)
+
+            record_rows.append((row, current["activity_id"]))
+
+        # 尚未寫入的課程與活動以本批索引（int）暫代，寫入後換成資料庫 ID
+        session_ids = await self._insert_rows("training_sessions", new_sessions)
+        for activity in new_activities:
+            if isinstance(activity["session_id"], int):
+                activity["session_id"] = session_ids[activity["session_id"]]
+        activity_ids = await self._insert_rows("training_activities", new_activities)
+
+        records = [
+            {
+                "activity_id": activity_ids[activity_ref] if isinstance(activity_ref, int) else activity_ref,
+                "set_number": row.set_number,
+                "repetition": row.get_reps,
+                "weight": _float_or_none(row.weight),
+                "duration": row.duration,
+                "distance": _float_or_none(row.distance),
+                "score": _float_or_none(row.score)
+            }
+            for row, activity_ref in record_rows
+        ]
+        await self._insert_rows("activity_records", records)
+
+        # 下一批延續目前的課程與活動時使用資料庫 ID
+        if isinstance(current["session_id"], int):
+            current["session_id"] = session_ids[current["session_id"]]
+        if isinstance(current["activity_id"], int):
+            current["activity_id"] = activity_ids[current["activity_id"]]
+
+        return {"sessions": len(new_sessions), "activities": len(new_activities), "records": len(records)}
+
+    async def _insert_rows(self, table: str, rows: list[dict]) -> list[str]:
+        if not rows:
+            return []
+        response = await self.supabase.table(table).insert(rows).execute()
+        if len(response.data or []) != len(rows):
+            raise RuntimeError(f"Failed to insert into {table}")
+        return [row["id"] for row in response.data]
@@ -0,0 +1,160 @@
+import os
+import time
+import asyncio
+import httpx
+import jwt
+from jwt import PyJWK
+from dotenv import load_dotenv
+
+load_dotenv()
+
+supabase_url = os.getenv("SUPABASE_URL")
+
+# remote: 每次請求都呼叫 Supabase Auth 驗證（預設）
+# local: 在本機以快取的 JWKS 驗證簽章、過期時間與 audience
+auth_verify_mode = os.getenv("AUTH_VERIFY_MODE", "remote").lower()
+auth_jwks_ttl_seconds = int(os.getenv("AUTH_JWKS_TTL_SECONDS", "600"))
+auth_jwt_audience = os.getenv("AUTH_JWT_AUDIENCE", "authenticated")
+# 本機驗證成功後，是否仍呼叫 Supabase Auth 確認 token 未被撤銷
+auth_revocation_check = os.getenv("AUTH_REVOCATION_CHECK", "false").lower() == "true"
+
+
+class JWKSCache:
+    """
+    快取 Supabase Auth 的簽章公鑰（JWKS），超過 TTL 後重新抓取。
+    抓取失敗時繼續使用上次成功取得的金鑰，並等待 MIN_REFRESH_INTERVAL 後才再次嘗試。
+    """
+
+    # 兩次抓取之間的最短間隔（未知的 kid、抓取失敗後重試），避免被偽造 token 或故障灌爆上游
+    MIN_REFRESH_INTERVAL = 30
+
+    def __init__(self, jwks_url: str, ttl_seconds: int = 600, timeout: float = 5.0):
+        self.jwks_url = jwks_url
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self._keys: dict[str, PyJWK] = {}
+        self._fetched_at = 0.0
+        self._attempted_at = float("-inf")
+        self._last_error: httpx.HTTPError | None = None
+        self._lock = asyncio.Lock()
+
+    async def _fetch(self) -> dict[str, PyJWK]:
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(self.jwks_url)
+        response.raise_for_status()
+
+        keys = {}
+        for jwk_data in response.json().get("keys", []):
+            try:
+                key = PyJWK(jwk_data)
+            except jwt.PyJWKError:
+                # 略過不支援的金鑰類型（例如 HS256 對稱金鑰不會出現在 JWKS 中）
+                continue
+            if key.key_id:
+                keys[key.key_id] = key
+        return keys
+
+    async def _refresh(self):
+        self._attempted_at = time.monotonic()
+        try:
+            self._keys = await self._fetch()
+        except httpx.HTTPError as e:
+            self._last_error = e
+            if not self._keys:
+                raise
+            print(f"Error refreshing JWKS, keeping cached keys: {e}")
+            return
+        self._fetched_at = self._attempted_at
+        self._last_error = None
+
+    async def get_signing_key(self, kid: str) -> PyJWK | None:
+        """
+        回傳 kid 對應的公鑰，找不到時回傳 None。
+        從未成功抓取過金鑰且抓取失敗時拋出 httpx.HTTPError，由呼叫端改用 Supabase Auth 驗證。
+        """
+        async with self._lock:
+            now = time.monotonic()
+            # 過期或遇到未知的 kid（金鑰可能已輪替）時重新抓取，但不早於上次嘗試後的 MIN_REFRESH_INTERVAL
+            stale = now - self._fetched_at > self.ttl_seconds or kid not in self._keys
+            if stale and now - self._attempted_at > self.MIN_REFRESH_INTERVAL:
+                await self._refresh()
+            elif not self._keys and self._last_error is not None:
+                raise self._last_error
+            return self._keys.get(kid)
+
+    def clear(self):
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._attempted_at = float("-inf")
+        self._last_error = None
+
+
+class JWTVerifier:
+    """在本機驗證 Supabase 簽發的 access token"""
+
+    def __init__(
+        self,
+        jwks_cache: JWKSCache,
+        audience: str,
+        issuer: str | None = None,
+        enabled: bool = False,
+        revocation_check: bool = False
+    ):
+        self.jwks_cache = jwks_cache
+        self.audience = audience
+        self.issuer = issuer
+        self.enabled = enabled
+        self.revocation_check = revocation_check
+
+    async def verify(self, access_token: str) -> dict | None:
+        """
+        驗證 token 並回傳 claims。
+        token 無效時拋出 jwt.InvalidTokenError；
+        無法在本機驗證（舊版 HS256 專案、找不到金鑰、JWKS 抓取失敗）時回傳 None，
+        由呼叫端改用 Supabase Auth 驗證。
+        """
+        header = jwt.get_unverified_header(access_token)
+        kid = header.get("kid")
+        if not kid or header.get("alg", "").upper().startswith("HS"):
+            return None
+
+        try:
+            signing_key = await self.jwks_cache.get_signing_key(kid)
+        except httpx.HTTPError as e:
+            print(f"Error fetching JWKS: {e}")
+            return None
+
+        if signing_key is None:
+            return None
+
+        options = {"require": ["exp", "sub", "aud"]}
+        return jwt.decode(
+            access_token,
+            signing_key.key,
+            algorithms=[signing_key.algorithm_name],
+            audience=self.audience,
+            issuer=self.issuer,
+            options=options
+        )
+
+
+def claims_to_user(claims: dict) -> dict:
+    """將 JWT claims 轉為與 Supabase Auth 查詢結果相同格式的使用者資料"""
+    user_metadata = claims.get("user_metadata") or {}
+    return {
+        "id": claims["sub"],
+        "email": claims.get("email"),
+        "username": user_metadata.get("username")
+    }
+
+
+jwt_verifier = JWTVerifier(
+    JWKSCache(f"{supabase_url}/auth/v1/.well-known/jwks.json", ttl_seconds=auth_jwks_ttl_seconds),
+    audience=auth_jwt_audience,
+    issuer=f"{supabase_url}/auth/v1",
+    enabled=auth_verify_mode == "local",
+    revocation_check=auth_revocation_check
+)
+
+def get_jwt_verifier() -> JWTVerifier:
+    return jwt_verifier
@@ -0,0 +1,255 @@
+import os
+import uuid
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ValidationError
+from supabase import AsyncClient, PostgrestAPIError
+from app.database import database
+from app.services import data_version
+from app.services.activity_service import _numbers_to_float, _new_record_row
+from app.models.sync import SyncOperation, SyncRecordCreate
+from app.models.training_sessions import TrainingSessionCreate, TrainingSessionUpdate
+from app.models.training_activities import (
+    TrainingActivityWithRecordsCreate,
+    TrainingActivityUpdate,
+    ActivityRecordPatch
+)
+
+# 單次同步請求的最大操作數
+SYNC_MAX_OPERATIONS = int(os.getenv("SYNC_MAX_OPERATIONS", "500"))
+
+# 每種資料對應的批次函式，一組相同動作的操作以一次呼叫（一個語句）套用
+SYNC_FUNCTIONS = {
+    "session": "sync_training_sessions",
+    "activity": "sync_training_activities",
+    "record": "sync_activity_records"
+}
+
+# 驗證 data 的 model；delete 不需要內容
+PAYLOAD_MODELS: dict[tuple[str, str], type[BaseModel]] = {
+    ("session", "create"): TrainingSessionCreate,
+    ("session", "update"): TrainingSessionUpdate,
+    ("activity", "create"): TrainingActivityWithRecordsCreate,
+    ("activity", "update"): TrainingActivityUpdate,
+    ("record", "create"): SyncRecordCreate,
+    ("record", "update"): ActivityRecordPatch
+}
+
+SUCCESS_STATUS = {
+    "create": status.HTTP_201_CREATED,
+    "update": status.HTTP_200_OK,
+    "delete": status.HTTP_204_NO_CONTENT
+}
+
+NOT_FOUND_DETAIL = {
+    "session": "Training session not found",
+    "activity": "Training activity not found",
+    "record": "Activity record not found"
+}
+
+# create 找不到的是所屬的課程或活動
+PARENT_ENTITY = {"activity": "session", "record": "activity"}
+
+# update 時不可清除（資料庫欄位為 NOT NULL）的欄位
+NON_NULLABLE_FIELDS = {
+    "session": ("date",),
+    "activity": ("name",),
+    "record": ("set_number",)
+}
+
+class SyncOperationError(Exception):
+    """單一操作無法套用，只影響該操作的結果"""
+
+    def __init__(self, status_code: int, detail):
+        self.status_code = status_code
+        self.detail = detail
+
+def group_operations(operations: list[SyncOperation]) -> list[list[tuple[int, SyncOperation]]]:
+    """
+    將連續且 entity、action 相同的操作分為一組，保留原本的順序。
+    update / delete 在同一組中重複出現相同目標時另起一組，確保同一筆資料的操作依序套用。
+    """
+    groups: list[list[tuple[int, SyncOperation]]] = []
+    targets: set[str] = set()
+    for index, operation in enumerate(operations):
+        current = groups[-1] if groups else None
+        same_kind = current is not None \
+            and current[0][1].entity == operation.entity \
+            and current[0][1].action == operation.action
+        if not same_kind or (operation.action != "create" and operation.id in targets):
+            groups.append([])
+            targets = set()
+        groups[-1].append((index, operation))
+        if operation.id is not None:
+            targets.add(operation.id)
+    return groups
+
+def _result(operation: SyncOperation, status_code: int, id: str | None = None, data: dict | None = None, detail=None) -> dict:
+    return {
+        "client_id": operation.client_id,
+        "status": status_code,
+        "id": id,
+        "data": data,
+        "detail": detail
+    }
+
+class SyncService:
+    def __init__(self):
+        self.supabase: AsyncClient = database.get_async_supabase_admin()
+
+    async def apply(self, user_id: str, operations: list[SyncOperation]) -> dict:
+        """
+        依序套用離線期間排入佇列的操作，回傳每個操作的結果與暫時 ID 的對應。
+        連續且相同 entity、action 的操作合併為一次資料庫呼叫；
+        個別操作失敗（驗證錯誤、找不到資料）不影響其他操作，
+        資料庫錯誤則停止處理，之後的操作回報 424 且不會套用。
+        """
+        results: dict[int, dict] = {}
+        id_map: dict[str, str] = {}
+        failed_creates: set[str] = set()
+        changed = False
+
+        groups = group_operations(operations)
+        for position, group in enumerate(groups):
+            entity, action = group[0][1].entity, group[0][1].action
+            items, pending = [], []
+            for index, operation in group:
+                try:
+                    items.append(self._build_item(operation, id_map, failed_creates))
+                    pending.append((index, operation))
+                except SyncOperationError as e:
+                    results[index] = _result(operation, e.status_code, detail=e.detail)
+                    if action == "create":
+                        failed_creates.add(operation.client_id)
+
+            if not items:
+                continue
+
+            try:
+                rows = await self._apply_group(user_id, entity, action, items)
+            except HTTPException as e:
+                for index, operation in pending:
+                    results[index] = _result(operation, e.status_code, detail=e.detail)
+                for later_group in groups[position + 1:]:
+                    for index, operation in later_group:
+                        results[index] = _result(
+                            operation,
+                            status.HTTP_424_FAILED_DEPENDENCY,
+                            detail="Not applied because an earlier operation failed"
+                        )
+                break
+
+            for (index, operation), row in zip(pending, rows):
+                if row is None:
+                    missing = PARENT_ENTITY[entity] if action == "create" else entity
+                    results[index] = _result(operation, status.HTTP_404_NOT_FOUND, detail=NOT_FOUND_DETAIL[missing])
+                    if action == "create":
+                        failed_creates.add(operation.client_id)
+                    continue
+
+                changed = True
+                if action == "create":
+                    id_map[operation.client_id] = row["id"]
+                results[index] = _result(
+                    operation,
+                    SUCCESS_STATUS[action],
+                    id=row["id"],
+                    data=None if action == "delete" else row
+                )
+
+        if changed:
+            await data_version.record_change(user_id)
+
+        return {
+            "results": [results[index] for index in range(len(operations))],
+            "id_map": id_map
+        }
+
+    def _build_item(self, operation: SyncOperation, id_map: dict[str, str], failed_creates: set[str]) -> dict:
+        """驗證操作內容並換掉暫時 ID，轉為批次函式的輸入"""
+        payload = None
+        model = PAYLOAD_MODELS.get((operation.entity, operation.action))
+        if model is not None:
+            try:
+                payload = model.model_validate(operation.data)
+            except ValidationError as e:
+                raise SyncOperationError(
+                    status.HTTP_422_UNPROCESSABLE_CONTENT,
+                    e.errors(include_url=False, include_context=False, include_input=False)
+                )
+
+        if operation.action == "create":
+            if operation.entity == "session":
+                return {"title": payload.title, "date": payload.date.isoformat(), "note": payload.note}
+            if operation.entity == "activity":
+                return {
+                    "session_id": self._resolve(payload.session_id, id_map, failed_creates),
+                    "name": payload.name,
+                    "category": payload.category,
+                    "description": payload.description,
+                    "records": [_new_record_row(record) for record in payload.activity_records]
+                }
+            return {
+                "activity_id": self._resolve(payload.activity_id, id_map, failed_creates),
+                **_new_record_row(payload)
+            }
+
+        if operation.id is None:
+            raise SyncOperationError(status.HTTP_422_UNPROCESSABLE_CONTENT, "id is required for update and delete")
+        target_id = self._resolve(operation.id, id_map, failed_creates)
+
+        if operation.action == "delete":
+            return {"id": target_id}
+
+        changes = _numbers_to_float(payload.model_dump(mode="json", exclude_unset=True))
+        if not changes:
+            raise SyncOperationError(status.HTTP_400_BAD_REQUEST, "No fields to update")
+        cleared = [field for field in NON_NULLABLE_FIELDS[operation.entity] if field in changes and changes[field] is None]
+        if cleared:
+            raise SyncOperationError(
+                status.HTTP_422_UNPROCESSABLE_CONTENT,
+                [{"type": "null_not_allowed", "loc": ["data", field], "msg": "Field cannot be null"} for field in cleared]
+            )
+        return {"id": target_id, "changes": changes}
+
+    @staticmethod
+    def _resolve(reference: str, id_map: dict[str, str], failed_creates: set[str]) -> str:
+        """將暫時 ID 換成實際 ID；不是暫時 ID 時必須是合法的 UUID"""
+        if reference in id_map:
+            return id_map[reference]
+        if reference in failed_creates:
+            raise SyncOperationError(
+                status.HTTP_424_FAILED_DEPENDENCY,
+                f"Operation {reference} was not applied"
+            )
+        try:
+            return str(uuid.UUID(reference))
+        except ValueError:
+            raise SyncOperationError(status.HTTP_404_NOT_FOUND, f"Referenced ID {reference} not found")
+
+    async def _apply_group(self, user_id: str, entity: str, action: str, items: list[dict]) -> list[dict | None]:
+        function = SYNC_FUNCTIONS[entity]
+        try:
+            response = await self.supabase.rpc(function, {
+                "p_user_id": user_id,
+                "p_action": action,
+                "p_items": items
+            }).execute()
+        except PostgrestAPIError as e:
+            print(f"Error calling {function}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to sync changes: {e.message}"
+            )
+        except Exception as e:
+            print(f"Error calling {function}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to sync changes: {str(e)}"
+            )
+
+        if len(response.data or []) != len(items):
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to sync changes"
+            )
+        return response.data
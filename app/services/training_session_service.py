@@ -1,15 +1,76 @@
+import os
+import json
+import uuid
+import base64
+import asyncio
 from fastapi import HTTPException, status
-from typing import Optional
-from datetime import date
-from supabase import Client
+from typing import Optional, AsyncIterator
+from datetime import date, timedelta
+from supabase import AsyncClient
 from app.database import database
-from app.models.training_sessions import TrainingSessionCreate, TrainingSessionUpdate
+from app.services import data_version
+from app.services.data_version import DataVersionStore
+from app.cache import session_cache
+from app.cache.backends import CacheBackend
+from app.cache.session_cache import make_cache_key
+from app.models.training_sessions import TrainingSessionCreate, TrainingSessionUpdate, SessionInclude
+
+# 單次查詢最多回傳的課程數，避免一次拉出整棵無上限的資料樹
+SESSIONS_MAX_PAGE_SIZE = int(os.getenv("SESSIONS_MAX_PAGE_SIZE", "100"))
+# 批次建立課程時單次請求的最大筆數
+SESSIONS_BULK_MAX_ITEMS = int(os.getenv("SESSIONS_BULK_MAX_ITEMS", "100"))
+# 行事曆單次查詢可涵蓋的最大天數
+CALENDAR_MAX_DAYS = int(os.getenv("CALENDAR_MAX_DAYS", "366"))
+# 匯出時每次向資料庫取得的課程數
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "200"))
+
+# 各資料範圍對應的 PostgREST select，欄位與回應模型一一對應，讓查詢結果可直接輸出
+SESSION_SELECTS: dict[str, str] = {
+    "sessions": "id, user_id, title, date, note, created_at",
+    "activities": "id, user_id, title, date, note, created_at, activities:training_activities(id, session_id, name, category)",
+    "full": (
+        "id, user_id, title, date, note, created_at, "
+        "activities:training_activities(id, session_id, name, category, description, "
+        "records:activity_records(id, activity_id, set_number, repetition, weight, duration, distance, score))"
+    )
+}
+
+def encode_cursor(session: dict) -> str:
+    """以 (date, id) 產生不透明的分頁游標"""
+    payload = json.dumps({"date": session["date"], "id": session["id"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        # 驗證格式，避免游標內容被拼進 PostgREST 篩選條件
+        cursor_date = date.fromisoformat(payload["date"]).isoformat()
+        cursor_id = str(uuid.UUID(payload["id"]))
+        return cursor_date, cursor_id
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def _month_ranges(start_date: date, end_date: date) -> list[tuple[date, date]]:
+    """將日期區間切成涵蓋它的完整月份 [(月初, 月底), ...]"""
+    ranges = []
+    month_start = start_date.replace(day=1)
+    while month_start <= end_date:
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        ranges.append((month_start, next_month - timedelta(days=1)))
+        month_start = next_month
+    return ranges
 
 class TrainingSessionService:
     def __init__(self):
-        self.supabase: Client = database.get_supabase_admin()
+        self.supabase: AsyncClient = database.get_async_supabase_admin()
+        self.data_versions: DataVersionStore = data_version.get_data_version_store()
+        self.session_cache: CacheBackend = session_cache.get_session_cache()
 
-    def create_session(self, user_id: str, session: TrainingSessionCreate):
+    async def create_session(self, user_id: str, session: TrainingSessionCreate):
         try:
             session_data = {
                 "user_id": user_id,
@@ -18,14 +79,15 @@ class TrainingSessionService:
                 "note": session.note
             }
             
-            response = self.supabase.table("training_sessions").insert(session_data).execute()
+            response = await self.supabase.table("training_sessions").insert(session_data).execute()
             
             if not response.data:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Failed to create training session"
                 )
-            
+
+            await data_version.record_change(user_id)
             return response.data[0]
         
         except HTTPException:
@@ -36,11 +98,80 @@ class TrainingSessionService:
                 detail=f"Database error: {str(e)}"
             )
 
-    def get_sessions_with_activities(self, user_id: str, start_date: Optional[date] = None, end_date: Optional[date] = None):
+    async def create_sessions(self, user_id: str, sessions: list[TrainingSessionCreate]) -> list[dict]:
+        """以單一多列 insert 建立多個課程，依輸入順序回傳建立的資料"""
+        try:
+            rows = [
+                {
+                    "user_id": user_id,
+                    "title": session.title,
+                    "date": session.date.isoformat(),
+                    "note": session.note
+                }
+                for session in sessions
+            ]
+
+            response = await self.supabase.table("training_sessions").insert(rows).execute()
+
+            if len(response.data or []) != len(rows):
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Failed to create training sessions"
+                )
+
+            await data_version.record_change(user_id)
+            return response.data
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {str(e)}"
+            )
+
+    async def get_sessions_with_activities(
+        self,
+        user_id: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        include: SessionInclude = "full"
+    ) -> tuple[list[dict], Optional[str]]:
+        """
+        依 (date, id) 由新到舊分頁取得課程（包含活動和記錄），
+        回傳 (本頁資料, 下一頁游標)；沒有下一頁時游標為 None
+        """
+        page_size = min(limit or SESSIONS_MAX_PAGE_SIZE, SESSIONS_MAX_PAGE_SIZE)
+        cursor_position = decode_cursor(cursor) if cursor else None
+
+        # 查詢前先取得資料版本放進 key：查詢期間發生寫入時，舊的結果寫在舊版本下，之後的讀取不會拿到
+        version = await self.data_versions.get(user_id)
+        cache_key = make_cache_key("sessions", version, start_date, end_date, include, page_size, cursor)
+        cached_page = await self.session_cache.get(user_id, cache_key)
+        if cached_page is not None:
+            return cached_page
+
+        sessions, next_cursor = await self._fetch_page(
+            user_id, start_date, end_date, page_size, cursor_position, include
+        )
+        await self.session_cache.set(user_id, cache_key, (sessions, next_cursor))
+        return sessions, next_cursor
+
+    async def _fetch_page(
+        self,
+        user_id: str,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        page_size: int,
+        cursor_position: Optional[tuple[str, str]],
+        include: SessionInclude
+    ) -> tuple[list, Optional[str]]:
         try:
             query = (
                 self.supabase.table("training_sessions")
-                .select("*, activities:training_activities(*, records:activity_records(*))")
+                .select(SESSION_SELECTS[include])
                 .eq("user_id", user_id)
             )
             
@@ -52,14 +183,14 @@ class TrainingSessionService:
             elif start_date:
                 # Original logic preservation: limits to exactly the start_date if no end_date provided
                 query = query.lte("date", start_date.isoformat()) 
-                
-            query = query.order("created_at", desc=True)
-            sessions_response = query.execute()
-    
-            if not sessions_response.data:
-                return []
 
-            return sessions_response.data
+            if cursor_position:
+                cursor_date, cursor_id = cursor_position
+                query = query.or_(f"date.lt.{cursor_date},and(date.eq.{cursor_date},id.lt.{cursor_id})")
+
+            # 多取一筆用來判斷是否還有下一頁
+            query = query.order("date", desc=True).order("id", desc=True).limit(page_size + 1)
+            sessions_response = await query.execute()
         
         except Exception as e:
             raise HTTPException(
@@ -67,62 +198,120 @@ class TrainingSessionService:
                 detail=f"Failed to fetch sessions with activities: {str(e)}"
             )
 
-    def update_session(self, user_id: str, session_id: str, session_update: TrainingSessionUpdate):
+        rows = sessions_response.data or []
+        sessions = rows[:page_size]
+        next_cursor = encode_cursor(sessions[-1]) if len(rows) > page_size else None
+        return sessions, next_cursor
+
+    async def iter_session_pages(
+        self,
+        user_id: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        include: SessionInclude = "full"
+    ) -> AsyncIterator[list]:
+        """
+        逐頁取得使用者的所有課程，供匯出使用。
+        每次只保留一頁資料在記憶體中，且不寫入讀取快取。
+        """
+        cursor_position = None
+        while True:
+            sessions, next_cursor = await self._fetch_page(
+                user_id, start_date, end_date, EXPORT_PAGE_SIZE, cursor_position, include
+            )
+            if sessions:
+                yield sessions
+            if not next_cursor:
+                return
+            cursor_position = (sessions[-1]["date"], sessions[-1]["id"])
+
+    async def get_calendar(self, user_id: str, start_date: date, end_date: date) -> list[dict]:
+        """
+        取得每日的課程數、活動數、組數與總訓練量（重量 x 次數）。
+        彙總在資料庫端（training_calendar RPC）以月為單位計算並快取，
+        快取未命中的月份同時查詢。
+        """
+        if start_date > end_date:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="start_date must not be after end_date"
+            )
+        if (end_date - start_date).days + 1 > CALENDAR_MAX_DAYS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Date range must not exceed {CALENDAR_MAX_DAYS} days"
+            )
+
+        months = _month_ranges(start_date, end_date)
+        version = await self.data_versions.get(user_id)
+        cache_keys = [make_cache_key("calendar", version, month_start.strftime("%Y-%m")) for month_start, _ in months]
+        month_days = [await self.session_cache.get(user_id, key) for key in cache_keys]
+
+        missing = [index for index, days in enumerate(month_days) if days is None]
+        fetched = await asyncio.gather(*(self._fetch_calendar_month(user_id, *months[index]) for index in missing))
+        for index, days in zip(missing, fetched):
+            month_days[index] = days
+            await self.session_cache.set(user_id, cache_keys[index], days)
+
+        start, end = start_date.isoformat(), end_date.isoformat()
+        return [day for days in month_days for day in days if start <= day["date"] <= end]
+
+    async def _fetch_calendar_month(self, user_id: str, month_start: date, month_end: date) -> list[dict]:
         try:
-            existing = (
-                self.supabase.table("training_sessions")
-                .select("*")
-                .eq("id", session_id)
-                .eq("user_id", user_id)
-                .execute()
+            response = await self.supabase.rpc("training_calendar", {
+                "p_user_id": user_id,
+                "p_start_date": month_start.isoformat(),
+                "p_end_date": month_end.isoformat()
+            }).execute()
+            return response.data or []
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch training calendar: {str(e)}"
             )
-            
-            if not existing.data:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Training session not found"
-                )
-            
-            update_data = {}
-            if session_update.title is not None:
-                update_data["title"] = session_update.title
-            if session_update.date is not None:
-                update_data["date"] = session_update.date.isoformat()
-            if session_update.note is not None:
-                update_data["note"] = session_update.note
-            
-            if not update_data:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="No fields to update"
-                )
-            
-            response = (
+
+    async def update_session(self, user_id: str, session_id: str, session_update: TrainingSessionUpdate):
+        update_data = {}
+        if session_update.title is not None:
+            update_data["title"] = session_update.title
+        if session_update.date is not None:
+            update_data["date"] = session_update.date.isoformat()
+        if session_update.note is not None:
+            update_data["note"] = session_update.note
+        
+        if not update_data:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No fields to update"
+            )
+
+        try:
+            # 以 user_id 篩選，擁有者檢查與更新在同一個語句完成
+            response = await (
                 self.supabase.table("training_sessions")
                 .update(update_data)
                 .eq("id", session_id)
+                .eq("user_id", user_id)
                 .execute()
             )
-            
-            if not response.data:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to update training session"
-                )
-            
-            return response.data[0]
-        
-        except HTTPException:
-            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to update training session: {str(e)}"
             )
 
-    def delete_session(self, user_id: str, session_id: str):
+        if not response.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Training session not found"
+            )
+
+        await data_version.record_change(user_id)
+        return response.data[0]
+
+    async def delete_session(self, user_id: str, session_id: str):
         try:
-            response = (
+            response = await (
                 self.supabase.table("training_sessions")
                 .delete()
                 .eq("id", session_id)
@@ -135,7 +324,8 @@ class TrainingSessionService:
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Training session not found or you don't have permission to delete it."
                 )
-            
+
+            await data_version.record_change(user_id)
             return
         
         except HTTPException:
@@ -0,0 +1,101 @@
+from fastapi import HTTPException, status
+from supabase import AsyncClient, PostgrestAPIError
+from app.database import database
+from app.services import data_version
+from app.services.activity_service import NOT_FOUND_ERROR_CODE
+from app.models.workout_templates import WorkoutTemplateCreate, SessionInstantiate
+
+class WorkoutTemplateService:
+    def __init__(self):
+        self.supabase: AsyncClient = database.get_async_supabase_admin()
+
+    async def create_template(self, user_id: str, template: WorkoutTemplateCreate):
+        """將課程的活動與記錄保存為範本（save_session_as_template RPC）"""
+        return await self._call_rpc("save_session_as_template", {
+            "p_user_id": user_id,
+            "p_session_id": template.session_id,
+            "p_name": template.name
+        }, not_found_detail="Training session not found")
+
+    async def get_templates(self, user_id: str):
+        try:
+            response = await self.supabase.table("workout_templates")\
+                .select("id, name, payload, created_at")\
+                .eq("user_id", user_id)\
+                .order("created_at", desc=True)\
+                .execute()
+            return response.data or []
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch workout templates: {str(e)}"
+            )
+
+    async def delete_template(self, user_id: str, template_id: str):
+        try:
+            response = await self.supabase.table("workout_templates")\
+                .delete()\
+                .eq("id", template_id)\
+                .eq("user_id", user_id)\
+                .execute()
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to delete workout template: {str(e)}"
+            )
+
+        if not response.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Workout template not found"
+            )
+
+    async def instantiate_template(self, user_id: str, template_id: str, options: SessionInstantiate):
+        """依範本在指定日期建立新課程，活動與記錄在資料庫端一次複製"""
+        session = await self._call_rpc("instantiate_workout_template", {
+            "p_user_id": user_id,
+            "p_template_id": template_id,
+            "p_date": options.date.isoformat(),
+            "p_title": options.title
+        }, not_found_detail="Workout template not found")
+        await data_version.record_change(user_id)
+        return session
+
+    async def clone_session(self, user_id: str, session_id: str, options: SessionInstantiate):
+        """將既有課程（含活動與記錄）複製到指定日期"""
+        session = await self._call_rpc("clone_training_session", {
+            "p_user_id": user_id,
+            "p_session_id": session_id,
+            "p_date": options.date.isoformat(),
+            "p_title": options.title
+        }, not_found_detail="Training session not found")
+        await data_version.record_change(user_id)
+        return session
+
+    async def _call_rpc(self, function: str, params: dict, not_found_detail: str) -> dict:
+        try:
+            response = await self.supabase.rpc(function, params).execute()
+        except PostgrestAPIError as e:
+            if e.code == NOT_FOUND_ERROR_CODE:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=not_found_detail
+                )
+            print(f"Error calling {function}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {e.message}"
+            )
+        except Exception as e:
+            print(f"Error calling {function}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {str(e)}"
+            )
+
+        if not response.data:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {function} returned no data"
+            )
+        return response.data
@@ -0,0 +1,78 @@
+"""
+比較 /with-activities 各種輸出方式的每筆記錄成本
+
+執行方式: uv run python -m scripts.benchmark_serialization [課程數] [每個活動的記錄數]
+"""
+import sys
+import json
+import timeit
+import uuid
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from app.models.training_sessions import TrainingSessionWithActivitiesResponse
+
+ACTIVITIES_PER_SESSION = 5
+
+def make_sessions(session_count: int, records_per_activity: int) -> list[dict]:
+    """產生與 PostgREST 回傳格式相同的資料樹"""
+    sessions = []
+    for i in range(session_count):
+        session_id = str(uuid.uuid4())
+        activities = []
+        for j in range(ACTIVITIES_PER_SESSION):
+            activity_id = str(uuid.uuid4())
+            activities.append({
+                "id": activity_id,
+                "session_id": session_id,
+                "name": f"Activity {j}",
+                "category": "strength",
+                "description": None,
+                "records": [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "activity_id": activity_id,
+                        "set_number": k + 1,
+                        "repetition": 8,
+                        "weight": 100.5,
+                        "duration": None,
+                        "distance": None,
+                        "score": None
+                    }
+                    for k in range(records_per_activity)
+                ]
+            })
+        sessions.append({
+            "id": session_id,
+            "user_id": "user-1",
+            "title": f"Session {i}",
+            "date": "2024-01-01",
+            "note": None,
+            "created_at": "2024-01-01T10:00:00+00:00",
+            "activities": activities
+        })
+    return sessions
+
+def main():
+    session_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    records_per_activity = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    sessions = make_sessions(session_count, records_per_activity)
+    record_count = session_count * ACTIVITIES_PER_SESSION * records_per_activity
+    adapter = TypeAdapter(List[TrainingSessionWithActivitiesResponse])
+
+    candidates = {
+        # FastAPI 預設的 response_model 流程
+        "response_model + json.dumps": lambda: json.dumps(jsonable_encoder(adapter.validate_python(sessions))).encode(),
+        "TypeAdapter validate + dump_json": lambda: adapter.dump_json(adapter.validate_python(sessions)),
+        "trusted to_json": lambda: to_json(sessions)
+    }
+
+    print(f"{session_count} sessions, {record_count} records")
+    for name, serialize in candidates.items():
+        runs = 20
+        seconds = min(timeit.repeat(serialize, number=runs, repeat=3)) / runs
+        print(f"{name:36s} {seconds * 1000:8.2f} ms  {seconds / record_count * 1e6:6.2f} µs/record")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+-- 行事曆 / 熱度圖用的每日彙總，在資料庫端計算，避免下載完整的課程資料樹
+create or replace function public.training_calendar(
+    p_user_id uuid,
+    p_start_date date,
+    p_end_date date
+)
+returns table (
+    date date,
+    session_count integer,
+    activity_count integer,
+    set_count integer,
+    tonnage numeric
+)
+language sql
+stable
+as $$
+    select
+        s.date,
+        count(distinct s.id)::integer,
+        count(distinct a.id)::integer,
+        count(r.id)::integer,
+        coalesce(sum(r.weight * r.repetition), 0)
+    from public.training_sessions s
+    left join public.training_activities a on a.session_id = s.id
+    left join public.activity_records r on r.activity_id = a.id
+    where s.user_id = p_user_id
+      and s.date between p_start_date and p_end_date
+    group by s.date
+    order by s.date;
+$$;
+
+-- 以 user_id 為參數，只允許後端（service role）呼叫
+revoke execute on function public.training_calendar(uuid, date, date) from public, anon, authenticated;
+grant execute on function public.training_calendar(uuid, date, date) to service_role;
+
+create index if not exists training_sessions_user_id_date_idx
+    on public.training_sessions (user_id, date);
@@ -0,0 +1,53 @@
+-- 在單一交易中確認課程擁有者、建立活動與所有記錄，並回傳完整的活動資料
+create or replace function public.create_activity_with_records(
+    p_user_id uuid,
+    p_session_id uuid,
+    p_name text,
+    p_category text default null,
+    p_description text default null,
+    p_records jsonb default '[]'::jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_activity public.training_activities;
+    v_records jsonb;
+begin
+    perform 1
+    from public.training_sessions
+    where id = p_session_id and user_id = p_user_id;
+
+    if not found then
+        raise exception 'Training session not found or you don''t have permission'
+            using errcode = 'P0002';
+    end if;
+
+    insert into public.training_activities (session_id, name, category, description)
+    values (p_session_id, p_name, p_category, p_description)
+    returning * into v_activity;
+
+    with inserted as (
+        insert into public.activity_records (activity_id, set_number, repetition, weight, duration, distance, score)
+        select v_activity.id, r.set_number, r.repetition, r.weight, r.duration, r.distance, r.score
+        -- 以資料表的 rowtype 解析，欄位型別與資料表保持一致
+        from jsonb_populate_recordset(null::public.activity_records, coalesce(p_records, '[]'::jsonb)) as r
+        returning *
+    )
+    select coalesce(jsonb_agg(to_jsonb(inserted) order by inserted.set_number), '[]'::jsonb)
+    into v_records
+    from inserted;
+
+    return jsonb_build_object(
+        'id', v_activity.id,
+        'session_id', v_activity.session_id,
+        'name', v_activity.name,
+        'category', v_activity.category,
+        'description', v_activity.description,
+        'records', v_records
+    );
+end;
+$$;
+
+revoke execute on function public.create_activity_with_records(uuid, uuid, text, text, text, jsonb) from public, anon, authenticated;
+grant execute on function public.create_activity_with_records(uuid, uuid, text, text, text, jsonb) to service_role;
@@ -0,0 +1,93 @@
+-- 以傳入的記錄取代活動底下的所有記錄（集合替換），比對與寫入在同一個交易中完成：
+-- 不在列表中的記錄刪除、新的記錄新增、內容不同的記錄更新，內容相同的記錄不寫入。
+-- 回傳資料庫實際新增、更新與刪除的記錄 ID。
+create or replace function public.apply_activity_record_changes(
+    p_user_id uuid,
+    p_activity_id uuid,
+    p_records jsonb default '[]'::jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_ids uuid[];
+    v_conflict uuid;
+    v_inserted jsonb;
+    v_updated jsonb;
+    v_deleted jsonb;
+begin
+    -- 鎖定活動：新增記錄時的外鍵檢查會等待此鎖，替換期間不會有其他記錄加入
+    perform 1
+    from public.training_activities a
+    join public.training_sessions s on s.id = a.session_id
+    where a.id = p_activity_id and s.user_id = p_user_id
+    for update of a;
+
+    if not found then
+        raise exception 'Training activity not found' using errcode = 'P0002';
+    end if;
+
+    select coalesce(array_agg(r.id), '{}')
+    into v_ids
+    from jsonb_populate_recordset(null::public.activity_records, coalesce(p_records, '[]'::jsonb)) as r;
+
+    -- 不允許透過 ID 改寫其他活動的記錄
+    select r.id
+    into v_conflict
+    from public.activity_records r
+    where r.id = any(v_ids) and r.activity_id <> p_activity_id
+    limit 1;
+
+    if v_conflict is not null then
+        raise exception 'Record ID % belongs to a different activity', v_conflict using errcode = '23505';
+    end if;
+
+    with deleted as (
+        delete from public.activity_records
+        where activity_id = p_activity_id and id <> all(v_ids)
+        returning id, set_number
+    )
+    select coalesce(jsonb_agg(d.id order by d.set_number, d.id), '[]'::jsonb)
+    into v_deleted
+    from deleted d;
+
+    -- 以資料表的 rowtype 解析，欄位型別與資料表保持一致；activity_id 一律使用參數
+    with input as (
+        select r.id, r.set_number, r.repetition, r.weight, r.duration, r.distance, r.score, i.position
+        from jsonb_array_elements(coalesce(p_records, '[]'::jsonb)) with ordinality as i(value, position)
+        cross join lateral jsonb_populate_record(null::public.activity_records, i.value) as r
+    ),
+    upserted as (
+        insert into public.activity_records as t (id, activity_id, set_number, repetition, weight, duration, distance, score)
+        select i.id, p_activity_id, i.set_number, i.repetition, i.weight, i.duration, i.distance, i.score
+        from input i
+        order by i.position
+        on conflict (id) do update set
+            set_number = excluded.set_number,
+            repetition = excluded.repetition,
+            weight = excluded.weight,
+            duration = excluded.duration,
+            distance = excluded.distance,
+            score = excluded.score
+        where (t.set_number, t.repetition, t.weight, t.duration, t.distance, t.score)
+            is distinct from (excluded.set_number, excluded.repetition, excluded.weight, excluded.duration, excluded.distance, excluded.score)
+        -- 新增的列 xmax 為 0，更新的列為目前交易 ID
+        returning t.id, t.xmax = 0 as inserted
+    )
+    select
+        coalesce(jsonb_agg(i.id order by i.position) filter (where u.inserted), '[]'::jsonb),
+        coalesce(jsonb_agg(i.id order by i.position) filter (where not u.inserted), '[]'::jsonb)
+    into v_inserted, v_updated
+    from input i
+    join upserted u on u.id = i.id;
+
+    return jsonb_build_object(
+        'inserted', v_inserted,
+        'updated', v_updated,
+        'deleted', v_deleted
+    );
+end;
+$$;
+
+revoke execute on function public.apply_activity_record_changes(uuid, uuid, jsonb) from public, anon, authenticated;
+grant execute on function public.apply_activity_record_changes(uuid, uuid, jsonb) to service_role;
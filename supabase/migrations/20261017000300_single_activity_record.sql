@@ -0,0 +1,67 @@
+-- 新增單組記錄：擁有者檢查與寫入在同一個語句中完成，成本與活動現有的組數無關
+create or replace function public.append_activity_record(
+    p_user_id uuid,
+    p_activity_id uuid,
+    p_record jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_record public.activity_records;
+begin
+    insert into public.activity_records (activity_id, set_number, repetition, weight, duration, distance, score)
+    select p_activity_id, r.set_number, r.repetition, r.weight, r.duration, r.distance, r.score
+    from jsonb_populate_record(null::public.activity_records, p_record) as r
+    where exists (
+        select 1
+        from public.training_activities a
+        join public.training_sessions s on s.id = a.session_id
+        where a.id = p_activity_id and s.user_id = p_user_id
+    )
+    returning * into v_record;
+
+    if not found then
+        raise exception 'Training activity not found' using errcode = 'P0002';
+    end if;
+
+    return to_jsonb(v_record);
+end;
+$$;
+
+-- 修改單組記錄：只覆寫 p_changes 中出現的欄位
+create or replace function public.update_activity_record(
+    p_user_id uuid,
+    p_record_id uuid,
+    p_changes jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_record public.activity_records;
+begin
+    update public.activity_records r
+    set (set_number, repetition, weight, duration, distance, score) = (
+        select c.set_number, c.repetition, c.weight, c.duration, c.distance, c.score
+        from jsonb_populate_record(r, p_changes) as c
+    )
+    from public.training_activities a
+    join public.training_sessions s on s.id = a.session_id
+    where r.id = p_record_id
+      and a.id = r.activity_id
+      and s.user_id = p_user_id
+    returning r.* into v_record;
+
+    if not found then
+        raise exception 'Activity record not found' using errcode = 'P0002';
+    end if;
+
+    return to_jsonb(v_record);
+end;
+$$;
+
+revoke execute on function public.append_activity_record(uuid, uuid, jsonb) from public, anon, authenticated;
+revoke execute on function public.update_activity_record(uuid, uuid, jsonb) from public, anon, authenticated;
+grant execute on function public.append_activity_record(uuid, uuid, jsonb) to service_role;
+grant execute on function public.update_activity_record(uuid, uuid, jsonb) to service_role;
@@ -0,0 +1,67 @@
+-- 一次建立同一課程的多個活動：擁有者只檢查一次，活動與記錄各以一個 insert 寫入
+create or replace function public.create_activities_with_records(
+    p_user_id uuid,
+    p_session_id uuid,
+    p_activities jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_result jsonb;
+begin
+    perform 1
+    from public.training_sessions
+    where id = p_session_id and user_id = p_user_id;
+
+    if not found then
+        raise exception 'Training session not found or you don''t have permission'
+            using errcode = 'P0002';
+    end if;
+
+    -- 先產生活動 ID，記錄才能在同一個語句中對應到所屬活動
+    with input as (
+        select gen_random_uuid() as id, a.value as activity, a.position
+        from jsonb_array_elements(p_activities) with ordinality as a(value, position)
+    ),
+    new_activities as (
+        insert into public.training_activities (id, session_id, name, category, description)
+        select id, p_session_id, activity->>'name', activity->>'category', activity->>'description'
+        from input
+        order by position
+        returning *
+    ),
+    new_records as (
+        insert into public.activity_records (activity_id, set_number, repetition, weight, duration, distance, score)
+        select i.id, r.set_number, r.repetition, r.weight, r.duration, r.distance, r.score
+        from input i
+        cross join lateral jsonb_populate_recordset(
+            null::public.activity_records,
+            coalesce(i.activity->'records', '[]'::jsonb)
+        ) as r
+        returning *
+    )
+    select coalesce(jsonb_agg(
+        jsonb_build_object(
+            'id', a.id,
+            'session_id', a.session_id,
+            'name', a.name,
+            'category', a.category,
+            'description', a.description,
+            'records', coalesce(
+                (select jsonb_agg(to_jsonb(r) order by r.set_number) from new_records r where r.activity_id = a.id),
+                '[]'::jsonb
+            )
+        )
+        order by i.position
+    ), '[]'::jsonb)
+    into v_result
+    from new_activities a
+    join input i on i.id = a.id;
+
+    return v_result;
+end;
+$$;
+
+revoke execute on function public.create_activities_with_records(uuid, uuid, jsonb) from public, anon, authenticated;
+grant execute on function public.create_activities_with_records(uuid, uuid, jsonb) to service_role;
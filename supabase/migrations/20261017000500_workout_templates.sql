@@ -0,0 +1,181 @@
+-- 訓練範本：以 jsonb 保存活動與記錄，之後可一次套用到新的日期
+create table if not exists public.workout_templates (
+    id uuid primary key default gen_random_uuid(),
+    user_id uuid not null references public.users(id) on delete cascade,
+    name text not null check (char_length(name) <= 100),
+    payload jsonb not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists workout_templates_user_id_created_at_idx
+    on public.workout_templates (user_id, created_at desc);
+
+-- 只允許後端（service role）存取
+alter table public.workout_templates enable row level security;
+
+-- 將課程的活動與記錄轉為範本格式
+-- {"activities": [{"name", "category", "description", "records": [{"set_number", ...}]}]}
+create or replace function public.session_workout_payload(p_user_id uuid, p_session_id uuid)
+returns jsonb
+language plpgsql
+stable
+as $$
+declare
+    v_payload jsonb;
+begin
+    perform 1
+    from public.training_sessions
+    where id = p_session_id and user_id = p_user_id;
+
+    if not found then
+        raise exception 'Training session not found' using errcode = 'P0002';
+    end if;
+
+    select jsonb_build_object('activities', coalesce(jsonb_agg(
+        jsonb_build_object(
+            'name', a.name,
+            'category', a.category,
+            'description', a.description,
+            'records', coalesce((
+                select jsonb_agg(
+                    jsonb_build_object(
+                        'set_number', r.set_number,
+                        'repetition', r.repetition,
+                        'weight', r.weight,
+                        'duration', r.duration,
+                        'distance', r.distance,
+                        'score', r.score
+                    )
+                    order by r.set_number
+                )
+                from public.activity_records r
+                where r.activity_id = a.id
+            ), '[]'::jsonb)
+        )
+        order by a.id
+    ), '[]'::jsonb))
+    into v_payload
+    from public.training_activities a
+    where a.session_id = p_session_id;
+
+    return v_payload;
+end;
+$$;
+
+-- 依範本格式建立新的課程，活動與記錄各以一個 insert 寫入
+create or replace function public.create_session_from_payload(
+    p_user_id uuid,
+    p_date date,
+    p_title text,
+    p_note text,
+    p_payload jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_session public.training_sessions;
+begin
+    insert into public.training_sessions (user_id, title, date, note)
+    values (p_user_id, p_title, p_date, p_note)
+    returning * into v_session;
+
+    with input as (
+        select gen_random_uuid() as id, a.value as activity, a.position
+        from jsonb_array_elements(coalesce(p_payload->'activities', '[]'::jsonb)) with ordinality as a(value, position)
+    ),
+    new_activities as (
+        insert into public.training_activities (id, session_id, name, category, description)
+        select id, v_session.id, activity->>'name', activity->>'category', activity->>'description'
+        from input
+        order by position
+    )
+    insert into public.activity_records (activity_id, set_number, repetition, weight, duration, distance, score)
+    select i.id, r.set_number, r.repetition, r.weight, r.duration, r.distance, r.score
+    from input i
+    cross join lateral jsonb_populate_recordset(
+        null::public.activity_records,
+        coalesce(i.activity->'records', '[]'::jsonb)
+    ) as r;
+
+    return to_jsonb(v_session);
+end;
+$$;
+
+create or replace function public.save_session_as_template(
+    p_user_id uuid,
+    p_session_id uuid,
+    p_name text
+)
+returns jsonb
+language sql
+as $$
+    insert into public.workout_templates (user_id, name, payload)
+    values (p_user_id, p_name, public.session_workout_payload(p_user_id, p_session_id))
+    returning to_jsonb(workout_templates.*);
+$$;
+
+create or replace function public.instantiate_workout_template(
+    p_user_id uuid,
+    p_template_id uuid,
+    p_date date,
+    p_title text default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_template public.workout_templates;
+begin
+    select * into v_template
+    from public.workout_templates
+    where id = p_template_id and user_id = p_user_id;
+
+    if not found then
+        raise exception 'Workout template not found' using errcode = 'P0002';
+    end if;
+
+    return public.create_session_from_payload(
+        p_user_id, p_date, coalesce(p_title, v_template.name), null, v_template.payload
+    );
+end;
+$$;
+
+create or replace function public.clone_training_session(
+    p_user_id uuid,
+    p_session_id uuid,
+    p_date date,
+    p_title text default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_source public.training_sessions;
+begin
+    select * into v_source
+    from public.training_sessions
+    where id = p_session_id and user_id = p_user_id;
+
+    if not found then
+        raise exception 'Training session not found' using errcode = 'P0002';
+    end if;
+
+    return public.create_session_from_payload(
+        p_user_id,
+        p_date,
+        coalesce(p_title, v_source.title),
+        v_source.note,
+        public.session_workout_payload(p_user_id, p_session_id)
+    );
+end;
+$$;
+
+revoke execute on function public.session_workout_payload(uuid, uuid) from public, anon, authenticated;
+revoke execute on function public.create_session_from_payload(uuid, date, text, text, jsonb) from public, anon, authenticated;
+revoke execute on function public.save_session_as_template(uuid, uuid, text) from public, anon, authenticated;
+revoke execute on function public.instantiate_workout_template(uuid, uuid, date, text) from public, anon, authenticated;
+revoke execute on function public.clone_training_session(uuid, uuid, date, text) from public, anon, authenticated;
+grant execute on function public.save_session_as_template(uuid, uuid, text) to service_role;
+grant execute on function public.instantiate_workout_template(uuid, uuid, date, text) to service_role;
+grant execute on function public.clone_training_session(uuid, uuid, date, text) to service_role;
@@ -0,0 +1,28 @@
+-- 以單一語句完成擁有者檢查與刪除（records 由 ON DELETE CASCADE 一併刪除）
+create or replace function public.delete_training_activity(
+    p_user_id uuid,
+    p_activity_id uuid
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_activity public.training_activities;
+begin
+    delete from public.training_activities a
+    using public.training_sessions s
+    where a.id = p_activity_id
+      and s.id = a.session_id
+      and s.user_id = p_user_id
+    returning a.* into v_activity;
+
+    if not found then
+        raise exception 'Training activity not found' using errcode = 'P0002';
+    end if;
+
+    return to_jsonb(v_activity);
+end;
+$$;
+
+revoke execute on function public.delete_training_activity(uuid, uuid) from public, anon, authenticated;
+grant execute on function public.delete_training_activity(uuid, uuid) to service_role;
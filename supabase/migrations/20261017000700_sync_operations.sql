@@ -0,0 +1,259 @@
+-- 離線同步：每個函式以一個語句套用一整組相同動作的操作（create / update / delete）。
+-- 回傳與輸入順序相同的陣列，不存在或不屬於該使用者的項目為 null，由呼叫端回報為 404。
+-- update 的 changes 只包含要修改的欄位；明確傳入 null 會清除該欄位。
+
+create or replace function public.sync_training_sessions(
+    p_user_id uuid,
+    p_action text,
+    p_items jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_result jsonb;
+begin
+    if p_action = 'create' then
+        with input as (
+            select gen_random_uuid() as id, i.value as item, i.position
+            from jsonb_array_elements(p_items) with ordinality as i(value, position)
+        ),
+        created as (
+            insert into public.training_sessions (id, user_id, title, date, note)
+            select id, p_user_id, item->>'title', (item->>'date')::date, item->>'note'
+            from input
+            order by position
+            returning *
+        )
+        select jsonb_agg(to_jsonb(c) order by i.position)
+        into v_result
+        from input i
+        join created c on c.id = i.id;
+
+    elsif p_action = 'update' then
+        with input as (
+            select (i.value->>'id')::uuid as id, i.value->'changes' as changes, i.position
+            from jsonb_array_elements(p_items) with ordinality as i(value, position)
+        ),
+        updated as (
+            update public.training_sessions s set
+                title = case when i.changes ? 'title' then i.changes->>'title' else s.title end,
+                date = case when i.changes ? 'date' then (i.changes->>'date')::date else s.date end,
+                note = case when i.changes ? 'note' then i.changes->>'note' else s.note end
+            from input i
+            where s.id = i.id and s.user_id = p_user_id
+            returning s.*
+        )
+        select jsonb_agg(case when u.id is null then null else to_jsonb(u) end order by i.position)
+        into v_result
+        from input i
+        left join updated u on u.id = i.id;
+
+    elsif p_action = 'delete' then
+        with input as (
+            select (i.value->>'id')::uuid as id, i.position
+            from jsonb_array_elements(p_items) with ordinality as i(value, position)
+        ),
+        deleted as (
+            delete from public.training_sessions s
+            using input i
+            where s.id = i.id and s.user_id = p_user_id
+            returning s.*
+        )
+        select jsonb_agg(case when d.id is null then null else to_jsonb(d) end order by i.position)
+        into v_result
+        from input i
+        left join deleted d on d.id = i.id;
+
+    else
+        raise exception 'Unsupported sync action: %', p_action using errcode = '22023';
+    end if;
+
+    return coalesce(v_result, '[]'::jsonb);
+end;
+$$;
+
+create or replace function public.sync_training_activities(
+    p_user_id uuid,
+    p_action text,
+    p_items jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_result jsonb;
+begin
+    if p_action = 'create' then
+        -- 活動可屬於不同課程，只建立課程屬於該使用者的項目
+        with input as (
+            select gen_random_uuid() as id, i.value as item, (i.value->>'session_id')::uuid as session_id, i.position
+            from jsonb_array_elements(p_items) with ordinality as i(value, position)
+        ),
+        owned as (
+            select i.*
+            from input i
+            join public.training_sessions s on s.id = i.session_id and s.user_id = p_user_id
+        ),
+        new_activities as (
+            insert into public.training_activities (id, session_id, name, category, description)
+            select id, session_id, item->>'name', item->>'category', item->>'description'
+            from owned
+            order by position
+            returning *
+        ),
+        new_records as (
+            insert into public.activity_records (activity_id, set_number, repetition, weight, duration, distance, score)
+            select o.id, r.set_number, r.repetition, r.weight, r.duration, r.distance, r.score
+            from owned o
+            cross join lateral jsonb_populate_recordset(
+                null::public.activity_records,
+                coalesce(o.item->'records', '[]'::jsonb)
+            ) as r
+            returning *
+        )
+        select jsonb_agg(
+            case when a.id is null then null else jsonb_build_object(
+                'id', a.id,
+                'session_id', a.session_id,
+                'name', a.name,
+                'category', a.category,
+                'description', a.description,
+                'records', coalesce(
+                    (select jsonb_agg(to_jsonb(r) order by r.set_number) from new_records r where r.activity_id = a.id),
+                    '[]'::jsonb
+                )
+            ) end
+            order by i.position
+        )
+        into v_result
+        from input i
+        left join new_activities a on a.id = i.id;
+
+    elsif p_action = 'update' then
+        with input as (
+            select (i.value->>'id')::uuid as id, i.value->'changes' as changes, i.position
+            from jsonb_array_elements(p_items) with ordinality as i(value, position)
+        ),
+        updated as (
+            update public.training_activities a set
+                name = case when i.changes ? 'name' then i.changes->>'name' else a.name end,
+                category = case when i.changes ? 'category' then i.changes->>'category' else a.category end,
+                description = case when i.changes ? 'description' then i.changes->>'description' else a.description end
+            from input i, public.training_sessions s
+            where a.id = i.id and s.id = a.session_id and s.user_id = p_user_id
+            returning a.*
+        )
+        select jsonb_agg(case when u.id is null then null else to_jsonb(u) end order by i.position)
+        into v_result
+        from input i
+        left join updated u on u.id = i.id;
+
+    elsif p_action = 'delete' then
+        with input as (
+            select (i.value->>'id')::uuid as id, i.position
+            from jsonb_array_elements(p_items) with ordinality as i(value, position)
+        ),
+        deleted as (
+            delete from public.training_activities a
+            using input i, public.training_sessions s
+            where a.id = i.id and s.id = a.session_id and s.user_id = p_user_id
+            returning a.*
+        )
+        select jsonb_agg(case when d.id is null then null else to_jsonb(d) end order by i.position)
+        into v_result
+        from input i
+        left join deleted d on d.id = i.id;
+
+    else
+        raise exception 'Unsupported sync action: %', p_action using errcode = '22023';
+    end if;
+
+    return coalesce(v_result, '[]'::jsonb);
+end;
+$$;
+
+create or replace function public.sync_activity_records(
+    p_user_id uuid,
+    p_action text,
+    p_items jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_result jsonb;
+begin
+    if p_action = 'create' then
+        with input as (
+            select gen_random_uuid() as id, r.activity_id, r.set_number, r.repetition, r.weight,
+                   r.duration, r.distance, r.score, i.position
+            from jsonb_array_elements(p_items) with ordinality as i(value, position)
+            cross join lateral jsonb_populate_record(null::public.activity_records, i.value) as r
+        ),
+        created as (
+            insert into public.activity_records (id, activity_id, set_number, repetition, weight, duration, distance, score)
+            select i.id, i.activity_id, i.set_number, i.repetition, i.weight, i.duration, i.distance, i.score
+            from input i
+            join public.training_activities a on a.id = i.activity_id
+            join public.training_sessions s on s.id = a.session_id and s.user_id = p_user_id
+            order by i.position
+            returning *
+        )
+        select jsonb_agg(case when c.id is null then null else to_jsonb(c) end order by i.position)
+        into v_result
+        from input i
+        left join created c on c.id = i.id;
+
+    elsif p_action = 'update' then
+        with input as (
+            select (i.value->>'id')::uuid as id, i.value->'changes' as changes, i.position
+            from jsonb_array_elements(p_items) with ordinality as i(value, position)
+        ),
+        updated as (
+            update public.activity_records r set
+                set_number = case when i.changes ? 'set_number' then (i.changes->>'set_number')::integer else r.set_number end,
+                repetition = case when i.changes ? 'repetition' then (i.changes->>'repetition')::integer else r.repetition end,
+                weight = case when i.changes ? 'weight' then (i.changes->>'weight')::numeric else r.weight end,
+                duration = case when i.changes ? 'duration' then i.changes->>'duration' else r.duration end,
+                distance = case when i.changes ? 'distance' then (i.changes->>'distance')::numeric else r.distance end,
+                score = case when i.changes ? 'score' then (i.changes->>'score')::numeric else r.score end
+            from input i, public.training_activities a, public.training_sessions s
+            where r.id = i.id and a.id = r.activity_id and s.id = a.session_id and s.user_id = p_user_id
+            returning r.*
+        )
+        select jsonb_agg(case when u.id is null then null else to_jsonb(u) end order by i.position)
+        into v_result
+        from input i
+        left join updated u on u.id = i.id;
+
+    elsif p_action = 'delete' then
+        with input as (
+            select (i.value->>'id')::uuid as id, i.position
+            from jsonb_array_elements(p_items) with ordinality as i(value, position)
+        ),
+        deleted as (
+            delete from public.activity_records r
+            using input i, public.training_activities a, public.training_sessions s
+            where r.id = i.id and a.id = r.activity_id and s.id = a.session_id and s.user_id = p_user_id
+            returning r.*
+        )
+        select jsonb_agg(case when d.id is null then null else to_jsonb(d) end order by i.position)
+        into v_result
+        from input i
+        left join deleted d on d.id = i.id;
+
+    else
+        raise exception 'Unsupported sync action: %', p_action using errcode = '22023';
+    end if;
+
+    return coalesce(v_result, '[]'::jsonb);
+end;
+$$;
+
+revoke execute on function public.sync_training_sessions(uuid, text, jsonb) from public, anon, authenticated;
+grant execute on function public.sync_training_sessions(uuid, text, jsonb) to service_role;
+revoke execute on function public.sync_training_activities(uuid, text, jsonb) from public, anon, authenticated;
+grant execute on function public.sync_training_activities(uuid, text, jsonb) to service_role;
+revoke execute on function public.sync_activity_records(uuid, text, jsonb) from public, anon, authenticated;
+grant execute on function public.sync_activity_records(uuid, text, jsonb) to service_role;
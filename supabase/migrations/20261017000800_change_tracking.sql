@@ -0,0 +1,232 @@
+-- 差異同步：記錄每筆資料的最後修改時間，刪除時留下 tombstone，
+-- 讓用戶端只取得某個時間點之後變動的資料。
+
+alter table public.training_sessions add column if not exists updated_at timestamptz not null default now();
+alter table public.training_activities add column if not exists updated_at timestamptz not null default now();
+alter table public.activity_records add column if not exists updated_at timestamptz not null default now();
+
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+drop trigger if exists training_sessions_set_updated_at on public.training_sessions;
+create trigger training_sessions_set_updated_at
+    before update on public.training_sessions
+    for each row execute function public.set_updated_at();
+
+drop trigger if exists training_activities_set_updated_at on public.training_activities;
+create trigger training_activities_set_updated_at
+    before update on public.training_activities
+    for each row execute function public.set_updated_at();
+
+drop trigger if exists activity_records_set_updated_at on public.activity_records;
+create trigger activity_records_set_updated_at
+    before update on public.activity_records
+    for each row execute function public.set_updated_at();
+
+-- 活動與記錄沒有 user_id，依所屬課程篩選；課程的查詢則直接使用 (user_id, updated_at)
+create index if not exists training_sessions_user_id_updated_at_idx
+    on public.training_sessions (user_id, updated_at);
+create index if not exists training_activities_updated_at_idx
+    on public.training_activities (updated_at);
+create index if not exists activity_records_updated_at_idx
+    on public.activity_records (updated_at);
+
+create table if not exists public.deleted_rows (
+    id bigint generated always as identity primary key,
+    user_id uuid not null,
+    entity text not null check (entity in ('session', 'activity', 'record')),
+    row_id uuid not null,
+    deleted_at timestamptz not null default now()
+);
+
+create index if not exists deleted_rows_user_id_deleted_at_idx
+    on public.deleted_rows (user_id, deleted_at);
+
+-- 只允許後端（service role）存取
+alter table public.deleted_rows enable row level security;
+
+-- 以 statement trigger 的 transition table 一次寫入整批刪除的 tombstone。
+-- 連帶刪除（ON DELETE CASCADE）時上層資料已不存在，子資料查不到擁有者就不寫入，
+-- 由上層的 tombstone 代表其底下的資料一併刪除。
+create or replace function public.record_session_tombstones()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into public.deleted_rows (user_id, entity, row_id)
+    select o.user_id, 'session', o.id
+    from old_rows o;
+    return null;
+end;
+$$;
+
+create or replace function public.record_activity_tombstones()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into public.deleted_rows (user_id, entity, row_id)
+    select s.user_id, 'activity', o.id
+    from old_rows o
+    join public.training_sessions s on s.id = o.session_id;
+    return null;
+end;
+$$;
+
+create or replace function public.record_record_tombstones()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into public.deleted_rows (user_id, entity, row_id)
+    select s.user_id, 'record', o.id
+    from old_rows o
+    join public.training_activities a on a.id = o.activity_id
+    join public.training_sessions s on s.id = a.session_id;
+    return null;
+end;
+$$;
+
+drop trigger if exists training_sessions_tombstones on public.training_sessions;
+create trigger training_sessions_tombstones
+    after delete on public.training_sessions
+    referencing old table as old_rows
+    for each statement execute function public.record_session_tombstones();
+
+drop trigger if exists training_activities_tombstones on public.training_activities;
+create trigger training_activities_tombstones
+    after delete on public.training_activities
+    referencing old table as old_rows
+    for each statement execute function public.record_activity_tombstones();
+
+drop trigger if exists activity_records_tombstones on public.activity_records;
+create trigger activity_records_tombstones
+    after delete on public.activity_records
+    referencing old table as old_rows
+    for each statement execute function public.record_record_tombstones();
+
+-- 回傳 (p_since, p_until] 之間變動的課程、活動、記錄與刪除的資料；p_since 為 null 時回傳全部（首次同步）。
+-- 依 (種類, 修改時間, id) 排序分頁，每頁最多 p_limit 筆：先回傳所有課程，再依序是活動、記錄與 tombstone。
+-- 下一頁以 p_until 固定同一個查詢區間，並以上一頁回傳的 next（最後一筆的位置）作為 p_after_*；
+-- 分頁期間再次修改的資料修改時間會晚於 until，由下一次同步取得。
+-- until 預設為查詢開始的時間，作為下一次同步的起點。
+create or replace function public.changes_since(
+    p_user_id uuid,
+    p_since timestamptz default null,
+    p_until timestamptz default null,
+    p_after_kind integer default null,
+    p_after_at timestamptz default null,
+    p_after_id uuid default null,
+    p_limit integer default 1000
+)
+returns jsonb
+language plpgsql
+stable
+as $$
+declare
+    v_since timestamptz := coalesce(p_since, '-infinity'::timestamptz);
+    v_until timestamptz := coalesce(p_until, now());
+    v_result jsonb;
+begin
+    with changed as (
+        select 1 as kind, s.updated_at as changed_at, s.id, jsonb_build_object(
+            'id', s.id,
+            'user_id', s.user_id,
+            'title', s.title,
+            'date', s.date,
+            'note', s.note,
+            'created_at', s.created_at
+        ) as data
+        from public.training_sessions s
+        where s.user_id = p_user_id and s.updated_at > v_since and s.updated_at <= v_until
+        union all
+        select 2, a.updated_at, a.id, jsonb_build_object(
+            'id', a.id,
+            'session_id', a.session_id,
+            'name', a.name,
+            'category', a.category,
+            'description', a.description
+        )
+        from public.training_activities a
+        join public.training_sessions s on s.id = a.session_id
+        where s.user_id = p_user_id and a.updated_at > v_since and a.updated_at <= v_until
+        union all
+        select 3, r.updated_at, r.id, jsonb_build_object(
+            'id', r.id,
+            'activity_id', r.activity_id,
+            'set_number', r.set_number,
+            'repetition', r.repetition,
+            'weight', r.weight,
+            'duration', r.duration,
+            'distance', r.distance,
+            'score', r.score
+        )
+        from public.activity_records r
+        join public.training_activities a on a.id = r.activity_id
+        join public.training_sessions s on s.id = a.session_id
+        where s.user_id = p_user_id and r.updated_at > v_since and r.updated_at <= v_until
+        union all
+        -- 首次同步不需要 tombstone
+        select 4, d.deleted_at, d.row_id, jsonb_build_object(
+            'entity', d.entity,
+            'id', d.row_id,
+            'deleted_at', d.deleted_at
+        )
+        from public.deleted_rows d
+        where p_since is not null and d.user_id = p_user_id and d.deleted_at > v_since and d.deleted_at <= v_until
+    ),
+    page as (
+        -- 多取一筆判斷是否還有下一頁
+        select c.*, row_number() over (order by c.kind, c.changed_at, c.id) as position
+        from (
+            select *
+            from changed c
+            where p_after_kind is null or (c.kind, c.changed_at, c.id) > (p_after_kind, p_after_at, p_after_id)
+            order by c.kind, c.changed_at, c.id
+            limit p_limit + 1
+        ) c
+    )
+    select jsonb_build_object(
+        'until', v_until,
+        'sessions', coalesce(jsonb_agg(p.data order by p.position) filter (where p.kind = 1 and p.position <= p_limit), '[]'::jsonb),
+        'activities', coalesce(jsonb_agg(p.data order by p.position) filter (where p.kind = 2 and p.position <= p_limit), '[]'::jsonb),
+        'records', coalesce(jsonb_agg(p.data order by p.position) filter (where p.kind = 3 and p.position <= p_limit), '[]'::jsonb),
+        'deleted', coalesce(jsonb_agg(p.data order by p.position) filter (where p.kind = 4 and p.position <= p_limit), '[]'::jsonb),
+        'next', case when count(*) > p_limit then (
+            select jsonb_build_object('kind', l.kind, 'changed_at', l.changed_at, 'id', l.id)
+            from page l
+            where l.position = p_limit
+        ) end
+    )
+    into v_result
+    from page p;
+
+    return v_result;
+end;
+$$;
+
+-- 清除超過保留期限的 tombstone（例如以 pg_cron 每天執行）；
+-- 早於保留期限的 token 會被 API 拒絕，用戶端需重新完整同步
+create or replace function public.purge_deleted_rows(p_older_than interval)
+returns bigint
+language sql
+as $$
+    with purged as (
+        delete from public.deleted_rows
+        where deleted_at < now() - p_older_than
+        returning 1
+    )
+    select count(*) from purged;
+$$;
+
+revoke execute on function public.changes_since(uuid, timestamptz, timestamptz, integer, timestamptz, uuid, integer) from public, anon, authenticated;
+grant execute on function public.changes_since(uuid, timestamptz, timestamptz, integer, timestamptz, uuid, integer) to service_role;
+revoke execute on function public.purge_deleted_rows(interval) from public, anon, authenticated;
+grant execute on function public.purge_deleted_rows(interval) to service_role;
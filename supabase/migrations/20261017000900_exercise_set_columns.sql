@@ -0,0 +1,31 @@
+-- 進步分析：回傳某個動作有重量與次數的每組記錄，以欄位陣列輸出（依日期排序），
+-- 後端可直接轉為連續的 NumPy 陣列計算，不需走訪課程 / 活動 / 記錄的資料樹
+create or replace function public.exercise_set_columns(
+    p_user_id uuid,
+    p_exercise text,
+    p_start_date date default null,
+    p_end_date date default null
+)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'date', coalesce(jsonb_agg(s.date order by s.date, s.id, a.id, r.set_number), '[]'::jsonb),
+        'set_number', coalesce(jsonb_agg(r.set_number order by s.date, s.id, a.id, r.set_number), '[]'::jsonb),
+        'weight', coalesce(jsonb_agg(r.weight order by s.date, s.id, a.id, r.set_number), '[]'::jsonb),
+        'repetition', coalesce(jsonb_agg(r.repetition order by s.date, s.id, a.id, r.set_number), '[]'::jsonb)
+    )
+    from public.training_sessions s
+    join public.training_activities a on a.session_id = s.id
+    join public.activity_records r on r.activity_id = a.id
+    where s.user_id = p_user_id
+      and lower(a.name) = lower(p_exercise)
+      and r.weight is not null
+      and r.repetition > 0
+      and (p_start_date is null or s.date >= p_start_date)
+      and (p_end_date is null or s.date <= p_end_date);
+$$;
+
+revoke execute on function public.exercise_set_columns(uuid, text, date, date) from public, anon, authenticated;
+grant execute on function public.exercise_set_columns(uuid, text, date, date) to service_role;
@@ -0,0 +1,50 @@
+import pytest
+from app.cache.backends import InMemoryCacheBackend
+
+@pytest.mark.asyncio
+async def test_get_and_set():
+    backend = InMemoryCacheBackend(max_size=10, ttl_seconds=60)
+    await backend.set("user-1", "key", [1, 2])
+
+    assert await backend.get("user-1", "key") == [1, 2]
+    assert await backend.get("user-2", "key") is None
+
+@pytest.mark.asyncio
+async def test_invalidate_only_clears_namespace():
+    backend = InMemoryCacheBackend(max_size=10, ttl_seconds=60)
+    await backend.set("user-1", "key", "a")
+    await backend.set("user-2", "key", "b")
+
+    await backend.invalidate("user-1")
+
+    assert await backend.get("user-1", "key") is None
+    assert await backend.get("user-2", "key") == "b"
+    # 失效後重新寫入的資料可正常讀取
+    await backend.set("user-1", "key", "c")
+    assert await backend.get("user-1", "key") == "c"
+
+@pytest.mark.asyncio
+async def test_stats():
+    backend = InMemoryCacheBackend(max_size=10, ttl_seconds=60)
+    await backend.set("user-1", "key", "a")
+    await backend.get("user-1", "key")
+    await backend.get("user-1", "missing")
+    await backend.invalidate("user-1")
+
+    stats = backend.stats()
+    assert stats["backend"] == "memory"
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["invalidations"] == 1
+
+@pytest.mark.asyncio
+async def test_add_only_when_absent():
+    backend = InMemoryCacheBackend(max_size=10, ttl_seconds=60)
+
+    assert await backend.add("user-1", "key", "a") is True
+    assert await backend.add("user-1", "key", "b") is False
+    assert await backend.get("user-1", "key") == "a"
+
+    await backend.delete("user-1", "key")
+    assert await backend.add("user-1", "key", "c") is True
@@ -0,0 +1,49 @@
+import time
+from app.cache.ttl_cache import TTLCache
+
+def test_get_and_set():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_lru_eviction():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # 讀取 a 使其成為最近使用，接著寫入 c 應淘汰 b
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_expiry():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1, expires_at=time.time() - 1)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert len(cache) == 0
+
+def test_expires_at_caps_ttl():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    expires_at = time.time() + 5
+    cache.set("a", 1, expires_at=expires_at)
+
+    assert cache._data["a"][0] == expires_at
+
+def test_delete_and_clear():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.delete("a") is True
+    assert cache.delete("a") is False
+    cache.clear()
+    assert len(cache) == 0
@@ -3,6 +3,17 @@ from fastapi.testclient import TestClient
 from unittest.mock import MagicMock
 from app.main import app
 from app.dependencies.auth import get_current_user
+from app.cache.session_cache import get_session_cache
+from app.services.idempotency import get_idempotency_store
+from app.services.data_version import get_data_version_store
+
+@pytest.fixture(autouse=True)
+def clear_session_cache():
+    # 快取為模組層級的單例，避免測試之間讀到彼此的資料
+    get_session_cache().clear()
+    get_idempotency_store().backend.clear()
+    get_data_version_store().backend.clear()
+    yield
 
 @pytest.fixture
 def mock_user():
@@ -1,12 +1,17 @@
 import pytest
-from unittest.mock import MagicMock, patch, ANY
+from unittest.mock import MagicMock, patch, ANY, AsyncMock
 from fastapi.testclient import TestClient
+from supabase import PostgrestAPIError
 from app.main import app
+from app.dependencies.services import get_activity_service
+from app.services.activity_service import ActivityService
 
 @pytest.fixture
 def client_authenticated():
     from app.dependencies.auth import get_current_user
     app.dependency_overrides[get_current_user] = lambda: {"id": "test-user-id", "email": "test@example.com"}
+    # 每個請求重新建立 Service，讓測試中 patch 的 Supabase Client 生效
+    app.dependency_overrides[get_activity_service] = ActivityService
     with TestClient(app) as c:
         yield c
     app.dependency_overrides = {}
@@ -31,34 +36,25 @@ def test_create_activity_with_records_success(client_authenticated, mock_supabas
         ]
     }
 
-    # 1. Mock session verification
-    mock_supabase_admin.table.return_value.select.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(
-        data=[{"id": "session-1", "user_id": "test-user-id"}]
-    )
-
-    # 2. Mock activity creation
-    mock_supabase_admin.table.return_value.insert.return_value.execute.side_effect = [
-        # First insert: training_activities
-        MagicMock(data=[{
-            "id": "activity-1",
-            "session_id": "session-1",
-            "name": "Bench Press",
-            "category": "Strength",
-            "description": "Heavy set"
-        }]),
-        # Second insert: activity_records
-                    MagicMock(data=[{
-                        "id": "record-1",
-                        "activity_id": "activity-1",
-                        "set_number": 1,
-                        "repetition": 10,
-                        "weight": 100.0,
-                        "duration": "00:01:00",
-                        "distance": None,
-                        "score": None
-                    }])    ]
-
-    with patch("app.services.activity_service.database.get_supabase_admin", return_value=mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data={
+        "id": "activity-1",
+        "session_id": "session-1",
+        "name": "Bench Press",
+        "category": "Strength",
+        "description": "Heavy set",
+        "records": [{
+            "id": "record-1",
+            "activity_id": "activity-1",
+            "set_number": 1,
+            "repetition": 10,
+            "weight": 100.0,
+            "duration": "00:01:00",
+            "distance": None,
+            "score": None
+        }]
+    }))
+
+    with patch("app.services.activity_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
         response = client_authenticated.post("/api/training-activities", json=payload)
 
     assert response.status_code == 201
@@ -67,40 +63,21 @@ def test_create_activity_with_records_success(client_authenticated, mock_supabas
     assert len(data["records"]) == 1
     assert data["records"][0]["id"] == "record-1"
 
-def test_create_activity_records_fail_rollback(client_authenticated, mock_supabase_admin):
+def test_create_activity_session_not_found(client_authenticated, mock_supabase_admin):
     payload = {
         "session_id": "session-1",
         "name": "Bench Press",
-        "category": "Strength",
         "activity_records": [{"set_number": 1, "repetition": 10}]
     }
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(side_effect=PostgrestAPIError({
+        "message": "Training session not found or you don't have permission",
+        "code": "P0002"
+    }))
 
-    # 1. Mock session verification
-    mock_supabase_admin.table.return_value.select.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(
-        data=[{"id": "session-1", "user_id": "test-user-id"}]
-    )
-
-    # 2. Mock activity creation SUCCESS, but records creation FAILURE (empty data)
-    mock_supabase_admin.table.return_value.insert.return_value.execute.side_effect = [
-        # Activity: Success
-        MagicMock(data=[{"id": "activity-1"}]),
-        # Records: Fail (return empty list or None)
-        MagicMock(data=[]) 
-    ]
-    
-    # Mock delete for rollback
-    mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.execute.return_value = MagicMock()
-
-    with patch("app.services.activity_service.database.get_supabase_admin", return_value=mock_supabase_admin):
+    with patch("app.services.activity_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
         response = client_authenticated.post("/api/training-activities", json=payload)
 
-    assert response.status_code == 500
-    # Verify rollback delete was called
-    mock_supabase_admin.table.assert_any_call("training_activities")
-    # We can check if delete was called specifically. 
-    # The chain is table("training_activities").delete().eq("id", "activity-1").execute()
-    # It's a bit hard to verify exact chain calls with side_effect mocks on the same object, 
-    # but we can verify table was called with "training_activities" at least twice (insert and delete).
+    assert response.status_code == 404
 
 def test_update_activity_records_success(client_authenticated, mock_supabase_admin):
     activity_id = "activity-1"
@@ -109,34 +86,77 @@ def test_update_activity_records_success(client_authenticated, mock_supabase_adm
         {"id": "record-2", "activity_id": activity_id, "set_number": 2, "repetition": 10} # Create (simulate client-generated ID)
     ]
     
-    # Mock delete (for records not in list)
-    mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.not_.in_.return_value.execute.return_value = MagicMock()
-    
-    # Mock upsert
-    mock_supabase_admin.table.return_value.upsert.return_value.execute.return_value = MagicMock(
-        data=[{}, {}]
-    )
+    # 目前只有 record-1（次數 10），RPC 回傳實際寫入的記錄 ID
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(
+        data={"inserted": ["record-2"], "updated": ["record-1"], "deleted": []}
+    ))
 
-    with patch("app.services.activity_service.database.get_supabase_admin", return_value=mock_supabase_admin):
+    with patch("app.services.activity_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
         response = client_authenticated.put(f"/api/training-activities/{activity_id}/records", json=payload)
     
-    assert response.status_code == 204
+    assert response.status_code == 200
+    assert response.json() == {"inserted": ["record-2"], "updated": ["record-1"], "deleted": []}
 
 def test_delete_activity_success(client_authenticated, mock_supabase_admin):
     activity_id = "activity-1"
     
-    # Mock verification: select joined with sessions
-    mock_supabase_admin.table.return_value.select.return_value.eq.return_value.execute.return_value = MagicMock(
-        data=[{
-            "id": activity_id,
-            "training_sessions": {"user_id": "test-user-id"}
-        }]
-    )
-    
-    # Mock delete
-    mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.execute.return_value = MagicMock()
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(
+        data={"id": activity_id, "session_id": "session-1"}
+    ))
 
-    with patch("app.services.activity_service.database.get_supabase_admin", return_value=mock_supabase_admin):
+    with patch("app.services.activity_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
         response = client_authenticated.delete(f"/api/training-activities/{activity_id}")
     
     assert response.status_code == 204
+
+def test_append_and_patch_activity_record(client_authenticated, mock_supabase_admin):
+    record = {
+        "id": "record-2",
+        "activity_id": "activity-1",
+        "set_number": 2,
+        "repetition": 8,
+        "weight": 100.0,
+        "duration": None,
+        "distance": None,
+        "score": None
+    }
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=record))
+
+    with patch("app.services.activity_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        appended = client_authenticated.post(
+            "/api/training-activities/activity-1/records",
+            json={"set_number": 2, "repetition": 8, "weight": 100}
+        )
+        patched = client_authenticated.patch("/api/training-activities/records/record-2", json={"repetition": 8})
+
+    assert appended.status_code == 201
+    assert appended.json() == record
+    assert patched.status_code == 200
+    assert patched.json()["id"] == "record-2"
+
+def test_patch_activity_record_rejects_null_set_number(client_authenticated, mock_supabase_admin):
+    with patch("app.services.activity_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.patch("/api/training-activities/records/record-2", json={"set_number": None})
+
+    assert response.status_code == 422
+    mock_supabase_admin.rpc.assert_not_called()
+
+def test_create_activities_batch(client_authenticated, mock_supabase_admin):
+    payload = [
+        {"session_id": "session-1", "name": "Squat", "activity_records": [{"set_number": 1, "repetition": 5}]},
+        {"session_id": "session-1", "name": "Bench"}
+    ]
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=[
+        {"id": "activity-1", "session_id": "session-1", "name": "Squat", "category": None, "description": None,
+         "records": [{"id": "record-1", "activity_id": "activity-1", "set_number": 1, "repetition": 5,
+                      "weight": None, "duration": None, "distance": None, "score": None}]},
+        {"id": "activity-2", "session_id": "session-1", "name": "Bench", "category": None, "description": None,
+         "records": []}
+    ]))
+
+    with patch("app.services.activity_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.post("/api/training-activities/batch", json=payload)
+
+    assert response.status_code == 201
+    assert [a["id"] for a in response.json()] == ["activity-1", "activity-2"]
+    mock_supabase_admin.rpc.assert_called_once()
@@ -2,12 +2,16 @@ import pytest
 from unittest.mock import MagicMock, patch, AsyncMock
 from fastapi.testclient import TestClient
 from app.main import app
+from app.dependencies.services import get_ai_service
+from app.services.ai_service import AIService
 from datetime import date
 
 @pytest.fixture
 def client_authenticated():
     from app.dependencies.auth import get_current_user
     app.dependency_overrides[get_current_user] = lambda: {"id": "test-user-id", "email": "test@example.com"}
+    # 每個請求重新建立 Service，讓測試中 patch 的 Supabase Client 生效
+    app.dependency_overrides[get_ai_service] = AIService
     with TestClient(app) as c:
         yield c
     app.dependency_overrides = {}
@@ -34,7 +38,7 @@ def test_ai_chat_success(client_authenticated, mock_supabase_admin, mock_gemini_
     }
     
     # Mock Supabase data
-    mock_supabase_admin.table.return_value.select.return_value.eq.return_value.gte.return_value.lte.return_value.order.return_value.limit.return_value.execute.return_value = MagicMock(
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value.gte.return_value.lte.return_value.order.return_value.limit.return_value.execute = AsyncMock(return_value=MagicMock(
         data=[
             {
                 "date": "2024-01-15",
@@ -44,12 +48,12 @@ def test_ai_chat_success(client_authenticated, mock_supabase_admin, mock_gemini_
                 ]
             }
         ]
-    )
+    ))
 
     # Patch both supabase and gemini_client
     # Patch both supabase and gemini_client
     # We patch the class genai.Client so that when it is instantiated, it returns our mock
-    with patch("app.services.ai_service.database.get_supabase_admin", return_value=mock_supabase_admin), \
+    with patch("app.services.ai_service.database.get_async_supabase_admin", return_value=mock_supabase_admin), \
          patch("app.services.ai_service.genai.Client", return_value=mock_gemini_client):
         
         response = client_authenticated.post("/api/analysis/ai/chat", json=payload)
@@ -73,7 +77,7 @@ def test_ai_chat_no_range(client_authenticated, mock_supabase_admin, mock_gemini
     
     # Patch both supabase and gemini_client
     # We patch the class genai.Client so that when it is instantiated, it returns our mock
-    with patch("app.services.ai_service.database.get_supabase_admin", return_value=mock_supabase_admin), \
+    with patch("app.services.ai_service.database.get_async_supabase_admin", return_value=mock_supabase_admin), \
          patch("app.services.ai_service.genai.Client", return_value=mock_gemini_client):
         
         response = client_authenticated.post("/api/analysis/ai/chat", json=payload)
@@ -0,0 +1,44 @@
+import pytest
+from unittest.mock import MagicMock, patch, AsyncMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.dependencies.services import get_analytics_service
+from app.services.analytics_service import AnalyticsService
+
+@pytest.fixture
+def client_authenticated():
+    from app.dependencies.auth import get_current_user
+    app.dependency_overrides[get_current_user] = lambda: {"id": "test-user-id", "email": "test@example.com"}
+    # 每個請求重新建立 Service，讓測試中 patch 的 Supabase Client 生效
+    app.dependency_overrides[get_analytics_service] = AnalyticsService
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+def test_get_progression(client_authenticated):
+    mock_supabase_admin = MagicMock()
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data={
+        "date": ["2024-01-01", "2024-01-08"],
+        "set_number": [1, 1],
+        "weight": [100, 105],
+        "repetition": [5, 5]
+    }))
+
+    with patch("app.services.analytics_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.get("/api/analysis/progression", params={"exercise": "Squat"})
+        not_modified = client_authenticated.get(
+            "/api/analysis/progression",
+            params={"exercise": "Squat"},
+            headers={"If-None-Match": response.headers["ETag"]}
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["days"]["best_e1rm"] == [116.67, 122.5]
+    assert body["days"]["rolling_volume"] == [500.0, 525.0]
+    assert not_modified.status_code == 304
+
+def test_get_progression_requires_exercise(client_authenticated):
+    response = client_authenticated.get("/api/analysis/progression")
+
+    assert response.status_code == 422
@@ -1,7 +1,9 @@
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, patch, AsyncMock
 from fastapi.testclient import TestClient
 from app.main import app
+from app.dependencies.auth import get_auth_service
+from app.services.auth_service import AuthService
 
 # Disable the default client fixture's dependency override for these tests
 # We want to test the actual auth logic, or at least independent of the global override
@@ -9,6 +11,8 @@ from app.main import app
 def client_no_auth():
     # Ensure no overrides are present
     app.dependency_overrides = {}
+    # 每個請求重新建立 AuthService，讓測試中 patch 的 Supabase Client 生效
+    app.dependency_overrides[get_auth_service] = AuthService
     with TestClient(app) as c:
         yield c
     app.dependency_overrides = {}
@@ -17,24 +21,24 @@ def client_no_auth():
 def mock_supabase_client():
     mock = MagicMock()
     # Mock auth.sign_up
-    mock.auth.sign_up.return_value = MagicMock(
+    mock.auth.sign_up = AsyncMock(return_value=MagicMock(
         user=MagicMock(id="test-user-id", email="test@example.com"),
         session=None
-    )
+    ))
     # Mock table("users").insert().execute()
-    mock.table.return_value.insert.return_value.execute.return_value = MagicMock(data=[])
+    mock.table.return_value.insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
     
     # Mock auth.sign_in_with_password
-    mock.auth.sign_in_with_password.return_value = MagicMock(
+    mock.auth.sign_in_with_password = AsyncMock(return_value=MagicMock(
         user=MagicMock(id="test-user-id"),
         session=MagicMock(
             access_token="fake-access-token",
             refresh_token="fake-refresh-token"
         )
-    )
+    ))
     
     # Mock auth.resend
-    mock.auth.resend.return_value = MagicMock()
+    mock.auth.resend = AsyncMock(return_value=MagicMock())
     
     return mock
 
@@ -47,7 +51,7 @@ def test_signup_success(client_no_auth, mock_supabase_client):
     
     # Patch the supabase client in app.routers.auth
     # Patch the supabase client in app.services.auth_service
-    with patch("app.services.auth_service.database.get_supabase_client", return_value=mock_supabase_client):
+    with patch("app.services.auth_service.database.get_async_supabase_client", return_value=mock_supabase_client):
         response = client_no_auth.post("/api/auth/signup", json=payload)
         
     assert response.status_code == 200
@@ -69,7 +73,7 @@ def test_login_success(client_no_auth, mock_supabase_client):
     }
     
     # Patch the supabase client in app.services.auth_service
-    with patch("app.services.auth_service.database.get_supabase_client", return_value=mock_supabase_client):
+    with patch("app.services.auth_service.database.get_async_supabase_client", return_value=mock_supabase_client):
         response = client_no_auth.post("/api/auth/login", json=payload)
         
     assert response.status_code == 200
@@ -81,9 +85,16 @@ def test_resend_verify_success(client_no_auth, mock_supabase_client):
     payload = {"email": "test@example.com"}
     
     # Patch the supabase client in app.services.auth_service
-    with patch("app.services.auth_service.database.get_supabase_client", return_value=mock_supabase_client):
+    with patch("app.services.auth_service.database.get_async_supabase_client", return_value=mock_supabase_client):
         response = client_no_auth.post("/api/auth/resend-verify", json=payload)
         
     assert response.status_code == 200
     assert response.json()["message"] == "驗證信已重新寄送，請檢查您的信箱"
-    mock_supabase_client.auth.resend.assert_called_once()
\ No newline at end of file
+    mock_supabase_client.auth.resend.assert_called_once()
+def test_logout_clears_cached_user(client_no_auth):
+    with patch("app.services.auth_service.user_cache") as mock_cache:
+        client_no_auth.cookies.set("access_token", "cached-token")
+        response = client_no_auth.post("/api/auth/logout")
+
+    assert response.status_code == 200
+    mock_cache.delete.assert_called_once()
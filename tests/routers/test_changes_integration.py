@@ -0,0 +1,48 @@
+import pytest
+from unittest.mock import MagicMock, patch, AsyncMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.dependencies.services import get_change_service
+from app.services.change_service import ChangeService, decode_change_token
+
+@pytest.fixture
+def client_authenticated():
+    from app.dependencies.auth import get_current_user
+    app.dependency_overrides[get_current_user] = lambda: {"id": "test-user-id", "email": "test@example.com"}
+    # 每個請求重新建立 Service，讓測試中 patch 的 Supabase Client 生效
+    app.dependency_overrides[get_change_service] = ChangeService
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+def test_get_changes(client_authenticated):
+    mock_supabase_admin = MagicMock()
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data={
+        "until": "2024-02-01T10:00:00+00:00",
+        "sessions": [{
+            "id": "session-1", "user_id": "test-user-id", "title": "Legs", "date": "2024-02-01",
+            "note": None, "created_at": "2024-02-01T09:00:00+00:00"
+        }],
+        "activities": [],
+        "records": [{
+            "id": "record-1", "activity_id": "activity-1", "set_number": 1, "repetition": 5,
+            "weight": 100, "duration": None, "distance": None, "score": None
+        }],
+        "deleted": []
+    }))
+
+    with patch("app.services.change_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.get("/api/changes")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["sessions"][0]["id"] == "session-1"
+    assert body["records"][0]["weight"] == 100.0
+    assert body["has_more"] is False
+    assert decode_change_token(body["next_token"])["until"].isoformat() == "2024-02-01T10:00:00+00:00"
+
+def test_get_changes_invalid_token(client_authenticated):
+    with patch("app.services.change_service.database.get_async_supabase_admin", return_value=MagicMock()):
+        response = client_authenticated.get("/api/changes", params={"since": "garbage"})
+
+    assert response.status_code == 400
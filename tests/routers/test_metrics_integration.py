@@ -0,0 +1,46 @@
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+
+def test_get_metrics():
+    client = TestClient(app)
+    response = client.get("/api/metrics")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert "hits" in data["auth_user_cache"]
+    assert data["session_cache"]["backend"] == "memory"
+    pool = data["supabase_pool"]["async_admin"]
+    assert pool["available"] is True
+    assert pool["max_connections"] > 0
+    assert pool["connections"] == pool["active"] + pool["idle"]
+
+def test_get_metrics_without_pool_internals():
+    client = TestClient(app)
+    # httpx / httpcore 內部結構改變時仍回傳設定的上限，不影響其他指標
+    with patch("app.database.database.supabase_admin.options.httpx_client._transport", object()):
+        response = client.get("/api/metrics")
+
+    assert response.status_code == 200
+    pool = response.json()["supabase_pool"]["admin"]
+    assert pool["available"] is False
+    assert pool["max_connections"] > 0
+
+def test_get_metrics_hidden_in_production_without_token():
+    client = TestClient(app)
+    with patch("app.dependencies.auth.environment", "Production"), \
+         patch("app.dependencies.auth.metrics_token", None):
+        response = client.get("/api/metrics")
+
+    assert response.status_code == 404
+
+def test_get_metrics_requires_token():
+    client = TestClient(app)
+    with patch("app.dependencies.auth.metrics_token", "secret"):
+        missing = client.get("/api/metrics")
+        wrong = client.get("/api/metrics", headers={"X-Metrics-Token": "other"})
+        allowed = client.get("/api/metrics", headers={"X-Metrics-Token": "secret"})
+
+    assert missing.status_code == 401
+    assert wrong.status_code == 401
+    assert allowed.status_code == 200
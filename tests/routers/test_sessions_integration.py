@@ -1,13 +1,19 @@
+import json
+import time
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, patch, AsyncMock
 from fastapi.testclient import TestClient
 from app.main import app
+from app.dependencies.services import get_training_session_service
+from app.services.training_session_service import TrainingSessionService, SESSIONS_BULK_MAX_ITEMS, EXPORT_PAGE_SIZE
 
 @pytest.fixture
 def client_authenticated():
     # Override get_current_user dependency
     from app.dependencies.auth import get_current_user
     app.dependency_overrides[get_current_user] = lambda: {"id": "test-user-id", "email": "test@example.com"}
+    # 每個請求重新建立 Service，讓測試中 patch 的 Supabase Client 生效
+    app.dependency_overrides[get_training_session_service] = TrainingSessionService
     with TestClient(app) as c:
         yield c
     app.dependency_overrides = {}
@@ -25,16 +31,16 @@ def test_create_training_session_success(client_authenticated, mock_supabase_adm
     }
     
     # Mock return value
-    mock_supabase_admin.table.return_value.insert.return_value.execute.return_value = MagicMock(
+    mock_supabase_admin.table.return_value.insert.return_value.execute = AsyncMock(return_value=MagicMock(
         data=[{
             "id": "session-123", 
             "user_id": "test-user-id", 
             "created_at": "2024-01-01T10:00:00Z",
             **payload
         }]
-    )
+    ))
 
-    with patch("app.services.training_session_service.database.get_supabase_admin", return_value=mock_supabase_admin):
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
         response = client_authenticated.post("/api/training-sessions", json=payload)
     
     assert response.status_code == 201
@@ -54,7 +60,7 @@ def test_get_sessions_with_activities_success(client_authenticated, mock_supabas
     # response = query.execute()
     
     mock_query = MagicMock()
-    mock_query.execute.return_value = MagicMock(
+    mock_query.execute = AsyncMock(return_value=MagicMock(
         data=[
             {
                 "id": "session-123",
@@ -66,7 +72,7 @@ def test_get_sessions_with_activities_success(client_authenticated, mock_supabas
                 "created_at": "2024-01-01T10:00:00Z"
             }
         ]
-    )
+    ))
     
     # Setup chain
     mock_supabase_admin.table.return_value.select.return_value.eq.return_value.order.return_value = mock_query
@@ -82,9 +88,9 @@ def test_get_sessions_with_activities_success(client_authenticated, mock_supabas
     
     mock_step1 = MagicMock() # result of eq
     mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
-    mock_step1.order.return_value = mock_query
+    mock_step1.order.return_value.order.return_value.limit.return_value = mock_query
 
-    with patch("app.services.training_session_service.database.get_supabase_admin", return_value=mock_supabase_admin):
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
         response = client_authenticated.get("/api/training-sessions/with-activities")
     
     assert response.status_code == 200
@@ -96,13 +102,8 @@ def test_update_training_session_success(client_authenticated, mock_supabase_adm
     session_id = "session-123"
     payload = {"title": "Updated Title"}
     
-    # Mock existing check: table().select().eq().eq().execute()
-    mock_supabase_admin.table.return_value.select.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(
-        data=[{"id": session_id}]
-    )
-    
-    # Mock update: table().update().eq().execute()
-    mock_supabase_admin.table.return_value.update.return_value.eq.return_value.execute.return_value = MagicMock(
+    # Mock update: table().update().eq(id).eq(user_id).execute()
+    mock_supabase_admin.table.return_value.update.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(
         data=[{
             "id": session_id, 
             "user_id": "test-user-id", 
@@ -111,9 +112,9 @@ def test_update_training_session_success(client_authenticated, mock_supabase_adm
             "created_at": "2024-01-01T10:00:00Z",
             **payload
         }]
-    )
+    ))
 
-    with patch("app.services.training_session_service.database.get_supabase_admin", return_value=mock_supabase_admin):
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
         response = client_authenticated.put(f"/api/training-sessions/{session_id}", json=payload)
     
     assert response.status_code == 200
@@ -124,11 +125,346 @@ def test_delete_training_session_success(client_authenticated, mock_supabase_adm
     session_id = "session-123"
     
     # Mock delete: table().delete().eq().eq().execute()
-    mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(
+    mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(
         data=[{"id": session_id}]
-    )
+    ))
 
-    with patch("app.services.training_session_service.database.get_supabase_admin", return_value=mock_supabase_admin):
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
         response = client_authenticated.delete(f"/api/training-sessions/{session_id}")
     
     assert response.status_code == 204
+
+def test_get_sessions_with_activities_next_cursor_header(client_authenticated, mock_supabase_admin):
+    rows = [
+        {
+            "id": f"00000000-0000-0000-0000-00000000000{i}",
+            "user_id": "test-user-id",
+            "title": None,
+            "date": f"2024-01-0{i}",
+            "note": None,
+            "activities": [],
+            "created_at": "2024-01-01T10:00:00Z"
+        }
+        for i in (3, 2, 1)
+    ]
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=rows)
+    )
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.get("/api/training-sessions/with-activities?limit=2")
+
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert "X-Next-Cursor" in response.headers
+
+def test_get_sessions_with_activities_sessions_only(client_authenticated, mock_supabase_admin):
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[{
+            "id": "session-123",
+            "user_id": "test-user-id",
+            "title": "Test Session",
+            "date": "2024-01-01",
+            "note": None,
+            "created_at": "2024-01-01T10:00:00Z"
+        }])
+    )
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.get("/api/training-sessions/with-activities?include=sessions")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["id"] == "session-123"
+    assert "activities" not in data[0]
+    select_arg = mock_supabase_admin.table.return_value.select.call_args[0][0]
+    assert "activity_records" not in select_arg
+
+def test_get_sessions_with_activities_activity_names(client_authenticated, mock_supabase_admin):
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[{
+            "id": "session-123",
+            "user_id": "test-user-id",
+            "title": "Test Session",
+            "date": "2024-01-01",
+            "note": None,
+            "created_at": "2024-01-01T10:00:00Z",
+            "activities": [{"id": "activity-1", "session_id": "session-123", "name": "Squat", "category": None}]
+        }])
+    )
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.get("/api/training-sessions/with-activities?include=activities")
+
+    assert response.status_code == 200
+    activity = response.json()[0]["activities"][0]
+    assert activity["name"] == "Squat"
+    assert "records" not in activity
+
+def test_get_sessions_with_activities_not_modified(client_authenticated, mock_supabase_admin):
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[])
+    )
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        first = client_authenticated.get("/api/training-sessions/with-activities")
+        etag = first.headers["ETag"]
+        second = client_authenticated.get("/api/training-sessions/with-activities", headers={"If-None-Match": etag})
+
+    assert second.status_code == 304
+    # 第二次請求不應查詢資料庫
+    assert mock_supabase_admin.table.call_count == 1
+
+def test_get_sessions_with_activities_not_modified_after_idle(client_authenticated, mock_supabase_admin):
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[])
+    )
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        etag = client_authenticated.get("/api/training-sessions/with-activities").headers["ETag"]
+        # 一小時沒有寫入，快取已過期，但資料版本與 ETag 不變
+        with patch("app.cache.ttl_cache.time.time", return_value=time.time() + 3600):
+            response = client_authenticated.get("/api/training-sessions/with-activities", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+
+def test_get_sessions_with_activities_etag_changes_after_write(client_authenticated, mock_supabase_admin):
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[])
+    )
+    mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[{"id": "session-123"}])
+    )
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        etag = client_authenticated.get("/api/training-sessions/with-activities").headers["ETag"]
+        client_authenticated.delete("/api/training-sessions/session-123")
+        response = client_authenticated.get("/api/training-sessions/with-activities", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_export_training_sessions(client_authenticated, mock_supabase_admin):
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[
+            {
+                "id": f"session-{i}",
+                "user_id": "test-user-id",
+                "title": None,
+                "date": "2024-01-01",
+                "note": None,
+                "created_at": "2024-01-01T10:00:00Z",
+                "activities": []
+            }
+            for i in range(2)
+        ])
+    )
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.get("/api/training-sessions/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["session-0", "session-1"]
+
+def test_get_sessions_with_activities_validated_mode(client_authenticated, mock_supabase_admin):
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[{
+            "id": "session-123",
+            "user_id": "test-user-id",
+            "title": None,
+            "date": "2024-01-01",
+            "note": None,
+            "created_at": "2024-01-01T10:00:00Z",
+            "activities": [],
+            "internal_column": "x"
+        }])
+    )
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin), \
+         patch("app.routers.training_sessions.SESSIONS_RESPONSE_MODE", "validated"):
+        response = client_authenticated.get("/api/training-sessions/with-activities")
+
+    assert response.status_code == 200
+    assert "internal_column" not in response.json()[0]
+
+def _full_session_rows():
+    return [{
+        "id": "session-123",
+        "user_id": "test-user-id",
+        "title": None,
+        "date": "2024-01-01",
+        "note": None,
+        "created_at": "2024-01-01T10:00:00Z",
+        "activities": [{
+            "id": "activity-1",
+            "session_id": "session-123",
+            "name": "Squat",
+            "category": "strength",
+            "description": None,
+            "records": [
+                {"id": f"record-{i}", "activity_id": "activity-1", "set_number": i, "repetition": 5,
+                 "weight": 100.0, "duration": None, "distance": None, "score": None}
+                for i in (1, 2)
+            ]
+        }]
+    }]
+
+@pytest.mark.parametrize("mode", ["trusted", "validated"])
+def test_get_sessions_with_activities_columnar(client_authenticated, mock_supabase_admin, mode):
+    rows = _full_session_rows()
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=rows)
+    )
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin), \
+         patch("app.routers.training_sessions.SESSIONS_RESPONSE_MODE", mode):
+        columnar = client_authenticated.get("/api/training-sessions/with-activities?format=columnar")
+        # 第二次請求讀取快取，確認 columnar 轉換沒有改動快取中的資料
+        default = client_authenticated.get("/api/training-sessions/with-activities")
+
+    assert columnar.status_code == 200
+    records = columnar.json()[0]["activities"][0]["records"]
+    assert records["id"] == ["record-1", "record-2"]
+    assert records["set_number"] == [1, 2]
+    assert records["weight"] == [100.0, 100.0]
+    assert "activity_id" not in records
+    assert default.json()[0]["activities"][0]["records"][0]["id"] == "record-1"
+    assert rows[0]["activities"][0]["records"][0]["activity_id"] == "activity-1"
+
+def test_export_training_sessions_reports_error_after_first_page(client_authenticated, mock_supabase_admin):
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[
+            {"id": f"session-{i:04d}", "user_id": "test-user-id", "title": None, "date": "2024-01-01",
+             "note": None, "created_at": "2024-01-01T10:00:00Z", "activities": []}
+            for i in range(EXPORT_PAGE_SIZE + 1)
+        ])
+    )
+    mock_step1.or_.return_value.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        side_effect=Exception("connection reset")
+    )
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.get("/api/training-sessions/export")
+
+    # 標頭已送出，錯誤以最後一行表示，用戶端可判斷匯出不完整
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == EXPORT_PAGE_SIZE + 1
+    assert lines[-1]["type"] == "error"
+
+def test_export_training_sessions_columnar(client_authenticated, mock_supabase_admin):
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=_full_session_rows())
+    )
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.get("/api/training-sessions/export?format=columnar")
+
+    session = json.loads(response.text.splitlines()[0])
+    assert session["activities"][0]["records"]["repetition"] == [5, 5]
+
+def test_get_training_calendar(client_authenticated, mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=[
+        {"date": "2024-01-05", "session_count": 1, "activity_count": 3, "set_count": 9, "tonnage": 2450.5}
+    ]))
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.get("/api/training-sessions/calendar?start_date=2024-01-01&end_date=2024-01-31")
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"date": "2024-01-05", "session_count": 1, "activity_count": 3, "set_count": 9, "tonnage": 2450.5}
+    ]
+    assert "ETag" in response.headers
+
+def test_create_training_sessions_bulk(client_authenticated, mock_supabase_admin):
+    payload = [{"title": f"Day {i}", "date": f"2024-01-0{i}"} for i in (1, 2, 3)]
+    mock_supabase_admin.table.return_value.insert.return_value.execute = AsyncMock(return_value=MagicMock(
+        data=[
+            {"id": f"session-{i}", "user_id": "test-user-id", "note": None,
+             "created_at": "2024-01-01T10:00:00Z", **item}
+            for i, item in enumerate(payload)
+        ]
+    ))
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.post("/api/training-sessions/bulk", json=payload)
+
+    assert response.status_code == 201
+    assert [s["id"] for s in response.json()] == ["session-0", "session-1", "session-2"]
+    # 單一多列 insert
+    mock_supabase_admin.table.return_value.insert.assert_called_once()
+    rows = mock_supabase_admin.table.return_value.insert.call_args[0][0]
+    assert [row["date"] for row in rows] == ["2024-01-01", "2024-01-02", "2024-01-03"]
+    assert all(row["user_id"] == "test-user-id" for row in rows)
+
+def test_create_training_sessions_bulk_item_errors(client_authenticated, mock_supabase_admin):
+    payload = [{"date": "2024-01-01"}, {"date": "not-a-date"}, {"title": "missing date"}]
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.post("/api/training-sessions/bulk", json=payload)
+
+    assert response.status_code == 422
+    assert sorted(error["loc"][1] for error in response.json()["detail"]) == [1, 2]
+    mock_supabase_admin.table.return_value.insert.assert_not_called()
+
+def test_create_training_sessions_bulk_too_many(client_authenticated, mock_supabase_admin):
+    payload = [{"date": "2024-01-01"}] * (SESSIONS_BULK_MAX_ITEMS + 1)
+
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.post("/api/training-sessions/bulk", json=payload)
+
+    assert response.status_code == 422
+    mock_supabase_admin.table.return_value.insert.assert_not_called()
+
+def test_import_training_history_csv(client_authenticated, mock_supabase_admin):
+    from app.dependencies.services import get_import_service
+    from app.services.import_service import ImportService
+    app.dependency_overrides[get_import_service] = ImportService
+    mock_supabase_admin.table.return_value.insert.return_value.execute = AsyncMock(return_value=MagicMock(
+        data=[{"id": "row-1"}]
+    ))
+    csv_data = "date,session_title,activity,set_number,repetition,weight\n2024-01-01,Leg day,Squat,1,5,100\n"
+
+    with patch("app.services.import_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.post(
+            "/api/training-sessions/import",
+            files={"file": ("history.csv", csv_data, "text/csv")}
+        )
+
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[-1]["type"] == "summary"
+    assert events[-1]["records"] == 1
+
+def test_import_training_history_unsupported_type(client_authenticated):
+    response = client_authenticated.post(
+        "/api/training-sessions/import",
+        files={"file": ("history.xlsx", b"data", "application/octet-stream")}
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,44 @@
+import pytest
+from unittest.mock import MagicMock, patch, AsyncMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.dependencies.services import get_sync_service
+from app.services.sync_service import SyncService
+
+@pytest.fixture
+def client_authenticated():
+    from app.dependencies.auth import get_current_user
+    app.dependency_overrides[get_current_user] = lambda: {"id": "test-user-id", "email": "test@example.com"}
+    # 每個請求重新建立 Service，讓測試中 patch 的 Supabase Client 生效
+    app.dependency_overrides[get_sync_service] = SyncService
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture
+def mock_supabase_admin():
+    return MagicMock()
+
+def test_sync_operations(client_authenticated, mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(side_effect=[
+        MagicMock(data=[{"id": "session-1", "title": "Legs", "date": "2024-01-01"}]),
+        MagicMock(data=[{"id": "activity-1", "session_id": "session-1", "name": "Squat", "records": []}])
+    ])
+
+    with patch("app.services.sync_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.post("/api/sync", json=[
+            {"client_id": "tmp-s1", "entity": "session", "action": "create", "data": {"date": "2024-01-01", "title": "Legs"}},
+            {"client_id": "tmp-a1", "entity": "activity", "action": "create", "data": {"session_id": "tmp-s1", "name": "Squat"}}
+        ])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id_map"] == {"tmp-s1": "session-1", "tmp-a1": "activity-1"}
+    assert [result["status"] for result in body["results"]] == [201, 201]
+
+def test_sync_rejects_unknown_entity(client_authenticated):
+    response = client_authenticated.post("/api/sync", json=[
+        {"client_id": "x", "entity": "template", "action": "create"}
+    ])
+
+    assert response.status_code == 422
@@ -0,0 +1,84 @@
+import pytest
+from unittest.mock import MagicMock, patch, AsyncMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.dependencies.services import get_workout_template_service
+from app.services.workout_template_service import WorkoutTemplateService
+
+@pytest.fixture
+def client_authenticated():
+    from app.dependencies.auth import get_current_user
+    app.dependency_overrides[get_current_user] = lambda: {"id": "test-user-id", "email": "test@example.com"}
+    # 每個請求重新建立 Service，讓測試中 patch 的 Supabase Client 生效
+    app.dependency_overrides[get_workout_template_service] = WorkoutTemplateService
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture
+def mock_supabase_admin():
+    return MagicMock()
+
+NEW_SESSION = {
+    "id": "session-2",
+    "user_id": "test-user-id",
+    "title": "Leg day",
+    "date": "2024-02-01",
+    "note": None,
+    "created_at": "2024-01-25T10:00:00Z"
+}
+
+def test_list_workout_templates(client_authenticated, mock_supabase_admin):
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value.order.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[{
+            "id": "template-1",
+            "name": "Leg day",
+            "created_at": "2024-01-01T10:00:00Z",
+            "payload": {"activities": [{
+                "name": "Squat", "category": "strength", "description": None,
+                "records": [{"set_number": 1, "repetition": 5, "weight": 100,
+                             "duration": None, "distance": None, "score": None}]
+            }]}
+        }])
+    )
+
+    with patch("app.services.workout_template_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.get("/api/workout-templates")
+
+    assert response.status_code == 200
+    assert response.json()[0]["payload"]["activities"][0]["records"][0]["weight"] == 100.0
+
+def test_instantiate_workout_template(client_authenticated, mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=NEW_SESSION))
+
+    with patch("app.services.workout_template_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.post("/api/workout-templates/template-1/instantiate", json={"date": "2024-02-01"})
+
+    assert response.status_code == 201
+    assert response.json()["id"] == "session-2"
+
+def test_clone_training_session(client_authenticated, mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=NEW_SESSION))
+
+    with patch("app.services.workout_template_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        response = client_authenticated.post("/api/training-sessions/session-1/clone", json={"date": "2024-02-01"})
+
+    assert response.status_code == 201
+    assert mock_supabase_admin.rpc.call_args[0][0] == "clone_training_session"
+
+def test_instantiate_workout_template_idempotent(client_authenticated, mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=NEW_SESSION))
+    headers = {"Idempotency-Key": "instantiate-1"}
+
+    with patch("app.services.workout_template_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        first = client_authenticated.post("/api/workout-templates/template-1/instantiate", json={"date": "2024-02-01"}, headers=headers)
+        second = client_authenticated.post("/api/workout-templates/template-1/instantiate", json={"date": "2024-02-01"}, headers=headers)
+        changed = client_authenticated.post("/api/workout-templates/template-1/instantiate", json={"date": "2024-02-02"}, headers=headers)
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert changed.status_code == 422
+    mock_supabase_admin.rpc.assert_called_once()
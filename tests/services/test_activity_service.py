@@ -1,12 +1,14 @@
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, patch, AsyncMock
 from decimal import Decimal
 from fastapi import HTTPException
+from supabase import PostgrestAPIError
 from app.services.activity_service import ActivityService
 from app.models.training_activities import (
     TrainingActivityWithRecordsCreate,
     ActivityRecordCreate,
-    ActivityRecordUpdate
+    ActivityRecordUpdate,
+    ActivityRecordPatch
 )
 
 @pytest.fixture
@@ -15,104 +17,225 @@ def mock_supabase_admin():
 
 @pytest.fixture
 def service(mock_supabase_admin):
-    with patch("app.services.activity_service.database.get_supabase_admin", return_value=mock_supabase_admin):
+    with patch("app.services.activity_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
         svc = ActivityService()
         yield svc
 
-def test_create_activity_rollback_on_record_failure(service, mock_supabase_admin):
-    user_id = "user-1"
+@pytest.mark.asyncio
+async def test_create_activity_single_rpc(service, mock_supabase_admin):
     activity_data = TrainingActivityWithRecordsCreate(
         session_id="session-1",
         name="Test Activity",
-        activity_records=[ActivityRecordCreate(set_number=1, weight=100, repetition=10)]
+        activity_records=[ActivityRecordCreate(set_number=1, weight=Decimal("100.5"), reps=10)]
     )
+    created = {"id": "activity-1", "session_id": "session-1", "name": "Test Activity",
+               "category": None, "description": None, "records": [{"id": "record-1"}]}
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=created))
 
-    # Mock session verify (Success)
-    mock_supabase_admin.table.return_value.select.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(
-        data=[{"id": "session-1"}]
-    )
+    result = await service.create_activity("user-1", activity_data)
 
-    # Mock activity insert (Success)
-    mock_supabase_admin.table.return_value.insert.return_value.execute.side_effect = [
-        MagicMock(data=[{"id": "activity-1", "session_id": "session-1", "name": "Test", "category": None, "description": None}]),
-        # Record insert (Fail - Empty data)
-        MagicMock(data=[])
-    ]
+    assert result == created
+    mock_supabase_admin.rpc.assert_called_once()
+    name, params = mock_supabase_admin.rpc.call_args[0]
+    assert name == "create_activity_with_records"
+    assert params["p_user_id"] == "user-1"
+    assert params["p_records"] == [{
+        "set_number": 1, "repetition": 10, "weight": 100.5,
+        "duration": None, "distance": None, "score": None
+    }]
+    mock_supabase_admin.table.assert_not_called()
 
-    # Mock delete for rollback
-    mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.execute.return_value = MagicMock()
+@pytest.mark.asyncio
+async def test_create_activity_session_not_owned(service, mock_supabase_admin):
+    activity_data = TrainingActivityWithRecordsCreate(session_id="session-1", name="Test Activity")
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(side_effect=PostgrestAPIError({
+        "message": "Training session not found or you don't have permission",
+        "code": "P0002"
+    }))
 
     with pytest.raises(HTTPException) as exc:
-        service.create_activity(user_id, activity_data)
-    
-    assert exc.value.status_code == 500
-    assert "Failed to create activity records" in exc.value.detail
-    
-    # Verify rollback delete called
-    # We expect: table("training_activities").delete().eq("id", "activity-1")
-    # Since we can't easily track chains with side_effect sharing the same mock object in this simple setup without being very verbose,
-    # we just check that 'delete' was called.
-    assert mock_supabase_admin.table.return_value.delete.called
+        await service.create_activity("user-1", activity_data)
+
+    assert exc.value.status_code == 404
 
-def test_update_records_diffing_logic(service, mock_supabase_admin):
+def mock_record_changes(mock_supabase_admin, inserted=(), updated=(), deleted=()):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(
+        data={"inserted": list(inserted), "updated": list(updated), "deleted": list(deleted)}
+    ))
+
+@pytest.mark.asyncio
+async def test_update_records_returns_database_changes(service, mock_supabase_admin):
     activity_id = "activity-1"
-    # Scenario: Keep record-1, Delete others (if any), Add/Update record-1 and record-2
+    mock_record_changes(mock_supabase_admin, inserted=["record-4"], updated=["record-2"], deleted=["record-3"])
     records_to_process = [
-        ActivityRecordUpdate(id="record-1", activity_id=activity_id, set_number=1, repetition=10),
-        ActivityRecordUpdate(id="record-2", activity_id=activity_id, set_number=2, repetition=10)
+        ActivityRecordUpdate(id="record-1", activity_id=activity_id, set_number=1, repetition=10, weight=Decimal("100.50")),
+        ActivityRecordUpdate(id="record-2", activity_id=activity_id, set_number=2, repetition=8),
+        ActivityRecordUpdate(id="record-4", activity_id=activity_id, set_number=3, repetition=10)
     ]
-    
-    # Mock delete for removed records
-    mock_delete_chain = mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.not_.in_.return_value.execute
-    mock_delete_chain.return_value = MagicMock()
-    
-    # Mock upsert
-    mock_upsert_chain = mock_supabase_admin.table.return_value.upsert.return_value.execute
-    mock_upsert_chain.return_value = MagicMock()
-    
-    service.update_records(activity_id, records_to_process)
-    
-    # Verify delete called with correct logic
-    # table("activity_records").delete().eq("activity_id", activity_id).not_.in_("id", ids_to_keep)
-    args, _ = mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.not_.in_.call_args
-    assert args[0] == "id"
-    assert set(args[1]) == {"record-1", "record-2"}
-    
-    # Verify upsert called
-    assert mock_supabase_admin.table.return_value.upsert.called
-    upsert_args = mock_supabase_admin.table.return_value.upsert.call_args[0][0]
-    assert len(upsert_args) == 2
-    assert upsert_args[0]["id"] == "record-1"
-    assert upsert_args[1]["id"] == "record-2"
-
-def test_update_records_decimal_conversion(service, mock_supabase_admin):
+
+    changes = await service.update_records("user-1", activity_id, records_to_process)
+
+    # 比對與刪除在 RPC 中完成，回傳的是資料庫實際寫入的結果
+    assert changes == {"inserted": ["record-4"], "updated": ["record-2"], "deleted": ["record-3"]}
+    name, params = mock_supabase_admin.rpc.call_args[0]
+    assert name == "apply_activity_record_changes"
+    assert [row["id"] for row in params["p_records"]] == ["record-1", "record-2", "record-4"]
+    mock_supabase_admin.table.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_update_records_no_changes_keeps_data_version(service, mock_supabase_admin):
+    mock_record_changes(mock_supabase_admin)
+    records_to_process = [
+        ActivityRecordUpdate(id="record-1", activity_id="activity-1", set_number=1, repetition=10, weight=Decimal("100.5"))
+    ]
+
+    with patch("app.services.activity_service.data_version.record_change", new_callable=AsyncMock) as record_change:
+        changes = await service.update_records("user-1", "activity-1", records_to_process)
+
+    assert changes == {"inserted": [], "updated": [], "deleted": []}
+    record_change.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_update_records_decimal_conversion(service, mock_supabase_admin):
     activity_id = "activity-1"
+    mock_record_changes(mock_supabase_admin, inserted=["r1"])
     records_to_process = [
         ActivityRecordUpdate(id="r1", activity_id=activity_id, set_number=1, weight=Decimal("100.5"), repetition=10)
     ]
-    
-    mock_supabase_admin.table.return_value.upsert.return_value.execute.return_value = MagicMock()
-    
-    service.update_records(activity_id, records_to_process)
-    
-    # Verify upsert payload has float, not Decimal
-    upsert_args = mock_supabase_admin.table.return_value.upsert.call_args[0][0]
-    assert isinstance(upsert_args[0]["weight"], float)
-    assert upsert_args[0]["weight"] == 100.5
 
-def test_delete_activity_forbidden(service, mock_supabase_admin):
+    await service.update_records("user-1", activity_id, records_to_process)
+
+    # RPC 參數中的數值為 float，不是 Decimal
+    rows = mock_supabase_admin.rpc.call_args[0][1]["p_records"]
+    assert isinstance(rows[0]["weight"], float)
+    assert rows[0]["weight"] == 100.5
+
+@pytest.mark.asyncio
+async def test_update_records_rejects_duplicate_ids(service, mock_supabase_admin):
+    records_to_process = [
+        ActivityRecordUpdate(id="record-1", activity_id="activity-1", set_number=1, repetition=10),
+        ActivityRecordUpdate(id="record-1", activity_id="activity-1", set_number=2, repetition=8)
+    ]
+
+    with pytest.raises(HTTPException) as exc:
+        await service.update_records("user-1", "activity-1", records_to_process)
+
+    assert exc.value.status_code == 422
+    mock_supabase_admin.rpc.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_update_records_activity_not_owned(service, mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(side_effect=PostgrestAPIError({
+        "message": "Training activity not found", "code": "P0002"
+    }))
+
+    with pytest.raises(HTTPException) as exc:
+        await service.update_records("user-1", "activity-1", [])
+
+    assert exc.value.status_code == 404
+
+@pytest.mark.asyncio
+async def test_update_records_id_owned_by_other_activity(service, mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(side_effect=PostgrestAPIError({
+        "message": "Record ID record-9 belongs to a different activity", "code": "23505"
+    }))
+    records_to_process = [ActivityRecordUpdate(id="record-9", activity_id="activity-1", set_number=1, repetition=10)]
+
+    with pytest.raises(HTTPException) as exc:
+        await service.update_records("user-1", "activity-1", records_to_process)
+
+    assert exc.value.status_code == 409
+
+@pytest.mark.asyncio
+async def test_delete_activity_forbidden(service, mock_supabase_admin):
     user_id = "user-1"
     activity_id = "activity-1"
     
-    # Mock verify found activity but different user
-    mock_supabase_admin.table.return_value.select.return_value.eq.return_value.execute.return_value = MagicMock(
-        data=[{
-            "id": activity_id,
-            "training_sessions": {"user_id": "other-user"}
-        }]
-    )
+    # 活動屬於其他使用者時，RPC 的刪除條件不成立，與不存在的活動一樣回傳 404
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(side_effect=PostgrestAPIError({
+        "message": "Training activity not found", "code": "P0002"
+    }))
     
     with pytest.raises(HTTPException) as exc:
-        service.delete_activity(user_id, activity_id)
+        await service.delete_activity(user_id, activity_id)
     
-    assert exc.value.status_code == 403
+    assert exc.value.status_code == 404
+    mock_supabase_admin.rpc.assert_called_once_with("delete_training_activity", {
+        "p_user_id": user_id, "p_activity_id": activity_id
+    })
+
+@pytest.mark.asyncio
+async def test_append_record(service, mock_supabase_admin):
+    created = {"id": "record-9", "activity_id": "activity-1", "set_number": 9}
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=created))
+
+    result = await service.append_record("user-1", "activity-1", ActivityRecordCreate(set_number=9, reps=5, weight=Decimal("80")))
+
+    assert result == created
+    name, params = mock_supabase_admin.rpc.call_args[0]
+    assert name == "append_activity_record"
+    assert params["p_record"]["repetition"] == 5
+    assert params["p_record"]["weight"] == 80.0
+    mock_supabase_admin.table.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_patch_record_sends_only_set_fields(service, mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data={"id": "record-1"}))
+
+    await service.patch_record("user-1", "record-1", ActivityRecordPatch(weight=Decimal("102.5"), duration=None))
+
+    params = mock_supabase_admin.rpc.call_args[0][1]
+    assert params["p_changes"] == {"weight": 102.5, "duration": None}
+
+@pytest.mark.asyncio
+async def test_patch_record_not_found(service, mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(side_effect=PostgrestAPIError({
+        "message": "Activity record not found", "code": "P0002"
+    }))
+
+    with pytest.raises(HTTPException) as exc:
+        await service.patch_record("user-1", "record-1", ActivityRecordPatch(repetition=3))
+
+    assert exc.value.status_code == 404
+
+@pytest.mark.asyncio
+async def test_patch_record_empty(service, mock_supabase_admin):
+    with pytest.raises(HTTPException) as exc:
+        await service.patch_record("user-1", "record-1", ActivityRecordPatch())
+
+    assert exc.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_create_activities_single_rpc(service, mock_supabase_admin):
+    activities = [
+        TrainingActivityWithRecordsCreate(
+            session_id="session-1",
+            name=name,
+            activity_records=[ActivityRecordCreate(set_number=i, repetition=5) for i in (1, 2)]
+        )
+        for name in ("Squat", "Bench")
+    ]
+    created = [{"id": "activity-1", "name": "Squat"}, {"id": "activity-2", "name": "Bench"}]
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=created))
+
+    result = await service.create_activities("user-1", activities)
+
+    assert result == created
+    name, params = mock_supabase_admin.rpc.call_args[0]
+    assert name == "create_activities_with_records"
+    assert params["p_session_id"] == "session-1"
+    assert [a["name"] for a in params["p_activities"]] == ["Squat", "Bench"]
+    assert len(params["p_activities"][0]["records"]) == 2
+
+@pytest.mark.asyncio
+async def test_create_activities_mixed_sessions(service, mock_supabase_admin):
+    activities = [
+        TrainingActivityWithRecordsCreate(session_id="session-1", name="Squat"),
+        TrainingActivityWithRecordsCreate(session_id="session-2", name="Bench")
+    ]
+
+    with pytest.raises(HTTPException) as exc:
+        await service.create_activities("user-1", activities)
+
+    assert exc.value.status_code == 400
+    mock_supabase_admin.rpc.assert_not_called()
@@ -18,7 +18,7 @@ def mock_gemini_client():
 @pytest.fixture
 def service(mock_supabase_admin, mock_gemini_client):
     # Patch dependencies
-    with patch("app.services.ai_service.database.get_supabase_admin", return_value=mock_supabase_admin), \
+    with patch("app.services.ai_service.database.get_async_supabase_admin", return_value=mock_supabase_admin), \
          patch("app.services.ai_service.genai.Client", return_value=mock_gemini_client):
         svc = AIService()
         yield svc
@@ -26,7 +26,7 @@ def service(mock_supabase_admin, mock_gemini_client):
 @pytest.mark.asyncio
 async def test_chat_with_analysis_no_records(service):
     # Mock empty data
-    service.supabase.table.return_value.select.return_value.eq.return_value.gte.return_value.lte.return_value.order.return_value.limit.return_value.execute.return_value = MagicMock(data=[])
+    service.supabase.table.return_value.select.return_value.eq.return_value.gte.return_value.lte.return_value.order.return_value.limit.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
     service.gemini_client.aio.models.generate_content.return_value = MagicMock(text="Response")
 
     user_id = "user-1"
@@ -0,0 +1,99 @@
+import json
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch, AsyncMock
+from datetime import date
+from fastapi import HTTPException
+from app.cache.backends import InMemoryCacheBackend
+from app.services.analytics_service import AnalyticsService, compute_progression, epley, brzycki, rolling_sum
+
+COLUMNS = {
+    "date": ["2024-01-01", "2024-01-01", "2024-01-03", "2024-01-10"],
+    "set_number": [1, 2, 1, 1],
+    "weight": [100, 110, 120, 100],
+    "repetition": [5, 3, 1, 10]
+}
+
+def test_e1rm_formulas():
+    weight = np.array([100.0, 100.0])
+    reps = np.array([1, 10])
+
+    assert epley(weight, reps).tolist() == pytest.approx([100.0, 133.333], rel=1e-4)
+    assert brzycki(weight, reps).tolist() == pytest.approx([100.0, 133.333], rel=1e-4)
+    # 超過 36 次時分母不為 0
+    assert np.isfinite(brzycki(np.array([50.0]), np.array([40]))).all()
+
+def test_rolling_sum_uses_calendar_days():
+    days = np.array(["2024-01-01", "2024-01-03", "2024-01-10"], dtype="datetime64[D]")
+
+    assert rolling_sum(days, np.array([1.0, 2.0, 4.0]), 7).tolist() == [1.0, 3.0, 4.0]
+    assert rolling_sum(days, np.array([1.0, 2.0, 4.0]), 10).tolist() == [1.0, 3.0, 7.0]
+
+def test_compute_progression():
+    result = compute_progression(COLUMNS, window_days=7)
+
+    assert result["sets"]["volume"] == [500.0, 330.0, 120.0, 1000.0]
+    assert result["sets"]["e1rm_epley"] == [116.67, 121.0, 120.0, 133.33]
+    days = result["days"]
+    assert days["date"] == ["2024-01-01", "2024-01-03", "2024-01-10"]
+    assert days["volume"] == [830.0, 120.0, 1000.0]
+    assert days["rolling_volume"] == [830.0, 950.0, 1000.0]
+    # 1/1 估算 1RM 最高的是第 2 組（110 x 3）
+    assert days["best_set_number"] == [2, 1, 1]
+    assert days["best_weight"] == [110.0, 120.0, 100.0]
+    assert days["best_e1rm"] == [121.0, 120.0, 133.33]
+    assert days["intensity"] == [0.868, 1.0, 0.75]
+
+def test_compute_progression_bodyweight_day():
+    result = compute_progression({
+        "date": ["2024-01-01", "2024-01-02"],
+        "set_number": [1, 1],
+        "weight": [0, 100],
+        "repetition": [10, 1]
+    })
+
+    # 只有重量 0 的日子強度為 0，不會產生 NaN
+    assert result["days"]["best_e1rm"] == [0.0, 100.0]
+    assert result["days"]["intensity"] == [0.0, 1.0]
+    json.dumps(result, allow_nan=False)
+
+def test_compute_progression_without_sets():
+    result = compute_progression({"date": [], "set_number": [], "weight": [], "repetition": []})
+
+    assert result["sets"]["e1rm_epley"] == []
+    assert result["days"] == {key: [] for key in result["days"]}
+
+@pytest.fixture
+def mock_supabase_admin():
+    mock = MagicMock()
+    mock.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=COLUMNS))
+    return mock
+
+@pytest.fixture
+def service(mock_supabase_admin):
+    with patch("app.services.analytics_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        svc = AnalyticsService()
+        svc.session_cache = InMemoryCacheBackend()
+        yield svc
+
+@pytest.mark.asyncio
+async def test_get_progression_is_cached(service, mock_supabase_admin):
+    first = await service.get_progression("user-1", "Squat", start_date=date(2024, 1, 1), formula="brzycki")
+    second = await service.get_progression("user-1", "squat", start_date=date(2024, 1, 1), formula="brzycki")
+
+    assert first["days"] == second["days"]
+    assert first["formula"] == "brzycki"
+    mock_supabase_admin.rpc.assert_called_once_with("exercise_set_columns", {
+        "p_user_id": "user-1", "p_exercise": "Squat", "p_start_date": "2024-01-01", "p_end_date": None
+    })
+
+    await service.session_cache.invalidate("user-1")
+    await service.get_progression("user-1", "Squat", start_date=date(2024, 1, 1), formula="brzycki")
+    assert mock_supabase_admin.rpc.call_count == 2
+
+@pytest.mark.asyncio
+async def test_get_progression_invalid_range(service):
+    with pytest.raises(HTTPException) as exc:
+        await service.get_progression("user-1", "Squat", date(2024, 2, 1), date(2024, 1, 1))
+
+    assert exc.value.status_code == 400
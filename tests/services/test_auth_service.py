@@ -1,7 +1,10 @@
+import time
+import jwt
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, patch, AsyncMock
 from fastapi import HTTPException
 from supabase import AuthApiError
+from app.cache.ttl_cache import TTLCache
 from app.services.auth_service import AuthService
 
 @pytest.fixture
@@ -12,19 +15,21 @@ def mock_supabase_client():
 @pytest.fixture
 def auth_service(mock_supabase_client):
     # Patch the database.get_supabase_client to return our mock
-    with patch("app.services.auth_service.database.get_supabase_client", return_value=mock_supabase_client):
+    with patch("app.services.auth_service.database.get_async_supabase_client", return_value=mock_supabase_client):
         service = AuthService()
+        service.user_cache = TTLCache(max_size=10, ttl_seconds=60)
         yield service
 
-def test_signup_success(auth_service, mock_supabase_client):
+@pytest.mark.asyncio
+async def test_signup_success(auth_service, mock_supabase_client):
     # Setup mock
-    mock_supabase_client.auth.sign_up.return_value = MagicMock(
+    mock_supabase_client.auth.sign_up = AsyncMock(return_value=MagicMock(
         user=MagicMock(id="test-id", email="test@example.com"),
         session=None
-    )
-    mock_supabase_client.table.return_value.insert.return_value.execute.return_value = MagicMock(data=[])
+    ))
+    mock_supabase_client.table.return_value.insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
 
-    result = auth_service.signup("test@example.com", "password", "username")
+    result = await auth_service.signup("test@example.com", "password", "username")
     
     assert result["message"] == "註冊成功"
     assert result["user_id"] == "test-id"
@@ -35,80 +40,166 @@ def test_signup_success(auth_service, mock_supabase_client):
     })
     mock_supabase_client.table.assert_called_with("users")
 
-def test_signup_failure_no_user(auth_service, mock_supabase_client):
-    mock_supabase_client.auth.sign_up.return_value = MagicMock(user=None)
+@pytest.mark.asyncio
+async def test_signup_failure_no_user(auth_service, mock_supabase_client):
+    mock_supabase_client.auth.sign_up = AsyncMock(return_value=MagicMock(user=None))
     
     with pytest.raises(HTTPException) as exc:
-        auth_service.signup("test@example.com", "password", "username")
+        await auth_service.signup("test@example.com", "password", "username")
     
     assert exc.value.status_code == 400
     assert exc.value.detail == "使用者註冊失敗"
 
-def test_signup_existing_email(auth_service, mock_supabase_client):
+@pytest.mark.asyncio
+async def test_signup_existing_email(auth_service, mock_supabase_client):
     # Mock AuthApiError
     error = AuthApiError(message="User already registered", status=400, code="400")
-    mock_supabase_client.auth.sign_up.side_effect = error
+    mock_supabase_client.auth.sign_up = AsyncMock(side_effect=error)
     
     with pytest.raises(HTTPException) as exc:
-        auth_service.signup("test@example.com", "password", "username")
+        await auth_service.signup("test@example.com", "password", "username")
         
     assert exc.value.status_code == 400
     assert exc.value.detail == "Email已註冊"
 
-def test_login_success(auth_service, mock_supabase_client):
+@pytest.mark.asyncio
+async def test_login_success(auth_service, mock_supabase_client):
     mock_response = MagicMock(
         user=MagicMock(id="test-id"),
         session=MagicMock(access_token="token", refresh_token="refresh")
     )
-    mock_supabase_client.auth.sign_in_with_password.return_value = mock_response
+    mock_supabase_client.auth.sign_in_with_password = AsyncMock(return_value=mock_response)
     
-    result = auth_service.login("test@example.com", "password")
+    result = await auth_service.login("test@example.com", "password")
     
     assert result == mock_response
 
-def test_login_failure(auth_service, mock_supabase_client):
-    mock_supabase_client.auth.sign_in_with_password.return_value = MagicMock(user=None, session=None)
+@pytest.mark.asyncio
+async def test_login_failure(auth_service, mock_supabase_client):
+    mock_supabase_client.auth.sign_in_with_password = AsyncMock(return_value=MagicMock(user=None, session=None))
     
     with pytest.raises(HTTPException) as exc:
-        auth_service.login("test@example.com", "password")
+        await auth_service.login("test@example.com", "password")
         
     assert exc.value.status_code == 401
     assert exc.value.detail == "登入失敗：電子郵件或密碼錯誤"
 
-def test_resend_verification_success(auth_service, mock_supabase_client):
-    auth_service.resend_verification("test@example.com")
+@pytest.mark.asyncio
+async def test_resend_verification_success(auth_service, mock_supabase_client):
+    mock_supabase_client.auth.resend = AsyncMock()
+    await auth_service.resend_verification("test@example.com")
     mock_supabase_client.auth.resend.assert_called_with({
         "type": "signup",
         "email": "test@example.com"
     })
 
-def test_resend_verification_rate_limit(auth_service, mock_supabase_client):
-    mock_supabase_client.auth.resend.side_effect = Exception("Rate limit exceeded")
+@pytest.mark.asyncio
+async def test_resend_verification_rate_limit(auth_service, mock_supabase_client):
+    mock_supabase_client.auth.resend = AsyncMock(side_effect=Exception("Rate limit exceeded"))
     
     with pytest.raises(HTTPException) as exc:
-        auth_service.resend_verification("test@example.com")
+        await auth_service.resend_verification("test@example.com")
         
     assert exc.value.status_code == 429
     assert exc.value.detail == "發送過於頻繁，請稍後再試"
 
-def test_get_user_by_token_success(auth_service, mock_supabase_client):
-    mock_supabase_client.auth.get_user.return_value = MagicMock(
+@pytest.mark.asyncio
+async def test_get_user_by_token_success(auth_service, mock_supabase_client):
+    mock_supabase_client.auth.get_user = AsyncMock(return_value=MagicMock(
         user=MagicMock(
             id="test-id",
             email="test@example.com",
             user_metadata={"username": "testuser"}
         )
-    )
+    ))
     
-    user = auth_service.get_user_by_token("valid-token")
+    user = await auth_service.get_user_by_token("valid-token")
     
     assert user["id"] == "test-id"
     assert user["username"] == "testuser"
 
-def test_get_user_by_token_invalid(auth_service, mock_supabase_client):
-    mock_supabase_client.auth.get_user.side_effect = Exception("Invalid token")
+@pytest.mark.asyncio
+async def test_get_user_by_token_invalid(auth_service, mock_supabase_client):
+    mock_supabase_client.auth.get_user = AsyncMock(side_effect=Exception("Invalid token"))
     
     with pytest.raises(HTTPException) as exc:
-        auth_service.get_user_by_token("invalid-token")
+        await auth_service.get_user_by_token("invalid-token")
         
     assert exc.value.status_code == 401
+
+@pytest.mark.asyncio
+async def test_get_user_by_token_local_verification(auth_service, mock_supabase_client):
+    auth_service.jwt_verifier = MagicMock(enabled=True, revocation_check=False)
+    auth_service.jwt_verifier.verify = AsyncMock(return_value={
+        "sub": "test-id",
+        "email": "test@example.com",
+        "user_metadata": {"username": "testuser"}
+    })
+
+    user = await auth_service.get_user_by_token("valid-token")
+
+    assert user == {"id": "test-id", "email": "test@example.com", "username": "testuser"}
+    mock_supabase_client.auth.get_user.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_user_by_token_local_invalid(auth_service, mock_supabase_client):
+    auth_service.jwt_verifier = MagicMock(enabled=True, revocation_check=False)
+    auth_service.jwt_verifier.verify = AsyncMock(side_effect=jwt.ExpiredSignatureError("expired"))
+
+    with pytest.raises(HTTPException) as exc:
+        await auth_service.get_user_by_token("expired-token")
+
+    assert exc.value.status_code == 401
+    mock_supabase_client.auth.get_user.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_user_by_token_local_with_revocation_check(auth_service, mock_supabase_client):
+    auth_service.jwt_verifier = MagicMock(enabled=True, revocation_check=True)
+    auth_service.jwt_verifier.verify = AsyncMock(return_value={"sub": "test-id"})
+    mock_supabase_client.auth.get_user = AsyncMock(side_effect=Exception("Session revoked"))
+
+    with pytest.raises(HTTPException) as exc:
+        await auth_service.get_user_by_token("revoked-token")
+
+    assert exc.value.status_code == 401
+    mock_supabase_client.auth.get_user.assert_called_once_with("revoked-token")
+
+@pytest.mark.asyncio
+async def test_get_user_by_token_cached(auth_service, mock_supabase_client):
+    token = jwt.encode({"sub": "test-id", "exp": int(time.time()) + 3600}, "secret-key-for-tests-with-32-bytes")
+    mock_supabase_client.auth.get_user = AsyncMock(return_value=MagicMock(
+        user=MagicMock(id="test-id", email="test@example.com", user_metadata={})
+    ))
+
+    first = await auth_service.get_user_by_token(token)
+    second = await auth_service.get_user_by_token(token)
+
+    assert first == second
+    mock_supabase_client.auth.get_user.assert_called_once()
+    assert auth_service.user_cache.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_get_user_by_token_cache_expires_with_token(auth_service, mock_supabase_client):
+    exp = int(time.time()) + 5
+    token = jwt.encode({"sub": "test-id", "exp": exp}, "secret-key-for-tests-with-32-bytes")
+    mock_supabase_client.auth.get_user = AsyncMock(return_value=MagicMock(
+        user=MagicMock(id="test-id", email="test@example.com", user_metadata={})
+    ))
+
+    await auth_service.get_user_by_token(token)
+
+    expires_at, _ = next(iter(auth_service.user_cache._data.values()))
+    assert expires_at <= exp
+
+@pytest.mark.asyncio
+async def test_invalidate_token(auth_service, mock_supabase_client):
+    token = jwt.encode({"sub": "test-id", "exp": int(time.time()) + 3600}, "secret-key-for-tests-with-32-bytes")
+    mock_supabase_client.auth.get_user = AsyncMock(return_value=MagicMock(
+        user=MagicMock(id="test-id", email="test@example.com", user_metadata={})
+    ))
+
+    await auth_service.get_user_by_token(token)
+    auth_service.invalidate_token(token)
+    await auth_service.get_user_by_token(token)
+
+    assert mock_supabase_client.auth.get_user.call_count == 2
@@ -0,0 +1,106 @@
+import pytest
+from unittest.mock import MagicMock, patch, AsyncMock
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from app.services.change_service import ChangeService, encode_change_token, decode_change_token
+
+SESSION_ID = "4f521a2f-713a-4383-9999-1d51deedb1e3"
+
+UNTIL = "2024-02-01T10:00:00.123456+00:00"
+
+@pytest.fixture
+def mock_supabase_admin():
+    mock = MagicMock()
+    mock.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data={
+        "until": UNTIL,
+        "sessions": [],
+        "activities": [],
+        "records": [],
+        "deleted": [{"entity": "session", "id": "session-1", "deleted_at": "2024-02-01T09:59:00+00:00"}]
+    }))
+    return mock
+
+@pytest.fixture
+def service(mock_supabase_admin):
+    with patch("app.services.change_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        yield ChangeService()
+
+def test_change_token_round_trip():
+    until = datetime.fromisoformat(UNTIL)
+
+    assert decode_change_token(encode_change_token(until)) == {"until": until, "since": None, "after": None}
+
+def test_page_token_round_trip():
+    until = datetime.fromisoformat(UNTIL)
+    after = {"kind": 3, "changed_at": "2024-02-01T09:00:00+00:00", "id": SESSION_ID}
+
+    token = decode_change_token(encode_change_token(until, None, after))
+
+    assert token == {"until": until, "since": None, "after": after}
+
+@pytest.mark.parametrize("token", [
+    "not-a-token",
+    encode_change_token(datetime(2024, 1, 1))[:-2],
+    encode_change_token(datetime.fromisoformat(UNTIL), None, {"kind": 9, "changed_at": UNTIL, "id": SESSION_ID}),
+    encode_change_token(datetime.fromisoformat(UNTIL), None, {"kind": 1, "changed_at": UNTIL, "id": "1 or 1=1"})
+])
+def test_decode_invalid_change_token(token):
+    with pytest.raises(HTTPException) as exc:
+        decode_change_token(token)
+
+    assert exc.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_get_changes_initial_sync(service, mock_supabase_admin):
+    result = await service.get_changes("user-1")
+
+    params = mock_supabase_admin.rpc.call_args.args[1]
+    assert params["p_since"] is None and params["p_after_kind"] is None
+    assert result["has_more"] is False
+    assert decode_change_token(result["next_token"])["until"] == datetime.fromisoformat(UNTIL)
+    assert result["deleted"][0]["id"] == "session-1"
+
+@pytest.mark.asyncio
+async def test_get_changes_truncated_page(service, mock_supabase_admin):
+    next_page = {"kind": 1, "changed_at": "2024-02-01T09:00:00+00:00", "id": SESSION_ID}
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data={
+        "until": UNTIL,
+        "sessions": [{"id": SESSION_ID}],
+        "activities": [],
+        "records": [],
+        "deleted": [],
+        "next": next_page
+    }))
+
+    with patch("app.services.change_service.CHANGES_PAGE_SIZE", 1):
+        first = await service.get_changes("user-1", limit=50)
+        await service.get_changes("user-1", first["next_token"])
+
+    assert first["has_more"] is True
+    first_params, second_params = [call.args[1] for call in mock_supabase_admin.rpc.call_args_list]
+    # 每頁筆數不超過上限
+    assert first_params["p_limit"] == 1
+    # 下一頁沿用第一頁的查詢區間，並從上一頁最後一筆之後開始
+    assert second_params["p_since"] is None
+    assert datetime.fromisoformat(second_params["p_until"]) == datetime.fromisoformat(UNTIL)
+    assert (second_params["p_after_kind"], second_params["p_after_id"]) == (1, SESSION_ID)
+
+@pytest.mark.asyncio
+async def test_get_changes_since_token_overlaps(service, mock_supabase_admin):
+    since = datetime.now(timezone.utc) - timedelta(minutes=1)
+
+    with patch("app.services.change_service.CHANGES_OVERLAP_SECONDS", 5):
+        await service.get_changes("user-1", encode_change_token(since))
+
+    params = mock_supabase_admin.rpc.call_args.args[1]
+    assert datetime.fromisoformat(params["p_since"]) == since - timedelta(seconds=5)
+
+@pytest.mark.asyncio
+async def test_get_changes_expired_token(service, mock_supabase_admin):
+    since = datetime.now(timezone.utc) - timedelta(days=365)
+
+    with pytest.raises(HTTPException) as exc:
+        await service.get_changes("user-1", encode_change_token(since))
+
+    assert exc.value.status_code == 410
+    mock_supabase_admin.rpc.assert_not_called()
@@ -0,0 +1,74 @@
+import time
+import pytest
+from unittest.mock import patch
+from app.cache.backends import InMemoryCacheBackend
+from app.services.data_version import DataVersionStore, etag_matches
+
+def make_store() -> DataVersionStore:
+    return DataVersionStore(InMemoryCacheBackend(max_size=10, ttl_seconds=float("inf")))
+
+@pytest.mark.asyncio
+async def test_bump_changes_version():
+    store = make_store()
+    before = await store.get("user-1")
+    await store.bump("user-1")
+
+    assert await store.get("user-1") != before
+
+@pytest.mark.asyncio
+async def test_versions_are_per_user():
+    store = make_store()
+    other_before = await store.get("user-2")
+    await store.bump("user-1")
+
+    assert await store.get("user-2") == other_before
+
+@pytest.mark.asyncio
+async def test_version_is_stable_until_bumped():
+    store = make_store()
+
+    assert await store.get("user-1") == await store.get("user-1")
+
+@pytest.mark.asyncio
+async def test_stores_sharing_a_backend_see_the_same_version():
+    # 多個 worker 使用共享後端時，任一個 worker 的寫入都會改變其他 worker 的 ETag
+    backend = InMemoryCacheBackend(max_size=10, ttl_seconds=float("inf"))
+    worker_a, worker_b = DataVersionStore(backend), DataVersionStore(backend)
+    before = await worker_b.etag("user-1", "include=full")
+
+    await worker_a.bump("user-1")
+
+    assert await worker_b.etag("user-1", "include=full") != before
+
+@pytest.mark.asyncio
+async def test_version_does_not_expire_without_writes():
+    store = make_store()
+    before = await store.get("user-1")
+
+    # 一小時後沒有任何寫入，版本不變
+    with patch("app.cache.ttl_cache.time.time", return_value=time.time() + 3600):
+        assert await store.get("user-1") == before
+
+@pytest.mark.asyncio
+async def test_evicted_version_is_replaced():
+    store = DataVersionStore(InMemoryCacheBackend(max_size=1, ttl_seconds=float("inf")))
+    before = await store.get("user-1")
+    await store.get("user-2")
+
+    assert await store.get("user-1") != before
+
+@pytest.mark.asyncio
+async def test_etag_depends_on_query():
+    store = make_store()
+
+    assert await store.etag("user-1", "include=full") == await store.etag("user-1", "include=full")
+    assert await store.etag("user-1", "include=full") != await store.etag("user-1", "include=sessions")
+
+def test_etag_matches():
+    etag = 'W/"abc"'
+
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"xyz", "abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"xyz"', etag)
+    assert not etag_matches(None, etag)
@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from fastapi import HTTPException
+from app.cache.backends import InMemoryCacheBackend
+from app.services.idempotency import IdempotencyStore, request_fingerprint
+
+@pytest.fixture
+def store():
+    return IdempotencyStore(InMemoryCacheBackend(max_size=10, ttl_seconds=60), ttl_seconds=60, pending_ttl_seconds=5)
+
+@pytest.mark.asyncio
+async def test_replay_returns_saved_result(store):
+    operation = AsyncMock(return_value={"id": "session-1"})
+    fingerprint = request_fingerprint("POST /api/training-sessions", b'{"title":"A"}')
+
+    first = await store.run("user-1", "key-1", fingerprint, operation)
+    second = await store.run("user-1", "key-1", fingerprint, operation)
+
+    assert first == ({"id": "session-1"}, False)
+    assert second == ({"id": "session-1"}, True)
+    operation.assert_awaited_once()
+    assert store.stats()["replays"] == 1
+
+@pytest.mark.asyncio
+async def test_keys_are_scoped_per_user(store):
+    operation = AsyncMock(return_value={"id": "session-1"})
+
+    await store.run("user-1", "key-1", "fp", operation)
+    _, replayed = await store.run("user-2", "key-1", "fp", operation)
+
+    assert replayed is False
+    assert operation.await_count == 2
+
+@pytest.mark.asyncio
+async def test_key_reused_with_different_request(store):
+    await store.run("user-1", "key-1", "fp-a", AsyncMock(return_value={}))
+
+    with pytest.raises(HTTPException) as exc:
+        await store.run("user-1", "key-1", "fp-b", AsyncMock())
+
+    assert exc.value.status_code == 422
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_conflicts(store):
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_operation():
+        started.set()
+        await release.wait()
+        return {"id": "session-1"}
+
+    first = asyncio.create_task(store.run("user-1", "key-1", "fp", slow_operation))
+    await started.wait()
+
+    with pytest.raises(HTTPException) as exc:
+        await store.run("user-1", "key-1", "fp", AsyncMock())
+    assert exc.value.status_code == 409
+
+    release.set()
+    assert await first == ({"id": "session-1"}, False)
+
+@pytest.mark.asyncio
+async def test_failed_request_can_be_retried(store):
+    failing = AsyncMock(side_effect=HTTPException(status_code=500, detail="boom"))
+    with pytest.raises(HTTPException):
+        await store.run("user-1", "key-1", "fp", failing)
+
+    result, replayed = await store.run("user-1", "key-1", "fp", AsyncMock(return_value={"id": "session-1"}))
+
+    assert result == {"id": "session-1"}
+    assert replayed is False
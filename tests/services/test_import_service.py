@@ -0,0 +1,103 @@
+import io
+import json
+import pytest
+from unittest.mock import MagicMock, patch, AsyncMock
+from app.cache.session_cache import get_session_cache
+from app.services.import_service import ImportService, ImportFileError, iter_csv_rows, iter_json_rows
+
+ROWS = [
+    {"date": "2024-01-01", "session_title": "Leg day", "activity": "Squat", "set_number": 1, "repetition": 5, "weight": 100},
+    {"date": "2024-01-01", "session_title": "Leg day", "activity": "Squat", "set_number": 2, "repetition": 5, "weight": 100},
+    {"date": "2024-01-01", "session_title": "Leg day", "activity": "Lunge", "set_number": 1, "reps": 10},
+    {"date": "2024-01-03", "activity": "Bench", "set_number": 1, "repetition": 8, "weight": 60},
+]
+
+@pytest.fixture
+def mock_supabase_admin():
+    mock = MagicMock()
+    counters = {}
+
+    def table(name):
+        def insert(rows):
+            start = counters.get(name, 0)
+            counters[name] = start + len(rows)
+            query = MagicMock()
+            query.execute = AsyncMock(return_value=MagicMock(
+                data=[{**row, "id": f"{name}-{start + i}"} for i, row in enumerate(rows)]
+            ))
+            return query
+        table_mock = MagicMock()
+        table_mock.insert.side_effect = insert
+        return table_mock
+
+    mock.table.side_effect = table
+    return mock
+
+@pytest.fixture
+def service(mock_supabase_admin):
+    with patch("app.services.import_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        svc = ImportService()
+        yield svc
+
+async def collect(service, stream, file_format):
+    return [event async for event in service.import_file("user-123", stream, file_format)]
+
+def test_iter_csv_rows():
+    data = "date,activity,set_number,weight\n2024-01-01,Squat,1,100\n2024-01-02,\"Bench, paused\",2,\n"
+
+    rows = list(iter_csv_rows(io.BytesIO(data.encode())))
+
+    assert rows == [
+        {"date": "2024-01-01", "activity": "Squat", "set_number": "1", "weight": "100"},
+        {"date": "2024-01-02", "activity": "Bench, paused", "set_number": "2", "weight": None},
+    ]
+
+def test_iter_json_rows_across_buffer_boundaries():
+    data = json.dumps(ROWS, indent=2).encode()
+
+    # 很小的讀取大小，讓每個元素都跨越多個緩衝區
+    assert list(iter_json_rows(io.BytesIO(data), read_size=7)) == ROWS
+    assert list(iter_json_rows(io.BytesIO(b" [ ] "))) == []
+
+@pytest.mark.parametrize("data", [b'{"date": "2024-01-01"}', b'[{"date": "2024-01-01"}', b'[{"a": 1} {"b": 2}]'])
+def test_iter_json_rows_invalid(data):
+    with pytest.raises(ImportFileError):
+        list(iter_json_rows(io.BytesIO(data)))
+
+@pytest.mark.asyncio
+async def test_import_groups_rows(service, mock_supabase_admin):
+    events = await collect(service, io.BytesIO(json.dumps(ROWS).encode()), "json")
+
+    summary = events[-1]
+    assert summary["type"] == "summary"
+    assert (summary["sessions"], summary["activities"], summary["records"]) == (2, 3, 4)
+    assert summary["rejected"] == 0
+
+@pytest.mark.asyncio
+async def test_import_continues_session_across_chunks(service, mock_supabase_admin):
+    with patch("app.services.import_service.IMPORT_CHUNK_ROWS", 1):
+        events = await collect(service, io.BytesIO(json.dumps(ROWS).encode()), "json")
+
+    assert [e["type"] for e in events] == ["progress"] * 4 + ["summary"]
+    # 同一個課程與活動跨批次時不會重複建立
+    assert (events[-1]["sessions"], events[-1]["activities"], events[-1]["records"]) == (2, 3, 4)
+
+@pytest.mark.asyncio
+async def test_import_reports_rejected_rows(service, mock_supabase_admin):
+    rows = [ROWS[0], {"date": "not-a-date", "activity": "Squat", "set_number": 1}, "oops"]
+
+    events = await collect(service, io.BytesIO(json.dumps(rows).encode()), "json")
+
+    summary = events[-1]
+    assert summary["records"] == 1
+    assert summary["rejected"] == 2
+    assert [r["row"] for r in summary["rejected_rows"]] == [2, 3]
+    assert summary["rejected_rows"][0]["errors"][0]["loc"] == ("date",)
+
+@pytest.mark.asyncio
+async def test_import_invalid_file(service, mock_supabase_admin):
+    events = await collect(service, io.BytesIO(b"not json"), "json")
+
+    assert events == [{"type": "error", "detail": "JSON file must contain an array of rows",
+                       "rows": 0, "sessions": 0, "activities": 0, "records": 0}]
+    mock_supabase_admin.table.assert_not_called()
@@ -0,0 +1,127 @@
+import time
+import jwt
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch, AsyncMock
+from cryptography.hazmat.primitives.asymmetric import ec
+from jwt.algorithms import ECAlgorithm
+from app.services.jwt_verifier import JWKSCache, JWTVerifier, claims_to_user
+
+ISSUER = "https://example.supabase.co/auth/v1"
+
+@pytest.fixture
+def signing_key():
+    return ec.generate_private_key(ec.SECP256R1())
+
+@pytest.fixture
+def jwks(signing_key):
+    jwk = ECAlgorithm.to_jwk(signing_key.public_key(), as_dict=True)
+    jwk.update({"kid": "key-1", "alg": "ES256", "use": "sig"})
+    return {"keys": [jwk]}
+
+@pytest.fixture
+def mock_httpx_get(jwks):
+    with patch("app.services.jwt_verifier.httpx.AsyncClient.get", new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = MagicMock(json=MagicMock(return_value=jwks))
+        yield mock_get
+
+@pytest.fixture
+def verifier():
+    cache = JWKSCache("https://example.supabase.co/auth/v1/.well-known/jwks.json", ttl_seconds=600)
+    return JWTVerifier(cache, audience="authenticated", issuer=ISSUER, enabled=True)
+
+def make_token(signing_key, kid="key-1", **overrides):
+    claims = {
+        "sub": "user-1",
+        "email": "test@example.com",
+        "aud": "authenticated",
+        "iss": ISSUER,
+        "exp": int(time.time()) + 3600,
+        "user_metadata": {"username": "testuser"},
+        **overrides
+    }
+    return jwt.encode(claims, signing_key, algorithm="ES256", headers={"kid": kid})
+
+@pytest.mark.asyncio
+async def test_verify_valid_token(verifier, signing_key, mock_httpx_get):
+    claims = await verifier.verify(make_token(signing_key))
+
+    assert claims["sub"] == "user-1"
+    assert claims_to_user(claims) == {
+        "id": "user-1",
+        "email": "test@example.com",
+        "username": "testuser"
+    }
+
+@pytest.mark.asyncio
+async def test_jwks_is_cached_between_calls(verifier, signing_key, mock_httpx_get):
+    await verifier.verify(make_token(signing_key))
+    await verifier.verify(make_token(signing_key))
+
+    assert mock_httpx_get.call_count == 1
+
+@pytest.mark.asyncio
+async def test_jwks_refetched_after_ttl(verifier, signing_key, mock_httpx_get):
+    await verifier.verify(make_token(signing_key))
+    # 模擬快取過期
+    verifier.jwks_cache._fetched_at -= verifier.jwks_cache.ttl_seconds + 1
+    verifier.jwks_cache._attempted_at -= verifier.jwks_cache.ttl_seconds + 1
+    await verifier.verify(make_token(signing_key))
+
+    assert mock_httpx_get.call_count == 2
+
+@pytest.mark.asyncio
+async def test_jwks_refresh_failure_keeps_cached_keys(verifier, signing_key, mock_httpx_get):
+    await verifier.verify(make_token(signing_key))
+    verifier.jwks_cache._fetched_at -= verifier.jwks_cache.ttl_seconds + 1
+    verifier.jwks_cache._attempted_at -= verifier.jwks_cache.ttl_seconds + 1
+    mock_httpx_get.side_effect = httpx.ConnectError("unreachable")
+
+    first = await verifier.verify(make_token(signing_key))
+    second = await verifier.verify(make_token(signing_key))
+
+    # 過期的金鑰仍可使用，且在 MIN_REFRESH_INTERVAL 內不再重試
+    assert first["sub"] == second["sub"] == "user-1"
+    assert mock_httpx_get.call_count == 2
+
+@pytest.mark.asyncio
+async def test_jwks_fetch_failure_backs_off(verifier, signing_key, mock_httpx_get):
+    mock_httpx_get.side_effect = httpx.ConnectError("unreachable")
+
+    assert await verifier.verify(make_token(signing_key)) is None
+    assert await verifier.verify(make_token(signing_key)) is None
+
+    # 沒有可用的金鑰時改用 Supabase Auth 驗證，但不會每個請求都重新抓取
+    assert mock_httpx_get.call_count == 1
+
+@pytest.mark.asyncio
+async def test_verify_expired_token(verifier, signing_key, mock_httpx_get):
+    token = make_token(signing_key, exp=int(time.time()) - 10)
+
+    with pytest.raises(jwt.ExpiredSignatureError):
+        await verifier.verify(token)
+
+@pytest.mark.asyncio
+async def test_verify_wrong_audience(verifier, signing_key, mock_httpx_get):
+    token = make_token(signing_key, aud="anon")
+
+    with pytest.raises(jwt.InvalidAudienceError):
+        await verifier.verify(token)
+
+@pytest.mark.asyncio
+async def test_verify_bad_signature(verifier, mock_httpx_get):
+    other_key = ec.generate_private_key(ec.SECP256R1())
+
+    with pytest.raises(jwt.InvalidSignatureError):
+        await verifier.verify(make_token(other_key))
+
+@pytest.mark.asyncio
+async def test_verify_unknown_kid_falls_back(verifier, signing_key, mock_httpx_get):
+    assert await verifier.verify(make_token(signing_key, kid="rotated-key")) is None
+
+@pytest.mark.asyncio
+async def test_verify_hs256_token_falls_back(verifier, mock_httpx_get):
+    token = jwt.encode({"sub": "user-1"}, "legacy-secret-with-enough-length-32b", algorithm="HS256")
+
+    assert await verifier.verify(token) is None
+    mock_httpx_get.assert_not_called()
@@ -0,0 +1,127 @@
+import pytest
+from unittest.mock import MagicMock, patch, AsyncMock
+from supabase import PostgrestAPIError
+from app.cache.session_cache import get_session_cache
+from app.services.sync_service import SyncService, group_operations
+from app.models.sync import SyncOperation
+
+SESSION_ID = "4f521a2f-713a-4383-9999-1d51deedb1e3"
+ACTIVITY_ID = "7c9e6679-7425-40de-944b-e07fc1f90ae7"
+
+@pytest.fixture
+def mock_supabase_admin():
+    return MagicMock()
+
+@pytest.fixture
+def service(mock_supabase_admin):
+    with patch("app.services.sync_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        svc = SyncService()
+        yield svc
+
+def op(client_id, entity, action, id=None, **data):
+    return SyncOperation(client_id=client_id, entity=entity, action=action, id=id, data=data)
+
+def rpc_results(mock_supabase_admin, *results):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(
+        side_effect=[MagicMock(data=data) for data in results]
+    )
+
+def test_group_operations_splits_on_kind_and_repeated_target():
+    operations = [
+        op("s1", "session", "create", date="2024-01-01"),
+        op("s2", "session", "create", date="2024-01-02"),
+        op("a1", "activity", "create", session_id="s1", name="Squat"),
+        op("u1", "session", "update", id=SESSION_ID, title="A"),
+        op("u2", "session", "update", id=SESSION_ID, title="B")
+    ]
+
+    groups = group_operations(operations)
+
+    assert [[index for index, _ in group] for group in groups] == [[0, 1], [2], [3], [4]]
+
+@pytest.mark.asyncio
+async def test_apply_resolves_temporary_ids(service, mock_supabase_admin):
+    rpc_results(
+        mock_supabase_admin,
+        [{"id": "session-1"}, {"id": "session-2"}],
+        [{"id": "activity-1", "records": []}],
+        [{"id": "record-1"}]
+    )
+    await get_session_cache().set("user-1", "key", "cached")
+
+    result = await service.apply("user-1", [
+        op("tmp-s1", "session", "create", date="2024-01-01"),
+        op("tmp-s2", "session", "create", date="2024-01-02", title="Legs"),
+        op("tmp-a1", "activity", "create", session_id="tmp-s2", name="Squat"),
+        op("tmp-r1", "record", "create", activity_id="tmp-a1", set_number=1, weight=100, repetition=5)
+    ])
+
+    assert result["id_map"] == {"tmp-s1": "session-1", "tmp-s2": "session-2", "tmp-a1": "activity-1", "tmp-r1": "record-1"}
+    assert [r["status"] for r in result["results"]] == [201, 201, 201, 201]
+    # 連續的 session create 以一次呼叫寫入
+    assert mock_supabase_admin.rpc.call_count == 3
+    calls = mock_supabase_admin.rpc.call_args_list
+    assert calls[0].args[0] == "sync_training_sessions"
+    assert len(calls[0].args[1]["p_items"]) == 2
+    assert calls[1].args[1]["p_items"][0]["session_id"] == "session-2"
+    assert calls[2].args[1]["p_items"][0] == {
+        "activity_id": "activity-1", "set_number": 1, "repetition": 5,
+        "weight": 100.0, "duration": None, "distance": None, "score": None
+    }
+    assert await get_session_cache().get("user-1", "key") is None
+
+@pytest.mark.asyncio
+async def test_apply_reports_per_operation_failures(service, mock_supabase_admin):
+    rpc_results(mock_supabase_admin, [None, {"id": SESSION_ID, "title": "B"}])
+
+    result = await service.apply("user-1", [
+        op("bad", "session", "create", title="no date"),
+        op("u1", "session", "update", id="7c9e6679-7425-40de-944b-e07fc1f90ae8", title="A"),
+        op("u2", "session", "update", id=SESSION_ID, title="B"),
+        op("dep", "activity", "create", session_id="bad", name="Squat"),
+        op("empty", "record", "update", id=ACTIVITY_ID)
+    ])
+
+    statuses = [r["status"] for r in result["results"]]
+    assert statuses == [422, 404, 200, 424, 400]
+    assert result["results"][2]["data"] == {"id": SESSION_ID, "title": "B"}
+    assert result["id_map"] == {}
+    mock_supabase_admin.rpc.assert_called_once()
+    assert mock_supabase_admin.rpc.call_args.args[1]["p_items"][1] == {"id": SESSION_ID, "changes": {"title": "B"}}
+
+@pytest.mark.asyncio
+async def test_apply_rejects_null_for_required_fields(service, mock_supabase_admin):
+    rpc_results(mock_supabase_admin, [{"id": SESSION_ID, "note": None}])
+
+    result = await service.apply("user-1", [
+        op("date", "session", "update", id=SESSION_ID, date=None),
+        op("note", "session", "update", id=SESSION_ID, note=None),
+        op("name", "activity", "update", id=ACTIVITY_ID, name=None),
+        op("set", "record", "update", id=ACTIVITY_ID, set_number=None)
+    ])
+
+    # 可清除的欄位照常套用，其餘在呼叫資料庫前以 422 拒絕
+    assert [r["status"] for r in result["results"]] == [422, 200, 422, 422]
+    assert result["results"][0]["detail"][0]["loc"] == ["data", "date"]
+    mock_supabase_admin.rpc.assert_called_once()
+    assert mock_supabase_admin.rpc.call_args.args[1]["p_items"] == [{"id": SESSION_ID, "changes": {"note": None}}]
+
+@pytest.mark.asyncio
+async def test_apply_stops_after_database_error(service, mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(side_effect=[
+        MagicMock(data=[{"id": SESSION_ID}]),
+        PostgrestAPIError({"message": "boom", "code": "XX000"})
+    ])
+    await get_session_cache().set("user-1", "key", "cached")
+
+    result = await service.apply("user-1", [
+        op("d1", "session", "delete", id=SESSION_ID),
+        op("d2", "activity", "delete", id=ACTIVITY_ID),
+        op("d3", "record", "delete", id=ACTIVITY_ID)
+    ])
+
+    assert [r["status"] for r in result["results"]] == [204, 500, 424]
+    assert result["results"][0]["data"] is None
+    assert mock_supabase_admin.rpc.call_count == 2
+    # 已套用的操作仍會清除快取
+    assert await get_session_cache().get("user-1", "key") is None
@@ -1,8 +1,17 @@
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, patch, AsyncMock
 from datetime import date
 from fastapi import HTTPException
-from app.services.training_session_service import TrainingSessionService
+from app.services.training_session_service import (
+    TrainingSessionService,
+    SESSIONS_MAX_PAGE_SIZE,
+    EXPORT_PAGE_SIZE,
+    encode_cursor,
+    decode_cursor,
+    _month_ranges
+)
+from app.cache.backends import InMemoryCacheBackend
+from app.services import data_version
 from app.models.training_sessions import TrainingSessionCreate, TrainingSessionUpdate
 
 @pytest.fixture
@@ -11,19 +20,22 @@ def mock_supabase_admin():
 
 @pytest.fixture
 def service(mock_supabase_admin):
-    with patch("app.services.training_session_service.database.get_supabase_admin", return_value=mock_supabase_admin):
+    # 每個測試使用獨立的快取，寫入時的失效也作用在同一個快取上
+    with patch("app.services.training_session_service.database.get_async_supabase_admin", return_value=mock_supabase_admin), \
+         patch("app.cache.session_cache.session_cache", InMemoryCacheBackend()):
         svc = TrainingSessionService()
         yield svc
 
-def test_create_session(service, mock_supabase_admin):
+@pytest.mark.asyncio
+async def test_create_session(service, mock_supabase_admin):
     user_id = "user-123"
     session_data = TrainingSessionCreate(title="Test", date=date(2024, 1, 1), note="Note")
     
-    mock_supabase_admin.table.return_value.insert.return_value.execute.return_value = MagicMock(
+    mock_supabase_admin.table.return_value.insert.return_value.execute = AsyncMock(return_value=MagicMock(
         data=[{"id": "session-1", "user_id": user_id, "title": "Test"}]
-    )
+    ))
     
-    result = service.create_session(user_id, session_data)
+    result = await service.create_session(user_id, session_data)
     
     assert result["id"] == "session-1"
     mock_supabase_admin.table.assert_called_with("training_sessions")
@@ -32,14 +44,15 @@ def test_create_session(service, mock_supabase_admin):
     assert args[0]["user_id"] == user_id
     assert args[0]["title"] == "Test"
 
-def test_get_sessions_with_activities(service, mock_supabase_admin):
+@pytest.mark.asyncio
+async def test_get_sessions_with_activities(service, mock_supabase_admin):
     user_id = "user-123"
     
     # Mock chain
     mock_query = MagicMock()
-    mock_query.execute.return_value = MagicMock(data=[{"id": "session-1"}])
+    mock_query.execute = AsyncMock(return_value=MagicMock(data=[{"id": "session-1"}]))
     
-    # Chain setup: table -> select -> eq -> order -> execute
+    # Chain setup: table -> select -> eq -> order(date) -> order(id) -> limit -> execute
     # Code:
     # query = table().select().eq()
     # query = query.order()
@@ -47,36 +60,220 @@ def test_get_sessions_with_activities(service, mock_supabase_admin):
     
     mock_step1 = MagicMock()
     mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
-    mock_step1.order.return_value = mock_query
+    mock_step1.order.return_value.order.return_value.limit.return_value = mock_query
 
-    result = service.get_sessions_with_activities(user_id)
+    result, next_cursor = await service.get_sessions_with_activities(user_id)
     
     assert len(result) == 1
     assert result[0]["id"] == "session-1"
+    assert next_cursor is None
 
-def test_update_session_not_found(service, mock_supabase_admin):
+@pytest.mark.asyncio
+async def test_update_session_not_found(service, mock_supabase_admin):
     user_id = "user-123"
     session_id = "non-existent"
     update_data = TrainingSessionUpdate(title="New Title")
     
-    # Mock existing check returning empty data
-    mock_supabase_admin.table.return_value.select.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(
+    # 以 user_id 篩選的 update 沒有更新任何資料
+    mock_supabase_admin.table.return_value.update.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(
         data=[]
-    )
+    ))
     
     with pytest.raises(HTTPException) as exc:
-        service.update_session(user_id, session_id, update_data)
+        await service.update_session(user_id, session_id, update_data)
     
     assert exc.value.status_code == 404
+    mock_supabase_admin.table.return_value.select.assert_not_called()
+    mock_supabase_admin.table.return_value.update.return_value.eq.return_value.eq.assert_called_once_with("user_id", user_id)
 
-def test_delete_session_success(service, mock_supabase_admin):
+@pytest.mark.asyncio
+async def test_delete_session_success(service, mock_supabase_admin):
     user_id = "user-123"
     session_id = "session-1"
     
-    mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(
+    mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(
         data=[{"id": session_id}]
-    )
+    ))
     
-    service.delete_session(user_id, session_id)
+    await service.delete_session(user_id, session_id)
     
     mock_supabase_admin.table.return_value.delete.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_get_sessions_with_activities_next_page(service, mock_supabase_admin):
+    user_id = "user-123"
+    rows = [
+        {"id": "00000000-0000-0000-0000-000000000003", "date": "2024-01-03"},
+        {"id": "00000000-0000-0000-0000-000000000002", "date": "2024-01-02"},
+        {"id": "00000000-0000-0000-0000-000000000001", "date": "2024-01-01"},
+    ]
+    mock_query = MagicMock()
+    mock_query.execute = AsyncMock(return_value=MagicMock(data=rows))
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value = mock_query
+
+    result, next_cursor = await service.get_sessions_with_activities(user_id, limit=2)
+
+    # 多取一筆判斷是否有下一頁
+    mock_step1.order.return_value.order.return_value.limit.assert_called_once_with(3)
+    assert [r["id"] for r in result] == [rows[0]["id"], rows[1]["id"]]
+    assert decode_cursor(next_cursor) == ("2024-01-02", rows[1]["id"])
+
+@pytest.mark.asyncio
+async def test_get_sessions_with_activities_from_cursor(service, mock_supabase_admin):
+    user_id = "user-123"
+    cursor = encode_cursor({"date": "2024-01-02", "id": "00000000-0000-0000-0000-000000000002"})
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.or_.return_value.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[])
+    )
+
+    result, next_cursor = await service.get_sessions_with_activities(user_id, cursor=cursor)
+
+    mock_step1.or_.assert_called_once_with(
+        "date.lt.2024-01-02,and(date.eq.2024-01-02,id.lt.00000000-0000-0000-0000-000000000002)"
+    )
+    assert result == []
+    assert next_cursor is None
+
+@pytest.mark.asyncio
+async def test_get_sessions_with_activities_limit_capped(service, mock_supabase_admin):
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[])
+    )
+
+    await service.get_sessions_with_activities("user-123", limit=100000)
+
+    mock_step1.order.return_value.order.return_value.limit.assert_called_once_with(SESSIONS_MAX_PAGE_SIZE + 1)
+
+@pytest.mark.asyncio
+async def test_get_sessions_with_activities_invalid_cursor(service):
+    with pytest.raises(HTTPException) as exc:
+        await service.get_sessions_with_activities("user-123", cursor="not-a-cursor")
+
+    assert exc.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_get_sessions_with_activities_cached(service, mock_supabase_admin):
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_execute = AsyncMock(return_value=MagicMock(data=[{"id": "session-1"}]))
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = mock_execute
+
+    first = await service.get_sessions_with_activities("user-123")
+    second = await service.get_sessions_with_activities("user-123")
+
+    assert first == second
+    mock_execute.assert_called_once()
+    assert service.session_cache.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_write_invalidates_user_cache(service, mock_supabase_admin):
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_execute = AsyncMock(return_value=MagicMock(data=[{"id": "session-1"}]))
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = mock_execute
+    mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(
+        data=[{"id": "session-1"}]
+    ))
+
+    await service.get_sessions_with_activities("user-123")
+    await service.get_sessions_with_activities("other-user")
+    await service.delete_session("user-123", "session-1")
+    await service.get_sessions_with_activities("user-123")
+    await service.get_sessions_with_activities("other-user")
+
+    # 只有寫入的使用者需要重新查詢
+    assert mock_execute.call_count == 3
+
+@pytest.mark.asyncio
+async def test_write_during_read_does_not_cache_stale_result(service, mock_supabase_admin):
+    responses = iter([[{"id": "session-1", "title": "old"}], [{"id": "session-1", "title": "new"}]])
+
+    async def execute():
+        data = next(responses)
+        # 查詢進行中另一個請求寫入資料
+        if data[0]["title"] == "old":
+            await data_version.record_change("user-123")
+        return MagicMock(data=data)
+
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(side_effect=execute)
+
+    await service.get_sessions_with_activities("user-123")
+    sessions, _ = await service.get_sessions_with_activities("user-123")
+
+    assert sessions[0]["title"] == "new"
+
+@pytest.mark.asyncio
+async def test_iter_session_pages(service, mock_supabase_admin):
+    first_rows = [
+        {"id": f"00000000-0000-0000-0000-{i:012d}", "date": "2024-01-02"}
+        for i in range(EXPORT_PAGE_SIZE + 1, 0, -1)
+    ]
+    last_rows = [{"id": "00000000-0000-0000-0000-000000000000", "date": "2024-01-01"}]
+    mock_step1 = MagicMock()
+    mock_supabase_admin.table.return_value.select.return_value.eq.return_value = mock_step1
+    mock_step1.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=first_rows)
+    )
+    mock_step1.or_.return_value.order.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=last_rows)
+    )
+
+    pages = [page async for page in service.iter_session_pages("user-123")]
+
+    assert [len(page) for page in pages] == [EXPORT_PAGE_SIZE, 1]
+    last_of_first = first_rows[EXPORT_PAGE_SIZE - 1]
+    mock_step1.or_.assert_called_once_with(
+        f"date.lt.2024-01-02,and(date.eq.2024-01-02,id.lt.{last_of_first['id']})"
+    )
+    # 匯出不寫入讀取快取
+    assert service.session_cache.stats()["size"] == 0
+
+def test_month_ranges():
+    assert _month_ranges(date(2024, 1, 15), date(2024, 3, 2)) == [
+        (date(2024, 1, 1), date(2024, 1, 31)),
+        (date(2024, 2, 1), date(2024, 2, 29)),
+        (date(2024, 3, 1), date(2024, 3, 31)),
+    ]
+
+@pytest.mark.asyncio
+async def test_get_calendar_fetches_missing_months(service, mock_supabase_admin):
+    def rpc(name, params):
+        month = params["p_start_date"][:7]
+        query = MagicMock()
+        query.execute = AsyncMock(return_value=MagicMock(data=[
+            {"date": f"{month}-01", "session_count": 1, "activity_count": 2, "set_count": 6, "tonnage": 1200},
+            {"date": f"{month}-20", "session_count": 1, "activity_count": 1, "set_count": 3, "tonnage": 300},
+        ]))
+        return query
+    mock_supabase_admin.rpc.side_effect = rpc
+
+    days = await service.get_calendar("user-123", date(2024, 1, 10), date(2024, 2, 10))
+
+    # 只保留區間內的日期
+    assert [day["date"] for day in days] == ["2024-01-20", "2024-02-01"]
+    assert mock_supabase_admin.rpc.call_count == 2
+    mock_supabase_admin.rpc.assert_any_call("training_calendar", {
+        "p_user_id": "user-123", "p_start_date": "2024-02-01", "p_end_date": "2024-02-29"
+    })
+
+    # 同月份的查詢直接讀取快取
+    await service.get_calendar("user-123", date(2024, 1, 1), date(2024, 2, 29))
+    assert mock_supabase_admin.rpc.call_count == 2
+
+@pytest.mark.asyncio
+async def test_get_calendar_invalid_range(service):
+    with pytest.raises(HTTPException) as exc:
+        await service.get_calendar("user-123", date(2024, 2, 1), date(2024, 1, 1))
+    assert exc.value.status_code == 400
+
+    with pytest.raises(HTTPException) as exc:
+        await service.get_calendar("user-123", date(2020, 1, 1), date(2024, 1, 1))
+    assert exc.value.status_code == 400
@@ -0,0 +1,65 @@
+import pytest
+from unittest.mock import MagicMock, patch, AsyncMock
+from datetime import date
+from fastapi import HTTPException
+from supabase import PostgrestAPIError
+from app.cache.session_cache import get_session_cache
+from app.services.workout_template_service import WorkoutTemplateService
+from app.models.workout_templates import WorkoutTemplateCreate, SessionInstantiate
+
+@pytest.fixture
+def mock_supabase_admin():
+    return MagicMock()
+
+@pytest.fixture
+def service(mock_supabase_admin):
+    with patch("app.services.workout_template_service.database.get_async_supabase_admin", return_value=mock_supabase_admin):
+        svc = WorkoutTemplateService()
+        yield svc
+
+@pytest.mark.asyncio
+async def test_create_template(service, mock_supabase_admin):
+    template = {"id": "template-1", "name": "Leg day", "payload": {"activities": []}}
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=template))
+
+    result = await service.create_template("user-1", WorkoutTemplateCreate(session_id="session-1", name="Leg day"))
+
+    assert result == template
+    mock_supabase_admin.rpc.assert_called_once_with("save_session_as_template", {
+        "p_user_id": "user-1", "p_session_id": "session-1", "p_name": "Leg day"
+    })
+
+@pytest.mark.asyncio
+async def test_instantiate_template_invalidates_cache(service, mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data={"id": "session-2"}))
+    await get_session_cache().set("user-1", "key", "cached")
+
+    result = await service.instantiate_template("user-1", "template-1", SessionInstantiate(date=date(2024, 2, 1)))
+
+    assert result == {"id": "session-2"}
+    mock_supabase_admin.rpc.assert_called_once_with("instantiate_workout_template", {
+        "p_user_id": "user-1", "p_template_id": "template-1", "p_date": "2024-02-01", "p_title": None
+    })
+    assert await get_session_cache().get("user-1", "key") is None
+
+@pytest.mark.asyncio
+async def test_clone_session_not_found(service, mock_supabase_admin):
+    mock_supabase_admin.rpc.return_value.execute = AsyncMock(side_effect=PostgrestAPIError({
+        "message": "Training session not found", "code": "P0002"
+    }))
+
+    with pytest.raises(HTTPException) as exc:
+        await service.clone_session("user-1", "session-1", SessionInstantiate(date=date(2024, 2, 1)))
+
+    assert exc.value.status_code == 404
+
+@pytest.mark.asyncio
+async def test_delete_template_not_found(service, mock_supabase_admin):
+    mock_supabase_admin.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[])
+    )
+
+    with pytest.raises(HTTPException) as exc:
+        await service.delete_template("user-1", "template-1")
+
+    assert exc.value.status_code == 404
@@ -0,0 +1,23 @@
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.activity_service import ActivityService
+from app.services.ai_service import AIService
+
+def test_lifespan_creates_services_once():
+    with TestClient(app) as client:
+        activity_service = app.state.activity_service
+        client.get("/")
+        client.get("/")
+
+        assert isinstance(activity_service, ActivityService)
+        assert app.state.activity_service is activity_service
+
+def test_lifespan_closes_clients_on_shutdown():
+    with patch("app.main.database.close_http_clients", new_callable=AsyncMock) as mock_close, \
+         patch.object(AIService, "aclose", new_callable=AsyncMock) as mock_ai_close:
+        with TestClient(app):
+            pass
+
+    mock_close.assert_awaited_once()
+    mock_ai_close.assert_awaited_once()